@@ -0,0 +1,3 @@
+# Benchmarks and checks for Dear Bindings
+# These are intended to be run from the repository root, for example:
+#   python -m benchmarks.bench_lexer
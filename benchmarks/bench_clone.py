@@ -0,0 +1,158 @@
+# Benchmark for cloning DOM elements
+# Converts a header twice, once using the old approach of cloning elements with copy.deepcopy() and once using the
+# clone protocol in DOMElement (populate_clone() and shared tokens), counting the calls made to clone() and the time
+# spent in them, broken down by the module they were called from. Checks that both approaches produce the same files.
+
+import argparse
+import collections
+import contextlib
+import copy
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+import dear_bindings
+from src import code_dom
+
+
+# The old implementation of DOMElement.clone(), which uses copy.deepcopy() (with DOMElement.__getstate__() removing
+# unmodified_element and the caches from the copies)
+def deepcopy_clone(element):
+    # We need to temporarily remove our parent reference to prevent the tree above us getting cloned
+    temp_parent = element._parent
+    element._parent = None
+    # DOMFunctionDeclaration used to override clone() to avoid cloning the original class
+    temp_original_class = getattr(element, "original_class", None)
+    if temp_original_class is not None:
+        element.original_class = None
+    clone = copy.deepcopy(element)
+    element._parent = temp_parent
+    if temp_original_class is not None:
+        element.original_class = temp_original_class
+        clone.original_class = temp_original_class
+    reconnect_unmodified(clone, element)
+    return clone
+
+
+def reconnect_unmodified(clone, original):
+    clone.unmodified_element = original.unmodified_element
+    for child_list, original_child_list in zip(clone.get_child_lists(), original.get_child_lists()):
+        for child, original_child in zip(child_list, original_child_list):
+            reconnect_unmodified(child, original_child)
+
+
+# Replaces DOMElement.clone() with a wrapper around clone_function that records the number of (top-level) calls and the
+# time spent in them, keyed by the module the call came from
+class CloneCounter:
+    def __init__(self, clone_function):
+        self.clone_function = clone_function
+        self.calls = collections.Counter()
+        self.time = collections.Counter()
+        self.depth = 0  # Used to ignore the recursive calls cloning children make
+        self.original_clone = code_dom.DOMElement.clone
+
+    def __enter__(self):
+        counter = self
+
+        def counting_clone(element):
+            if counter.depth > 0:
+                return counter.clone_function(element)
+            # Attribute calls made via clone_without_children() to whatever called that
+            frame = sys._getframe(1)
+            while frame.f_code.co_name == "clone_without_children":
+                frame = frame.f_back
+            caller = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+            counter.depth += 1
+            start_time = time.perf_counter()
+            try:
+                return counter.clone_function(element)
+            finally:
+                counter.time[caller] += time.perf_counter() - start_time
+                counter.calls[caller] += 1
+                counter.depth -= 1
+
+        code_dom.DOMElement.clone = counting_clone
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        code_dom.DOMElement.clone = self.original_clone
+
+
+# Convert the header, returning the total time taken
+def convert(src_file, include_files, output_dir):
+    start_time = time.perf_counter()
+    # The conversion process is quite chatty, so suppress its output
+    with contextlib.redirect_stdout(io.StringIO()):
+        dear_bindings.convert_header(src_file,
+                                     [os.path.join(os.path.dirname(src_file), "imconfig.h")] + include_files,
+                                     os.path.join(output_dir, "dcimgui"),
+                                     os.path.join(os.path.dirname(os.path.realpath(dear_bindings.__file__)), "src",
+                                                  "templates"),
+                                     no_struct_by_value_arguments=False,
+                                     no_generate_default_arg_functions=False,
+                                     generate_unformatted_functions=True,
+                                     is_backend=False,
+                                     imgui_include_dir="",
+                                     backend_include_dir="",
+                                     emit_combined_json_metadata=False,
+                                     prefix_replacements={})
+    return time.perf_counter() - start_time
+
+
+def run(src_file, include_files):
+    src_file = os.path.realpath(src_file)
+
+    with tempfile.TemporaryDirectory() as deepcopy_dir, tempfile.TemporaryDirectory() as protocol_dir:
+        with CloneCounter(deepcopy_clone) as before:
+            before_total_time = convert(src_file, include_files, deepcopy_dir)
+        with CloneCounter(code_dom.DOMElement.clone) as after:
+            after_total_time = convert(src_file, include_files, protocol_dir)
+
+        output_files = sorted(os.listdir(deepcopy_dir))
+        _, mismatches, errors = filecmp.cmpfiles(deepcopy_dir, protocol_dir, output_files, shallow=False)
+
+    print(os.path.basename(src_file))
+    print("  %-42s %7s %11s %11s %8s" % ("Caller", "Clones", "deepcopy", "Protocol", "Speedup"))
+    for caller in sorted(before.calls, key=lambda name: before.time[name], reverse=True):
+        print("  %-42s %7d %10.3fs %10.3fs %7.1fx" %
+              (caller, before.calls[caller], before.time[caller], after.time[caller],
+               before.time[caller] / max(after.time[caller], 1e-9)))
+    before_clone_time = sum(before.time.values())
+    after_clone_time = sum(after.time.values())
+    print("  %-42s %7d %10.3fs %10.3fs %7.1fx" %
+          ("Total", sum(before.calls.values()), before_clone_time, after_clone_time,
+           before_clone_time / after_clone_time))
+    print("  %-42s %7s %10.3fs %10.3fs %7.1fx" %
+          ("Whole conversion", "", before_total_time, after_total_time, before_total_time / after_total_time))
+
+    if before.calls != after.calls:
+        print("Clone calls differ between deepcopy and protocol conversions")
+        return False
+    if (len(mismatches) > 0) or (len(errors) > 0):
+        print("Output mismatch between deepcopy and protocol clones: " + ", ".join(mismatches + errors))
+        return False
+    print("  Output of " + str(len(output_files)) + " files is identical")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Element cloning benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default=os.path.join("..", "imgui", "imgui_internal.h"),
+                        help="Header to convert (default: ../imgui/imgui_internal.h)")
+    parser.add_argument('--include',
+                        action='append',
+                        help="Additional header to include (default: imgui.h from the same directory as the header "
+                             "being converted, if that isn't imgui.h itself)")
+    args = parser.parse_args()
+    if args.include is not None:
+        includes = [os.path.realpath(include) for include in args.include]
+    elif os.path.basename(args.src) != "imgui.h":
+        # Headers other than imgui.h itself (such as imgui_internal.h) need imgui.h to be included to convert properly
+        includes = [os.path.join(os.path.dirname(os.path.realpath(args.src)), "imgui.h")]
+    else:
+        includes = []
+    sys.exit(0 if run(args.src, includes) else 1)
@@ -0,0 +1,110 @@
+# Benchmark for DOM memory usage
+# Parses a header and reports the memory used by each type of node in the DOM (and by tokens), comparing the slotted
+# classes actually used with equivalent classes that store their attributes in a per-instance __dict__ (as all elements
+# and tokens used to), along with the total memory allocated for the DOM
+# Only the objects themselves are measured - lists/strings/etc that they refer to are the same either way
+
+import argparse
+import collections
+import os
+import sys
+import tracemalloc
+import ply.lex as lex
+from src import c_lexer
+from src import code_dom
+from src import token_stream
+
+
+def parse(source, filename):
+    lexer = c_lexer.create_lexer()
+    lexer.input(source)
+    stream = token_stream.TokenStream(lexer)
+    context = code_dom.ParseContext()
+    return code_dom.DOMHeaderFile.parse(context, stream, filename)
+
+
+# Create copies of all the objects given (which must all be of the same type) as instances of new_class, setting the
+# attributes listed on each, and return the average number of bytes allocated per object
+def measure_copies(objects, new_class, attribute_names):
+    copies = []
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    for obj in objects:
+        new_object = new_class.__new__(new_class)
+        for attribute_name in attribute_names:
+            setattr(new_object, attribute_name, getattr(obj, attribute_name))
+        copies.append(new_object)
+    end_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Don't count the list we kept the copies in
+    return (end_size - start_size - sys.getsizeof(copies)) / len(objects)
+
+
+# Get a class with the same name as element_class that doesn't use __slots__
+def make_dict_based_class(element_class):
+    return type(element_class.__name__ + "WithDict", (), {})
+
+
+# Get all the tokens referenced by the DOM
+def get_all_tokens(dom_root):
+    tokens = {}
+    for element in dom_root.iter_descendants():
+        for token in element.tokens:
+            tokens[id(token)] = token
+    return list(tokens.values())
+
+
+def run(src_file):
+    with open(src_file, "r") as f:
+        source = f.read()
+    filename = os.path.basename(src_file)
+
+    tracemalloc.start()
+    dom_root = parse(source, filename)
+    dom_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    elements_by_class = collections.defaultdict(list)
+    for element in dom_root.iter_descendants():
+        elements_by_class[type(element)].append(element)
+
+    results = []  # (name, count, slotted bytes per object, dict-based bytes per object)
+    for element_class, elements in elements_by_class.items():
+        slot_names, _ = code_dom.element.get_all_slots(element_class)
+        # Only copy the slots that are actually set, as measure_copies() can't read unset ones
+        slot_names = [slot_name for slot_name in slot_names if hasattr(elements[0], slot_name)]
+        results.append((element_class.__name__, len(elements),
+                        measure_copies(elements, element_class, slot_names),
+                        measure_copies(elements, make_dict_based_class(element_class), slot_names)))
+
+    # Tokens are compared against PLY's LexToken, which is what they used to be (with flags added as needed)
+    tokens = get_all_tokens(dom_root)
+    token_fields = ["type", "value", "lineno", "lexpos"]
+    results.append(("Token", len(tokens),
+                    measure_copies(tokens, token_stream.Token, token_stream.Token.__slots__),
+                    measure_copies(tokens, lex.LexToken, token_fields)))
+
+    print(filename + ": %.1fMB allocated for the DOM (including tokens, lists and strings)" %
+          (dom_size / (1024 * 1024)))
+    print("  %-22s %8s %14s %14s %11s" % ("Node type", "Count", "Slots (B/node)", "Dict (B/node)", "Saved (KB)"))
+    total_slotted = 0
+    total_dict_based = 0
+    for name, count, slotted, dict_based in sorted(results, key=lambda result: result[1] * result[3], reverse=True):
+        print("  %-22s %8d %14.0f %14.0f %11.1f" % (name, count, slotted, dict_based,
+                                                      (dict_based - slotted) * count / 1024))
+        total_slotted += slotted * count
+        total_dict_based += dict_based * count
+    print("  %-22s %8s %14s %14s %11.1f" % ("Total", "", "%.1fMB" % (total_slotted / (1024 * 1024)),
+                                             "%.1fMB" % (total_dict_based / (1024 * 1024)),
+                                             (total_dict_based - total_slotted) / 1024))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DOM memory usage benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default=os.path.join("..", "imgui", "imgui_internal.h"),
+                        help="Header file to parse (default: ../imgui/imgui_internal.h)")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.src) else 1)
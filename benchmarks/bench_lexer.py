@@ -0,0 +1,58 @@
+# Micro-benchmark for lexer creation
+# Compares building a fresh PLY lexer for every snippet (the old behaviour of c_lexer.tokenize()) against cloning the
+# shared master lexer, by timing utils.create_type() on a short type string
+
+import argparse
+import re
+import sys
+import time
+import ply.lex as lex
+from src import c_lexer
+from src import utils
+
+
+# Old-style lexer creation - rebuilds the master regex from scratch on every call
+def create_uncached_lexer():
+    return lex.lex(module=c_lexer, reflags=int(re.VERBOSE | re.MULTILINE))
+
+
+# Time calling utils.create_type(text) the given number of times, returning the total time in seconds
+def time_create_type(text, iterations):
+    start_time = time.perf_counter()
+    for i in range(0, iterations):
+        utils.create_type(text)
+    return time.perf_counter() - start_time
+
+
+def run(text, iterations):
+    # Make sure the master lexer exists before we start timing, so its one-off construction isn't included
+    c_lexer.get_master_lexer()
+
+    # Time the old behaviour by temporarily swapping out the lexer factory
+    cached_create_lexer = c_lexer.create_lexer
+    c_lexer.create_lexer = create_uncached_lexer
+    try:
+        before = time_create_type(text, iterations)
+    finally:
+        c_lexer.create_lexer = cached_create_lexer
+
+    after = time_create_type(text, iterations)
+
+    print("utils.create_type(\"" + text + "\") x " + str(iterations))
+    print("  Rebuilding lexer : %.3fs (%.1fus per call)" % (before, before * 1000000 / iterations))
+    print("  Cloning lexer    : %.3fs (%.1fus per call)" % (after, after * 1000000 / iterations))
+    print("  Speedup          : %.1fx" % (before / after))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lexer creation micro-benchmark")
+    parser.add_argument('--iterations',
+                        type=int,
+                        default=10000,
+                        help="Number of times to call utils.create_type() (default: 10000)")
+    parser.add_argument('--type',
+                        default="const char*",
+                        help="Type string to parse (default: \"const char*\")")
+    args = parser.parse_args()
+    run(args.type, args.iterations)
+    sys.exit(0)
@@ -0,0 +1,216 @@
+# Scaling check for individual modifiers
+# Converts synthetic headers (see synthetic_header.py) at sizes N, 2N and 4N, timing every modifier separately, and
+# checks that the time each one takes grows no faster than the complexity class registered for it in
+# modifier_complexity allows. This exits with a non-zero result code if any modifier is slower than its class allows
+# or if a modifier in src/modifiers hasn't been registered, so it can be used in CI to catch changes that (for example)
+# add a walk of the DOM for every element.
+# Each size is converted several times with the garbage collector disabled, and the fastest time for each modifier is
+# used, to reduce noise. Modifiers that take too little time to measure reliably aren't checked.
+
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import tempfile
+import dear_bindings
+from src import modifiers
+from src import pass_manager
+from src import profiler
+from benchmarks import synthetic_header
+from benchmarks.bench_scaling import get_growth_exponent, format_exponent
+
+# The largest growth exponent (k in time = c * size^k) allowed for each complexity class
+# These are halfway to the next class up, to leave some room for noise
+# There is deliberately no class for anything worse than linear - a modifier that grows faster than that on headers
+# like these is a performance bug to be fixed, not something to register here
+complexity_limits = {
+    "linear": 1.5  # Includes O(n log n), which is indistinguishable from linear at these sizes
+}
+
+# The expected complexity class of every modifier
+# New modifiers need to be added here
+modifier_complexity = {
+    "mod_add_define_guards": "linear",
+    "mod_add_defines": "linear",
+    "mod_add_field_comment": "linear",
+    "mod_add_forward_declarations": "linear",
+    "mod_add_function_comment": "linear",
+    "mod_add_includes": "linear",
+    "mod_add_manual_helper_functions": "linear",
+    "mod_add_prefix_to_loose_functions": "linear",
+    "mod_add_unformatted_functions": "linear",
+    "mod_align_comments": "linear",
+    "mod_align_enum_values": "linear",
+    "mod_align_function_names": "linear",
+    "mod_align_structure_field_names": "linear",
+    "mod_assign_anonymous_type_names": "linear",
+    "mod_attach_preceding_comments": "linear",
+    "mod_calculate_define_values": "linear",
+    "mod_calculate_enum_values": "linear",
+    "mod_change_class_field_type": "linear",
+    "mod_change_includes": "linear",
+    "mod_convert_by_value_struct_args_to_pointers": "linear",
+    "mod_convert_references_to_pointers": "linear",
+    "mod_disambiguate_functions": "linear",
+    "mod_exclude_defines_from_metadata": "linear",
+    "mod_flatten_class_functions": "linear",
+    "mod_flatten_conditionals": "linear",
+    "mod_flatten_inheritance": "linear",
+    "mod_flatten_namespaces": "linear",
+    "mod_flatten_nested_classes": "linear",
+    "mod_flatten_templates": "linear",
+    "mod_forward_declare_structs": "linear",
+    "mod_generate_default_argument_functions": "linear",
+    "mod_generate_imstr_helpers": "linear",
+    "mod_make_all_functions_use_imgui_api": "linear",
+    "mod_mark_by_value_structs": "linear",
+    "mod_mark_flags_enums": "linear",
+    "mod_mark_internal_members": "linear",
+    "mod_mark_special_enum_values": "linear",
+    "mod_mark_structs_as_single_line_definition": "linear",
+    "mod_mark_structs_as_using_unmodified_name_for_typedef": "linear",
+    "mod_mark_types_for_pointer_cast": "linear",
+    "mod_merge_blank_lines": "linear",
+    "mod_move_elements": "linear",
+    "mod_remove_all_fields_from_classes": "linear",
+    "mod_remove_all_functions_from_classes": "linear",
+    "mod_remove_blank_lines": "linear",
+    "mod_remove_constexpr": "linear",
+    "mod_remove_defines": "linear",
+    "mod_remove_empty_conditionals": "linear",
+    "mod_remove_enum_forward_declarations": "linear",
+    "mod_remove_extern_fields": "linear",
+    "mod_remove_function_bodies": "linear",
+    "mod_remove_functions": "linear",
+    "mod_remove_heap_constructors_and_destructors": "linear",
+    "mod_remove_includes": "linear",
+    "mod_remove_nested_typedefs": "linear",
+    "mod_remove_operators": "linear",
+    "mod_remove_pragma_once": "linear",
+    "mod_remove_static_fields": "linear",
+    "mod_remove_structs": "linear",
+    "mod_remove_typedefs": "linear",
+    "mod_rename_defines": "linear",
+    "mod_rename_function_by_signature": "linear",
+    "mod_rename_functions": "linear",
+    "mod_rename_prefix": "linear",
+    "mod_replace_typedef_with_opaque_buffer": "linear",
+    "mod_rewrite_containing_preprocessor_conditional": "linear",
+    "mod_rewrite_defines": "linear",
+    "mod_set_arguments_as_nullable": "linear",
+    "mod_wrap_with_extern_c": "linear"
+}
+
+# Modifiers that took less than this long (in seconds) at the largest size are too noisy to check
+min_modifier_time = 0.005
+
+
+# Convert a synthetic header of the scale given, returning a dictionary mapping modifier names to the total time spent
+# applying them
+def time_modifiers(header_path, imconfig_path, output_dir):
+    gc.collect()
+    gc.disable()
+    conversion_profiler = profiler.start()
+    try:
+        # The conversion process is quite chatty, so suppress its output
+        with contextlib.redirect_stdout(io.StringIO()):
+            dear_bindings.convert_header(header_path,
+                                         [imconfig_path],
+                                         os.path.join(output_dir, "dcimgui"),
+                                         os.path.join(os.path.dirname(os.path.realpath(dear_bindings.__file__)),
+                                                      "src", "templates"),
+                                         no_struct_by_value_arguments=False,
+                                         no_generate_default_arg_functions=False,
+                                         generate_unformatted_functions=True,
+                                         is_backend=False,
+                                         imgui_include_dir="",
+                                         backend_include_dir="",
+                                         emit_combined_json_metadata=False,
+                                         prefix_replacements={})
+    finally:
+        profiler.stop()
+        gc.enable()
+
+    return {name: total[1] for (category, name), total in conversion_profiler.get_totals().items()
+            if category == "modifier"}
+
+
+def run(base_scale, repeats):
+    unregistered = sorted(name for name in vars(modifiers) if name.startswith("mod_") and
+                          name not in modifier_complexity)
+    if len(unregistered) > 0:
+        print("Modifiers with no registered complexity class: " + ", ".join(unregistered))
+        return False
+    unknown_classes = sorted(name for name, complexity in modifier_complexity.items()
+                             if complexity not in complexity_limits)
+    if len(unknown_classes) > 0:
+        print("Modifiers registered with an unknown complexity class: " + ", ".join(unknown_classes))
+        return False
+
+    # Every modifier needs to be timed separately, so passes can't be fused
+    pass_manager.fuse_passes = False
+    profiler.instrument_modifiers(modifiers)
+
+    scales = [base_scale, base_scale * 2, base_scale * 4]
+    sizes = []
+    times = {}  # Modifier name -> list of the fastest time at each scale
+    for scale_index, scale in enumerate(scales):
+        with tempfile.TemporaryDirectory() as output_dir:
+            header_path, imconfig_path = synthetic_header.write_header(
+                synthetic_header.SyntheticHeaderSettings(scale), output_dir)
+            sizes.append(os.path.getsize(header_path))
+            for _ in range(repeats):
+                for name, modifier_time in time_modifiers(header_path, imconfig_path, output_dir).items():
+                    modifier_times = times.setdefault(name, [None] * len(scales))
+                    if (modifier_times[scale_index] is None) or (modifier_time < modifier_times[scale_index]):
+                        modifier_times[scale_index] = modifier_time
+
+    print("Synthetic header sizes " + ", ".join("%.0fKB" % (size / 1024) for size in sizes) +
+          " (scales " + ", ".join(str(scale) for scale in scales) + ")")
+    print("  %-54s %-9s %s %7s %7s  %s" % ("Modifier (time in ms)", "Class",
+                                          " ".join("%8s" % ("x" + str(scale)) for scale in scales), "Growth", "Limit",
+                                          "Result"))
+    failures = []
+    for name in sorted(modifier_complexity):
+        complexity = modifier_complexity[name]
+        limit = complexity_limits[complexity]
+        modifier_times = times.get(name)
+        if (modifier_times is None) or (None in modifier_times):
+            print("  %-54s %-9s %s" % (name, complexity, "(not used when converting the synthetic header)"))
+            continue
+        exponent = get_growth_exponent(sizes, modifier_times)
+        if modifier_times[-1] < min_modifier_time:
+            result = "(too fast to check)"
+        elif (exponent is not None) and (exponent > limit):
+            result = "FAIL"
+            failures.append(name)
+        else:
+            result = "OK"
+        print("  %-54s %-9s %s %s %7.2f  %s" % (name, complexity,
+                                               " ".join("%8.1f" % (t * 1000) for t in modifier_times),
+                                               format_exponent(exponent), limit, result))
+
+    if len(failures) > 0:
+        print(str(len(failures)) + " modifier(s) grew faster than their complexity class allows: " +
+              ", ".join(failures))
+        return False
+    print("All modifiers are within their complexity class")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Modifier scaling check")
+    parser.add_argument('--base-scale',
+                        type=int,
+                        default=2,
+                        help="Scale of the smallest synthetic header to convert (N), which is followed by 2N and 4N "
+                             "(default: 2)")
+    parser.add_argument('--repeats',
+                        type=int,
+                        default=3,
+                        help="Number of times to convert each header, taking the fastest time for each modifier "
+                             "(default: 3)")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.base_scale, args.repeats) else 1)
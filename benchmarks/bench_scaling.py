@@ -0,0 +1,171 @@
+# Benchmark for how the conversion pipeline scales with the size of the header
+# Generates synthetic headers (see synthetic_header.py) at increasing scales and converts each of them with
+# convert_header(), profiling every phase (see src/profiler.py). Reports the wall time and change in allocated memory
+# blocks of each phase at each scale, along with the peak RSS of each conversion, and flags phases whose time grows
+# faster than the size of the header (which usually means something is walking the DOM once per element). Growth is
+# estimated by fitting time = c * size^k to the results.
+# This doesn't need a copy of Dear ImGui, so it can be run anywhere.
+# Each conversion runs in a separate process, so that the peak RSS figures are independent of each other
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import dear_bindings
+from src import modifiers
+from src import profiler
+from benchmarks import synthetic_header
+
+# Phases that took less than this long (in seconds) at the largest scale are too noisy to draw conclusions from
+min_phase_time = 0.01
+
+
+def get_peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux (but bytes on macOS)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss /= 1024
+    return peak_rss / 1024
+
+
+# Generate a header of the scale given and convert it, printing the results as JSON
+def run_conversion(scale, output_dir):
+    header_path, imconfig_path = synthetic_header.write_header(synthetic_header.SyntheticHeaderSettings(scale),
+                                                                output_dir)
+
+    profiler.instrument_modifiers(modifiers)
+    conversion_profiler = profiler.start()
+    start_time = time.perf_counter()
+    # The conversion process is quite chatty, so suppress its output
+    with contextlib.redirect_stdout(io.StringIO()):
+        dear_bindings.convert_header(header_path,
+                                     [imconfig_path],
+                                     os.path.join(output_dir, "dcimgui"),
+                                     os.path.join(os.path.dirname(os.path.realpath(dear_bindings.__file__)), "src",
+                                                  "templates"),
+                                     no_struct_by_value_arguments=False,
+                                     no_generate_default_arg_functions=False,
+                                     generate_unformatted_functions=False,
+                                     is_backend=False,
+                                     imgui_include_dir="",
+                                     backend_include_dir="",
+                                     emit_combined_json_metadata=False,
+                                     prefix_replacements={})
+    total_time = time.perf_counter() - start_time
+    profiler.stop()
+
+    # Phase names are only unique within their category, so keep the category as part of the name
+    phases = {}
+    for (category, name), (_, wall_time, _, allocated_blocks, _, _) in conversion_profiler.get_totals().items():
+        phases[category + ": " + name] = [wall_time, allocated_blocks]
+    print(json.dumps({"header_size": os.path.getsize(header_path),
+                      "total_time": total_time,
+                      "peak_rss": get_peak_rss_mb(),
+                      "phases": phases}))
+    return True
+
+
+# Estimate the exponent k in value = c * size^k with a least-squares fit of log(value) against log(size), returning
+# None if that isn't possible
+def get_growth_exponent(sizes, values):
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, values) if (size > 0) and (value > 0)]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def format_exponent(exponent):
+    return "%7.2f" % exponent if exponent is not None else "%7s" % "-"
+
+
+def run(scales, max_exponent, show_all):
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = subprocess.run([sys.executable, "-m", "benchmarks.bench_scaling", "--scale", str(scale),
+                                     "--output", output_dir],
+                                    capture_output=True, text=True)
+        if result.returncode != 0:
+            print("Conversion at scale " + str(scale) + " failed:")
+            print(result.stdout + result.stderr)
+            return False
+        results.append(json.loads(result.stdout.splitlines()[-1]))
+
+    first, last = results[0], results[-1]
+    sizes = [result["header_size"] for result in results]
+    size_ratio = last["header_size"] / first["header_size"]
+    print("Scales " + ", ".join(str(scale) for scale in scales) + " (header sizes " +
+          ", ".join("%.0fKB" % (result["header_size"] / 1024) for result in results) + ", %.1fx growth)" % size_ratio)
+    print("Growth is the exponent k in time = c * size^k, so 1.0 is linear and 2.0 is quadratic")
+    print("  %-8s %s" % ("Total", " ".join("%9.3fs" % result["total_time"] for result in results)) +
+          "   Growth " + format_exponent(get_growth_exponent(sizes, [result["total_time"] for result in results])))
+    print("  %-8s %s" % ("Peak RSS", " ".join("%8.1fMB" % result["peak_rss"] for result in results)))
+    print()
+
+    flagged = []
+    rows = []
+    for phase_name in last["phases"]:
+        times = [result["phases"].get(phase_name, [0.0, 0])[0] for result in results]
+        blocks = last["phases"][phase_name][1]
+        time_exponent = get_growth_exponent(sizes, times)
+        is_super_linear = (time_exponent is not None) and (time_exponent > max_exponent) and \
+                          (times[-1] >= min_phase_time)
+        if is_super_linear:
+            flagged.append((phase_name, time_exponent))
+        if show_all or is_super_linear or (times[-1] >= min_phase_time):
+            rows.append((phase_name, times, blocks, time_exponent, is_super_linear))
+
+    print("  %-60s %s %7s %12s" % ("Phase (time in ms)", " ".join("%9s" % ("x" + str(scale)) for scale in scales),
+                                   "Growth", "Blocks"))
+    for phase_name, times, blocks, time_exponent, is_super_linear in sorted(rows, key=lambda row: row[1][-1],
+                                                                              reverse=True):
+        if len(phase_name) > 60:
+            phase_name = phase_name[:57] + "..."
+        print("  %-60s %s %s %12d%s" % (phase_name, " ".join("%9.1f" % (t * 1000) for t in times),
+                                        format_exponent(time_exponent), blocks,
+                                        "  <- super-linear" if is_super_linear else ""))
+
+    print()
+    if len(flagged) > 0:
+        print("Phases growing faster than size^%.2f:" % max_exponent)
+        for phase_name, time_exponent in sorted(flagged, key=lambda item: item[1], reverse=True):
+            print("  %s (growth %.2f)" % (phase_name, time_exponent))
+    else:
+        print("No phases grew faster than size^%.2f" % max_exponent)
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Conversion scaling benchmark")
+    parser.add_argument('--scales',
+                        default="1,2,4,8",
+                        help="Comma-separated list of synthetic header scales to convert (default: 1,2,4,8)")
+    parser.add_argument('--max-exponent',
+                        type=float,
+                        default=1.3,
+                        help="Flag phases whose time grows faster than size to this power (default: 1.3)")
+    parser.add_argument('--all',
+                        action='store_true',
+                        help="Show all phases, rather than just those that take a significant amount of time")
+    parser.add_argument('--scale',
+                        type=int,
+                        help="Perform a single conversion at the scale given and print the raw results (this is "
+                             "used internally to run each conversion in a separate process)")
+    parser.add_argument('--output',
+                        help="Directory to write the output of a single conversion to (with --scale)")
+    args = parser.parse_args()
+    if args.scale is not None:
+        sys.exit(0 if run_conversion(args.scale, args.output) else 1)
+    sys.exit(0 if run(sorted(int(scale) for scale in args.scales.split(",")), args.max_exponent, args.all) else 1)
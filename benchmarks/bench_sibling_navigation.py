@@ -0,0 +1,162 @@
+# Benchmark for sibling navigation and insertion
+# Parses a header and then walks every child list in it from start to finish with get_next_child(), and inserts a chain
+# of new elements one after another with insert_after_child() - both using the old approach of scanning the child lists
+# to find each element's position, and using the cached positions in DOMElement - and then removes all the blank lines
+# from that list as they are walked over, both one at a time with remove_child() and in one go with remove_children(),
+# and checks the results match
+
+import argparse
+import io
+import os
+import sys
+import time
+from src import c_lexer
+from src import code_dom
+from src import token_stream
+
+
+# The old implementation of get_next_child(), which scans the child lists to find the child
+def scanning_get_next_child(parent, child):
+    for child_list in parent.get_child_lists():
+        for i in range(0, len(child_list)):
+            if child_list[i] == child:
+                if i < (len(child_list) - 1):
+                    return child_list[i + 1]
+                else:
+                    return None
+    raise Exception("Child not found in any list")
+
+
+# The old implementation of insert_after_child()
+def scanning_insert_after_child(parent, existing_child, new_children):
+    new_children.reverse()  # We're going to insert in backwards order
+    for child_list in parent.get_child_lists():
+        for i in range(0, len(child_list)):
+            if child_list[i] == existing_child:
+                for new_child in new_children:
+                    if new_child.parent is not None:
+                        new_child.parent.remove_child(new_child)
+                    child_list.insert(i + 1, new_child)
+                    new_child.parent = parent
+                return
+    raise Exception("Unable to find child to insert after")
+
+
+def parse(source, filename):
+    lexer = c_lexer.create_lexer()
+    lexer.input(source)
+    stream = token_stream.TokenStream(lexer)
+    context = code_dom.ParseContext()
+    return code_dom.DOMHeaderFile.parse(context, stream, filename)
+
+
+# Walk every child list in the DOM using the get_next_child function given, returning the number of steps taken
+def walk_all_siblings(dom_root, get_next_child):
+    steps = 0
+    for element in dom_root.list_all_children_of_type(code_dom.DOMElement):
+        for child_list in element.get_writable_child_lists():
+            if len(child_list) == 0:
+                continue
+            current = child_list[0]
+            while current is not None:
+                current = get_next_child(element, current)
+                steps += 1
+    return steps
+
+
+# Find the element with the longest list of children in the DOM
+def find_largest_element(dom_root):
+    return max(dom_root.list_all_children_of_type(code_dom.DOMElement), key=lambda element: len(element.children))
+
+
+# Insert a chain of blank lines into the middle of the longest child list in the DOM, each after the previous one
+def insert_chain(dom_root, count, insert_after_child):
+    parent = find_largest_element(dom_root)
+    insert_point = parent.children[len(parent.children) // 2]
+    for i in range(0, count):
+        new_element = code_dom.DOMBlankLines(1)
+        insert_after_child(parent, insert_point, [new_element])
+        insert_point = new_element
+
+
+# Walk the longest child list in the DOM, removing every blank line element in it, either one at a time as they are
+# found or all together at the end, returning the number of elements removed
+def remove_blank_lines(dom_root, remove_one_at_a_time):
+    parent = find_largest_element(dom_root)
+    to_remove = []
+    current = parent.children[0]
+    while current is not None:
+        next_child = parent.get_next_child(current)
+        if isinstance(current, code_dom.DOMBlankLines):
+            if remove_one_at_a_time:
+                parent.remove_child(current)
+            to_remove.append(current)
+        current = next_child
+    if not remove_one_at_a_time:
+        parent.remove_children(to_remove)
+    return len(to_remove)
+
+
+def render(dom_root):
+    file = io.StringIO()
+    dom_root.write_to_c(file)
+    return file.getvalue()
+
+
+def run(src_file, chain_length):
+    with open(src_file, "r") as f:
+        source = f.read()
+    filename = os.path.basename(src_file)
+
+    before_dom = parse(source, filename)
+    after_dom = parse(source, filename)
+
+    start_time = time.perf_counter()
+    num_steps = walk_all_siblings(before_dom, scanning_get_next_child)
+    before_walk_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    walk_all_siblings(after_dom, lambda parent, child: parent.get_next_child(child))
+    after_walk_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    insert_chain(before_dom, chain_length, scanning_insert_after_child)
+    before_insert_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    insert_chain(after_dom, chain_length, lambda parent, child, new_children: parent.insert_after_child(child,
+                                                                                                         new_children))
+    after_insert_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    num_removed = remove_blank_lines(before_dom, True)
+    before_remove_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    remove_blank_lines(after_dom, False)
+    after_remove_time = time.perf_counter() - start_time
+
+    if render(before_dom) != render(after_dom):
+        print("Error: DOMs produced with scanning and cached positions differ")
+        return False
+
+    print(filename + ": " + str(len(find_largest_element(after_dom).children)) +
+          " elements in the largest child list after insertion and removal")
+    print("  Walk siblings (%d steps)  : scanning %.3fs, cached %.3fs (%.1fx)" %
+          (num_steps, before_walk_time, after_walk_time, before_walk_time / after_walk_time))
+    print("  Insert chain (%d elements) : scanning %.3fs, cached %.3fs (%.1fx)" %
+          (chain_length, before_insert_time, after_insert_time, before_insert_time / after_insert_time))
+    print("  Remove (%d elements)       : one at a time %.3fs, batched %.3fs (%.1fx)" %
+          (num_removed, before_remove_time, after_remove_time, before_remove_time / after_remove_time))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sibling navigation/insertion benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default="../imgui/imgui_internal.h",
+                        help="Header file to parse (default: ../imgui/imgui_internal.h)")
+    parser.add_argument('--chain-length',
+                        type=int,
+                        default=2000,
+                        help="Number of elements to insert one after another (default: 2000)")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.src, args.chain_length) else 1)
@@ -0,0 +1,91 @@
+# Benchmark for whitespace/newline skipping in the token stream
+# Parses a header twice - once skipping trivia tokens by examining them one at a time (the old behaviour), and once
+# using the precomputed skip tables in TokenStream - and reports how many tokens were touched per parsed element
+
+import argparse
+import io
+import os
+import sys
+import time
+from src import c_lexer
+from src import code_dom
+from src import token_stream
+
+
+# Token stream that skips tokens by scanning, counting each token it examines
+class ScanningTokenStream(token_stream.TokenStream):
+    def __init__(self, lexer):
+        super().__init__(lexer)
+        self.tokens_touched = 0
+
+    def find_next_token_index(self, index, skip_newlines, skip_whitespace):
+        num_tokens = len(self.tokens)
+        while index < num_tokens:
+            self.tokens_touched += 1
+            if not self.is_skippable(self.tokens[index], skip_newlines, skip_whitespace):
+                break
+            index += 1
+        return index
+
+
+# Token stream that uses the skip tables, counting each lookup as a single token touched
+class IndexedTokenStream(token_stream.TokenStream):
+    def __init__(self, lexer):
+        super().__init__(lexer)
+        self.tokens_touched = 0
+
+    def find_next_token_index(self, index, skip_newlines, skip_whitespace):
+        self.tokens_touched += 1
+        return token_stream.TokenStream.find_next_token_index(self, index, skip_newlines, skip_whitespace)
+
+
+# Parse the source given using the stream class supplied, returning (DOM, stream, parse context, parse time)
+def parse_with_stream(source, filename, stream_class):
+    lexer = c_lexer.create_lexer()
+    lexer.input(source)
+    stream = stream_class(lexer)
+    start_time = time.perf_counter()
+    context = code_dom.ParseContext()
+    dom_root = code_dom.DOMHeaderFile.parse(context, stream, filename)
+    return dom_root, stream, context, time.perf_counter() - start_time
+
+
+# Render a DOM back to C++ so that two parses can be compared
+def render(dom_root):
+    file = io.StringIO()
+    dom_root.write_to_c(file)
+    return file.getvalue()
+
+
+def run(src_file):
+    with open(src_file, "r") as f:
+        source = f.read()
+    filename = os.path.basename(src_file)
+
+    before_dom, before_stream, _, before_time = parse_with_stream(source, filename, ScanningTokenStream)
+    after_dom, after_stream, context, after_time = parse_with_stream(source, filename, IndexedTokenStream)
+
+    if render(before_dom) != render(after_dom):
+        print("Error: DOMs produced with and without skip tables differ")
+        return False
+
+    num_elements = len(after_dom.list_all_children_of_type(code_dom.DOMElement))
+
+    print(filename + ": " + str(len(after_stream.tokens)) + " tokens, " + str(num_elements) + " elements")
+    print("  Scanning    : %d tokens touched (%.1f per element), parsed in %.3fs" %
+          (before_stream.tokens_touched, before_stream.tokens_touched / num_elements, before_time))
+    print("  Skip tables : %d tokens touched (%.1f per element), parsed in %.3fs" %
+          (after_stream.tokens_touched, after_stream.tokens_touched / num_elements, after_time))
+    print("  Declaration classifier : %d speculative function parses avoided, %d failed" %
+          (context.num_speculative_parses_avoided, context.num_speculative_parses_failed))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Token stream trivia-skipping benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default="../imgui/imgui_internal.h",
+                        help="Header file to parse (default: ../imgui/imgui_internal.h)")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.src) else 1)
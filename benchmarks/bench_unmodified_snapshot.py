@@ -0,0 +1,142 @@
+# Benchmark for storing the unmodified DOM
+# Converts a header twice, once using the old approach of deep-cloning the entire DOM to keep the original versions of
+# elements around and once using lightweight element snapshots (DOMElementSnapshot), and reports the time taken and
+# peak memory usage of each, checking that both produce the same files
+# Each conversion runs in a separate process, so that the peak RSS figures are independent of each other
+
+import argparse
+import contextlib
+import copy
+import filecmp
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import dear_bindings
+from src import code_dom
+
+modes = ["clones", "snapshots"]
+
+
+# The old implementation of save_unmodified_snapshots(), which stores a complete clone of each element
+def save_unmodified_clones(element):
+    attach_unmodified_clones(element, copy.deepcopy(element))
+
+
+def attach_unmodified_clones(element, clone):
+    element.unmodified_element = clone
+    for child_list, clone_child_list in zip(element.get_child_lists(), clone.get_child_lists()):
+        for child, clone_child in zip(child_list, clone_child_list):
+            attach_unmodified_clones(child, clone_child)
+
+
+def get_peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux (but bytes on macOS)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss /= 1024
+    return peak_rss / 1024
+
+
+# Convert the header using the mode given, printing a line with the save time, total time, peak RSS and the growth in
+# peak RSS caused by storing the unmodified DOM
+def run_conversion(src_file, include_files, output_dir, mode):
+    save_function = save_unmodified_clones if mode == "clones" else code_dom.DOMElement.save_unmodified_snapshots
+    save_stats = {}
+
+    def timed_save(dom_root):
+        rss_before = get_peak_rss_mb()
+        start_time = time.perf_counter()
+        save_function(dom_root)
+        save_stats["time"] = time.perf_counter() - start_time
+        save_stats["rss_growth"] = get_peak_rss_mb() - rss_before
+
+    code_dom.DOMElement.save_unmodified_snapshots = timed_save
+
+    start_time = time.perf_counter()
+    # The conversion process is quite chatty, so suppress its output
+    with contextlib.redirect_stdout(io.StringIO()):
+        dear_bindings.convert_header(src_file,
+                                     [os.path.join(os.path.dirname(src_file), "imconfig.h")] + include_files,
+                                     os.path.join(output_dir, "dcimgui"),
+                                     os.path.join(os.path.dirname(os.path.realpath(dear_bindings.__file__)), "src",
+                                                  "templates"),
+                                     no_struct_by_value_arguments=False,
+                                     no_generate_default_arg_functions=False,
+                                     generate_unformatted_functions=False,
+                                     is_backend=False,
+                                     imgui_include_dir="",
+                                     backend_include_dir="",
+                                     emit_combined_json_metadata=False,
+                                     prefix_replacements={})
+    total_time = time.perf_counter() - start_time
+
+    print("%f %f %f %f" % (save_stats["time"], total_time, get_peak_rss_mb(), save_stats["rss_growth"]))
+    return True
+
+
+def run(src_file, include_files):
+    src_file = os.path.realpath(src_file)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as clones_dir, tempfile.TemporaryDirectory() as snapshots_dir:
+        output_dirs = {"clones": clones_dir, "snapshots": snapshots_dir}
+        for mode in modes:
+            result = subprocess.run([sys.executable, "-m", "benchmarks.bench_unmodified_snapshot", src_file,
+                                     "--mode", mode, "--output", output_dirs[mode]] +
+                                    ["--include=" + include_file for include_file in include_files],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print("Conversion using " + mode + " failed:")
+                print(result.stdout + result.stderr)
+                return False
+            results[mode] = [float(value) for value in result.stdout.split()]
+
+        output_files = sorted(os.listdir(clones_dir))
+        _, mismatches, errors = filecmp.cmpfiles(clones_dir, snapshots_dir, output_files, shallow=False)
+
+    print(os.path.basename(src_file))
+    print("                         Deep clones   Snapshots")
+    print("  Store unmodified DOM : %9.3fs  %9.3fs" % (results["clones"][0], results["snapshots"][0]))
+    print("  Total conversion     : %9.3fs  %9.3fs" % (results["clones"][1], results["snapshots"][1]))
+    print("  Peak RSS             : %8.1fMB  %8.1fMB" % (results["clones"][2], results["snapshots"][2]))
+    print("  Peak RSS growth      : %8.1fMB  %8.1fMB (while storing the unmodified DOM)" %
+          (results["clones"][3], results["snapshots"][3]))
+
+    if (len(mismatches) > 0) or (len(errors) > 0):
+        print("Output mismatch between clones and snapshots: " + ", ".join(mismatches + errors))
+        return False
+    print("  Output of " + str(len(output_files)) + " files is identical")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Unmodified DOM storage benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default=os.path.join("..", "imgui", "imgui_internal.h"),
+                        help="Header to convert (default: ../imgui/imgui_internal.h)")
+    parser.add_argument('--include',
+                        action='append',
+                        help="Additional header to include (default: imgui.h from the same directory as the header "
+                             "being converted, if that isn't imgui.h itself)")
+    parser.add_argument('--mode',
+                        choices=modes,
+                        help="Perform a single conversion using the mode given and print the raw results (this is "
+                             "used internally to run each mode in a separate process)")
+    parser.add_argument('--output',
+                        help="Directory to write the output of a single conversion to (with --mode)")
+    args = parser.parse_args()
+    if args.include is not None:
+        includes = [os.path.realpath(include) for include in args.include]
+    elif os.path.basename(args.src) != "imgui.h":
+        # Headers other than imgui.h itself (such as imgui_internal.h) need imgui.h to be included to convert properly
+        includes = [os.path.join(os.path.dirname(os.path.realpath(args.src)), "imgui.h")]
+    else:
+        includes = []
+    if args.mode is not None:
+        sys.exit(0 if run_conversion(os.path.realpath(args.src), includes, args.output, args.mode) else 1)
+    sys.exit(0 if run(args.src, includes) else 1)
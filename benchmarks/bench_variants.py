@@ -0,0 +1,92 @@
+# Benchmark for generating several variants of the same header
+# Converts the four common variants of imgui.h (with/without --nopassingstructsbyvalue and
+# --nogeneratedefaultargfunctions) by running the whole pipeline once per variant, and then again by forking each
+# variant from a snapshot of the DOM taken at the last modifier they all have in common, and checks that both approaches
+# produce the same files
+
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+import dear_bindings
+
+
+# The variants to generate, as (name, no_struct_by_value_arguments, no_generate_default_arg_functions)
+variant_options = [
+    ("default", False, False),
+    ("nogeneratedefaultargfunctions", False, True),
+    ("nopassingstructsbyvalue", True, False),
+    ("nopassingstructsbyvalue_nogeneratedefaultargfunctions", True, True)
+]
+
+
+# Get the list of variant settings (as used by dear_bindings.convert_header_variants()) to write into output_dir
+def get_variants(output_dir):
+    variants = []
+    for name, no_struct_by_value_arguments, no_generate_default_arg_functions in variant_options:
+        variants.append({
+            "dest_file_no_ext": os.path.join(output_dir, "dcimgui_" + name),
+            "template_dir": os.path.join(os.path.dirname(os.path.realpath(dear_bindings.__file__)), "src", "templates"),
+            "no_struct_by_value_arguments": no_struct_by_value_arguments,
+            "no_generate_default_arg_functions": no_generate_default_arg_functions,
+            "generate_unformatted_functions": False,
+            "imgui_include_dir": "",
+            "backend_include_dir": "",
+            "emit_combined_json_metadata": False,
+            "prefix_replacements": {}
+        })
+    return variants
+
+
+# Convert every variant separately, returning the time taken in seconds
+def time_separate(src_file, include_files, output_dir):
+    start_time = time.perf_counter()
+    for variant in get_variants(output_dir):
+        dear_bindings.convert_header(src_file, include_files, is_backend=False, **variant)
+    return time.perf_counter() - start_time
+
+
+# Convert all the variants from a shared snapshot, returning the time taken in seconds
+def time_forked(src_file, include_files, output_dir):
+    start_time = time.perf_counter()
+    dear_bindings.convert_header_variants(src_file, include_files, False, get_variants(output_dir))
+    return time.perf_counter() - start_time
+
+
+def run(src_file):
+    src_file = os.path.realpath(src_file)
+    include_files = [os.path.join(os.path.dirname(src_file), "imconfig.h")]
+
+    with tempfile.TemporaryDirectory() as separate_dir, tempfile.TemporaryDirectory() as forked_dir:
+        # The conversion process is quite chatty, so suppress its output
+        with contextlib.redirect_stdout(io.StringIO()):
+            before = time_separate(src_file, include_files, separate_dir)
+            after = time_forked(src_file, include_files, forked_dir)
+
+        output_files = sorted(os.listdir(separate_dir))
+        _, mismatches, errors = filecmp.cmpfiles(separate_dir, forked_dir, output_files, shallow=False)
+
+    print(os.path.basename(src_file) + ", " + str(len(variant_options)) + " variants")
+    print("  Separate pipelines : %.3fs (%.3fs per variant)" % (before, before / len(variant_options)))
+    print("  Forked from snapshot : %.3fs (%.3fs per variant)" % (after, after / len(variant_options)))
+    print("  Speedup            : %.2fx" % (before / after))
+
+    if (len(mismatches) > 0) or (len(errors) > 0):
+        print("Output mismatch between separate and forked conversion: " + ", ".join(mismatches + errors))
+        return False
+    print("  Output of " + str(len(output_files)) + " files is identical")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Variant generation benchmark")
+    parser.add_argument('src',
+                        nargs='?',
+                        default=os.path.join("..", "imgui", "imgui.h"),
+                        help="Header to convert (default: ../imgui/imgui.h)")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.src) else 1)
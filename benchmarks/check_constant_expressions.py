@@ -0,0 +1,99 @@
+# Checks for src/constant_expressions.py
+# Evaluates a set of expressions and checks that each gives the value a C compiler would, or fails with a
+# ConstantExpressionError (rather than crashing, running out of memory or producing a wrong value) if it isn't
+# something we can evaluate. This exits with a non-zero result code if any check fails, so it can be used in CI.
+
+import sys
+from src import constant_expressions
+
+# Known values that expressions can reference
+check_values = {
+    "ImGuiKey_NamedKey_BEGIN": 512,
+    "ImGuiKey_NamedKey_END": 666
+}
+
+# Expressions and the value they should evaluate to
+value_checks = [
+    ("1 << 30", 1073741824),
+    ("0xFF000000", 4278190080),
+    ("ImGuiKey_NamedKey_END - ImGuiKey_NamedKey_BEGIN", 154),
+    ("(int)-1", -1),
+    ("(int)ImGuiKey_NamedKey_BEGIN", 512),
+    ("-7 / 2", -3),
+    ("-7 % 2", -1),
+    ("1 ? 2 : 3", 2),
+    ("0 && (1 / 0)", 0),
+    # Unsigned arithmetic wraps, and mixing signed and unsigned operands converts the signed one
+    ("~0u", 4294967295),
+    ("0u - 1", 4294967295),
+    ("-1 < 0u", 0),
+    ("1 ? -1 : 0u", 4294967295),
+    ("(unsigned char)-1", 255),
+    ("~0ull", 18446744073709551615),
+    ("1ull << 63", 9223372036854775808),
+    ("0xFFFFFFFFFFFFFFFF", 18446744073709551615)
+]
+
+# Expressions that should fail to evaluate
+error_checks = [
+    "",
+    "1 +",
+    "(1",
+    "sizeof(int)",
+    "UnknownValue",
+    "1 / 0",
+    "1 % 0",
+    # Signed overflow is undefined
+    "2147483647 + 1",
+    "9223372036854775807ll + 1",
+    # Shifts by the width of the type or more are undefined
+    "1 << 32",
+    "1 << 4000000000",
+    "1 << (1 << 40)",
+    "1ull << 64",
+    # Literals too large for any type
+    "0x10000000000000000",
+    "1" * 100000,
+    # Casts to types we don't know the size of can't be evaluated unless the value fits in anything
+    "(ImU8)256",
+    # The result of these depends on the size of long
+    "1ul << 40",
+    "-1L < 0u",
+    # Expressions too large or deeply nested to evaluate safely
+    "(" * 300 + "1" + ")" * 300,
+    "-" * 300 + "1",
+    "1 ? " * 100 + "1" + " : 0" * 100,
+    " + ".join(["1"] * 1000)
+]
+
+
+def run():
+    failures = []
+    for expression, expected_value in value_checks:
+        try:
+            value = constant_expressions.evaluate(expression, check_values)
+        except constant_expressions.ConstantExpressionError as e:
+            failures.append(expression + " failed to evaluate (" + str(e) + ")")
+            continue
+        if value != expected_value:
+            failures.append(expression + " evaluated to " + str(value) + " rather than " + str(expected_value))
+
+    for expression in error_checks:
+        try:
+            value = constant_expressions.evaluate(expression, check_values)
+        except constant_expressions.ConstantExpressionError:
+            continue
+        except Exception as e:
+            failures.append(expression[:40] + " raised " + type(e).__name__ + " rather than ConstantExpressionError")
+            continue
+        failures.append(expression[:40] + " evaluated to " + str(value) + " rather than failing")
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    print(str(len(value_checks) + len(error_checks) - len(failures)) + " of " +
+          str(len(value_checks) + len(error_checks)) + " constant expression checks passed")
+    return len(failures) == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,82 @@
+# Checks for the DOMElement child editing functions
+# Applies a set of edits (including ones where the children being inserted are already in the list being edited, or
+# include the element being replaced) to small trees and checks that the children end up in the expected order, and
+# that the cached child positions used for sibling navigation are still consistent afterwards. This exits with a
+# non-zero result code if any check fails, so it can be used in CI.
+
+import sys
+from src import code_dom
+
+# Each check is a description, a function that applies the edit to a root element and a dictionary of its children
+# (a, b, c and d, initially in that order), and the expected names of the children afterwards
+edit_checks = [
+    ("replace_child(a, [a, e])", lambda root, e: root.replace_child(e["a"], [e["a"], e["e"]]), "aebcd"),
+    ("replace_child(a, [e, a])", lambda root, e: root.replace_child(e["a"], [e["e"], e["a"]]), "eabcd"),
+    ("replace_child(b, [e])", lambda root, e: root.replace_child(e["b"], [e["e"]]), "aecd"),
+    ("replace_child(b, [])", lambda root, e: root.replace_child(e["b"], []), "acd"),
+    ("replace_child(c, [a, c])", lambda root, e: root.replace_child(e["c"], [e["a"], e["c"]]), "bacd"),
+    ("replace_child(b, [d, a])", lambda root, e: root.replace_child(e["b"], [e["d"], e["a"]]), "dac"),
+    ("insert_before_child(c, [a])", lambda root, e: root.insert_before_child(e["c"], [e["a"]]), "bacd"),
+    ("insert_before_child(b, [b, e])", lambda root, e: root.insert_before_child(e["b"], [e["b"], e["e"]]), "abecd"),
+    ("insert_after_child(a, [d])", lambda root, e: root.insert_after_child(e["a"], [e["d"]]), "adbc"),
+    ("insert_after_child(d, [a, e])", lambda root, e: root.insert_after_child(e["d"], [e["a"], e["e"]]), "bcdae"),
+    ("insert_after_child(b, [b, e])", lambda root, e: root.insert_after_child(e["b"], [e["b"], e["e"]]), "abecd"),
+    ("remove_children([b, d])", lambda root, e: root.remove_children([e["b"], e["d"]]), "ac")
+]
+
+
+# Check that the child positions cached by root are consistent with its children, returning a description of the
+# problem if not
+def check_child_positions(root):
+    for index, child in enumerate(root.children):
+        child_list, found_index = root.find_child(child)
+        if (child_list is not root.children) or (found_index != index):
+            return "find_child() gave the wrong position for child " + str(index)
+        expected_next = root.children[index + 1] if index < (len(root.children) - 1) else None
+        if root.get_next_child(child) is not expected_next:
+            return "get_next_child() gave the wrong sibling for child " + str(index)
+    return None
+
+
+def run():
+    failures = []
+    for description, edit, expected_names in edit_checks:
+        root = code_dom.DOMElement()
+        elements = {}
+        for name in "abcde":
+            elements[name] = code_dom.DOMElement()
+        root.add_children([elements[name] for name in "abcd"])
+        names = {element: name for name, element in elements.items()}
+
+        # Walk the children first, so that there are cached positions for the edit to keep up-to-date
+        problem = check_child_positions(root)
+
+        try:
+            edit(root, elements)
+        except Exception as e:
+            failures.append(description + " raised " + type(e).__name__ + ": " + str(e))
+            continue
+
+        result_names = "".join(names[child] for child in root.children)
+        if result_names != expected_names:
+            failures.append(description + " gave " + result_names + " rather than " + expected_names)
+            continue
+
+        try:
+            root.validate_hierarchy()
+        except Exception as e:
+            failures.append(description + " left an invalid hierarchy (" + str(e) + ")")
+            continue
+
+        problem = problem or check_child_positions(root)
+        if problem is not None:
+            failures.append(description + ": " + problem)
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    print(str(len(edit_checks) - len(failures)) + " of " + str(len(edit_checks)) + " DOM editing checks passed")
+    return len(failures) == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,42 @@
+# Checks that the parser recovers from input it doesn't recognise
+# Parses a set of headers containing elements the parser can't make sense of inside each kind of scope, and checks that
+# each one gets reported and skipped rather than stopping the parse with an exception. This exits with a non-zero
+# result code if any check fails, so it can be used in CI.
+
+import contextlib
+import io
+import sys
+from src import c_lexer
+from src import code_dom
+
+# Headers containing unrecognised elements, and the scope each one is in
+recovery_checks = [
+    ("struct Foo\n{\n    int a;\n    ) ;\n};\n", "DOMClassStructUnion"),
+    ("extern \"C\"\n{\n    int a;\n    ) ;\n}\n", "DOMExternC"),
+    ("namespace Foo\n{\n    int a;\n    ) ;\n}\n", "DOMNamespace")
+]
+
+
+def run():
+    failures = []
+    for header, scope in recovery_checks:
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                code_dom.DOMHeaderFile.parse(code_dom.ParseContext(), c_lexer.tokenize(header), "check.h")
+        except Exception as e:
+            failures.append("Parsing an unrecognised element in " + scope + " raised " + type(e).__name__ + ": " +
+                            str(e))
+            continue
+        if ("Unrecognised element" not in log.getvalue()) or (scope not in log.getvalue()):
+            failures.append("Unrecognised element in " + scope + " was not reported")
+
+    for failure in failures:
+        print("FAIL: " + failure)
+    print(str(len(recovery_checks) - len(failures)) + " of " + str(len(recovery_checks)) +
+          " parser recovery checks passed")
+    return len(failures) == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,278 @@
+# Synthetic header generator
+# Generates headers in the style of imgui.h with a configurable number of each of the constructs that the conversion
+# pipeline has to deal with, so that the performance of the pipeline can be measured on inputs of different sizes
+# without needing a copy of Dear ImGui.
+# The generated header is called imgui.h (so that the normal templates get used for it), and should be converted with
+# the imconfig.h generated alongside it as an include file. For example:
+#   python -m benchmarks.synthetic_header --scale 4 --output /tmp/synthetic
+#   python dear_bindings.py --imconfig-path /tmp/synthetic/imconfig.h -o /tmp/synthetic/dcimgui /tmp/synthetic/imgui.h
+
+import argparse
+import os
+import sys
+
+
+# The number of each construct to generate for a header of a given scale
+# At scale 1 the generated header is roughly a quarter of the size of imgui.h
+class SyntheticHeaderSettings:
+    def __init__(self, scale=1):
+        self.num_functions = 100 * scale  # Functions in the ImGui namespace
+        self.num_overloaded_functions = 20 * scale  # Functions with several overloads (which need disambiguating)
+        self.num_overloads = 3  # Overloads of each overloaded function
+        self.default_argument_interval = 2  # Every nth function gets default arguments
+        self.num_structs = 20 * scale  # Structs with fields and member functions
+        self.num_member_functions = 4  # Member functions in each struct
+        self.num_vector_types = 10 * scale  # Distinct ImVector<T> instantiations
+        self.num_conditional_blocks = 10 * scale  # Blocks of functions inside nested #ifdefs
+        self.conditional_depth = 2  # Nesting depth of each block
+        self.num_enums = 10 * scale  # Enums (half of which are flags enums)
+        self.num_enum_values = 8  # Values in each enum
+
+
+# The parts of the header that don't depend on the settings (based on the equivalent parts of imgui.h)
+header_prologue = """// Synthetic header generated by benchmarks/synthetic_header.py
+
+#pragma once
+
+#ifndef IMGUI_DISABLE
+
+#define IMGUI_VERSION       "1.92.0 synthetic"
+#define IMGUI_VERSION_NUM   19200
+
+#ifndef IMGUI_API
+#define IMGUI_API
+#endif
+
+#include <float.h>
+#include <stdarg.h>
+#include <stddef.h>
+#include <string.h>
+
+#ifndef IM_ASSERT
+#include <assert.h>
+#define IM_ASSERT(_EXPR)            assert(_EXPR)
+#endif
+#define IM_ARRAYSIZE(_ARR)          ((int)(sizeof(_ARR) / sizeof(*(_ARR))))
+#define IM_ALLOC(_SIZE)             ImGui::MemAlloc(_SIZE)
+#define IM_FREE(_PTR)               ImGui::MemFree(_PTR)
+
+typedef unsigned int        ImGuiID;
+typedef signed int          ImS32;
+typedef unsigned int        ImU32;
+typedef int                 ImGuiCond;
+
+struct ImVec2
+{
+    float                                   x, y;
+    constexpr ImVec2()                      : x(0.0f), y(0.0f) { }
+    constexpr ImVec2(float _x, float _y)    : x(_x), y(_y) { }
+    float& operator[] (size_t idx)          { IM_ASSERT(idx == 0 || idx == 1); return ((float*)(void*)(char*)this)[idx]; }
+};
+
+struct ImVec4
+{
+    float                                                     x, y, z, w;
+    constexpr ImVec4()                                        : x(0.0f), y(0.0f), z(0.0f), w(0.0f) { }
+    constexpr ImVec4(float _x, float _y, float _z, float _w)  : x(_x), y(_y), z(_z), w(_w) { }
+};
+
+namespace ImGui
+{
+    IMGUI_API void*         MemAlloc(size_t size);
+    IMGUI_API void          MemFree(void* ptr);
+}
+
+template<typename T>
+struct ImVector
+{
+    int                 Size;
+    int                 Capacity;
+    T*                  Data;
+
+    // Provide standard typedefs but we don't use them ourselves.
+    typedef T                   value_type;
+    typedef value_type*         iterator;
+    typedef const value_type*   const_iterator;
+
+    // Constructors, destructor
+    inline ImVector()                                       { Size = Capacity = 0; Data = NULL; }
+    inline ImVector(const ImVector<T>& src)                 { Size = Capacity = 0; Data = NULL; operator=(src); }
+    inline ImVector<T>& operator=(const ImVector<T>& src)   { clear(); resize(src.Size); memcpy(Data, src.Data, (size_t)Size * sizeof(T)); return *this; }
+    inline ~ImVector()                                      { if (Data) IM_FREE(Data); }
+
+    inline bool         empty() const                       { return Size == 0; }
+    inline int          size() const                        { return Size; }
+    inline T&           operator[](int i)                   { IM_ASSERT(i >= 0 && i < Size); return Data[i]; }
+    inline const T&     operator[](int i) const             { IM_ASSERT(i >= 0 && i < Size); return Data[i]; }
+    inline void         clear()                             { if (Data) { Size = Capacity = 0; IM_FREE(Data); Data = NULL; } }
+    inline T*           begin()                             { return Data; }
+    inline T*           end()                               { return Data + Size; }
+    inline T&           back()                              { IM_ASSERT(Size > 0); return Data[Size - 1]; }
+    inline int          _grow_capacity(int sz) const        { int new_capacity = Capacity ? (Capacity + Capacity / 2) : 8; return new_capacity > sz ? new_capacity : sz; }
+    inline void         resize(int new_size)                { if (new_size > Capacity) reserve(_grow_capacity(new_size)); Size = new_size; }
+    inline void         reserve(int new_capacity)           { if (new_capacity <= Capacity) return; T* new_data = (T*)IM_ALLOC((size_t)new_capacity * sizeof(T)); if (Data) { memcpy(new_data, Data, (size_t)Size * sizeof(T)); IM_FREE(Data); } Data = new_data; Capacity = new_capacity; }
+    inline void         push_back(const T& v)               { if (Size == Capacity) reserve(_grow_capacity(Size + 1)); memcpy(&Data[Size], &v, sizeof(v)); Size++; }
+    inline void         pop_back()                          { IM_ASSERT(Size > 0); Size--; }
+    inline bool         contains(const T& v) const          { const T* data = Data;  const T* data_end = Data + Size; while (data < data_end) if (*data++ == v) return true; return false; }
+};
+"""
+
+header_epilogue = """
+#endif // #ifndef IMGUI_DISABLE
+"""
+
+# The generated imconfig.h just contains comments, like an unmodified copy of the real one
+imconfig_text = """// Synthetic imconfig.h generated by benchmarks/synthetic_header.py
+// (this is included in the conversion the same way the real imconfig.h is, but doesn't configure anything)
+
+#pragma once
+"""
+
+
+def get_enum_name(index):
+    return "ImGuiSynth" + ("Flags" if index % 2 == 0 else "Enum") + str(index)
+
+
+def get_struct_name(index):
+    return "ImSynthStruct" + str(index)
+
+
+def get_vector_element_type(index):
+    return "ImSynthVectorItem" + str(index)
+
+
+# Generate the enums (as typedefs for int, followed by the enum itself, as imgui.h does)
+def generate_enums(settings, lines):
+    for enum_index in range(settings.num_enums):
+        name = get_enum_name(enum_index)
+        lines.append("typedef int " + name + ";")
+    lines.append("")
+    for enum_index in range(settings.num_enums):
+        name = get_enum_name(enum_index)
+        is_flags = enum_index % 2 == 0
+        lines.append("// Synthetic " + ("flags" if is_flags else "enum") + " " + str(enum_index))
+        lines.append("enum " + name + "_")
+        lines.append("{")
+        for value_index in range(settings.num_enum_values):
+            if is_flags:
+                value = "0" if value_index == 0 else "1 << " + str(value_index - 1)
+            else:
+                value = str(value_index)
+            lines.append("    " + name + "_Value" + str(value_index) + " = " + value + ",  // Value " +
+                         str(value_index))
+        if is_flags:
+            lines.append("    " + name + "_Mask_ = " + name + "_Value1 | " + name + "_Value2,")
+        else:
+            lines.append("    " + name + "_COUNT")
+        lines.append("};")
+        lines.append("")
+
+
+# Get the arguments for the nth namespace function
+def get_function_arguments(settings, index):
+    flags_type = get_enum_name((index * 2) % max(settings.num_enums, 1)) if settings.num_enums > 0 else "int"
+    if index % settings.default_argument_interval == 0:
+        return "const char* label, float* v, float v_speed = 1.0f, const char* format = \"%.3f\", " + \
+               flags_type + " flags = 0"
+    return "const char* label, const ImVec2& size, " + flags_type + " flags"
+
+
+def generate_functions(settings, lines):
+    lines.append("namespace ImGui")
+    lines.append("{")
+    for function_index in range(settings.num_functions):
+        if function_index % 10 == 0:
+            lines.append("    // Synthetic functions " + str(function_index) + " onwards")
+        lines.append("    IMGUI_API bool          SynthFunction" + str(function_index) + "(" +
+                     get_function_arguments(settings, function_index) + ");")
+    lines.append("")
+
+    # Overloaded functions, which differ in the types of their arguments (and sometimes the number of them)
+    overload_argument_types = ["int* v", "float* v", "double* v", "ImVec2* v", "ImVec4* v", "ImU32* v"]
+    for function_index in range(settings.num_overloaded_functions):
+        for overload_index in range(settings.num_overloads):
+            argument_type = overload_argument_types[overload_index % len(overload_argument_types)]
+            extra_arguments = ", int count = 1" if overload_index >= len(overload_argument_types) else ""
+            lines.append("    IMGUI_API bool          SynthOverload" + str(function_index) + "(const char* label, " +
+                         argument_type + extra_arguments + ");  // Overload " + str(overload_index))
+    lines.append("")
+
+    # Functions inside nested conditionals
+    for block_index in range(settings.num_conditional_blocks):
+        for depth in range(settings.conditional_depth):
+            lines.append("#ifdef IMGUI_SYNTH_FEATURE_" + str(block_index) + "_" + str(depth))
+        lines.append("    IMGUI_API void          SynthConditional" + str(block_index) + "(int value = " +
+                     str(block_index) + ");")
+        for depth in range(settings.conditional_depth):
+            lines.append("#endif")
+    lines.append("} // namespace ImGui")
+    lines.append("")
+
+
+def generate_structs(settings, lines):
+    # Element types for the ImVector<> instantiations
+    for vector_index in range(settings.num_vector_types):
+        lines.append("struct " + get_vector_element_type(vector_index) + " { int Id; float Value; };")
+    lines.append("")
+
+    for struct_index in range(settings.num_structs):
+        name = get_struct_name(struct_index)
+        lines.append("// Synthetic struct " + str(struct_index))
+        lines.append("struct " + name)
+        lines.append("{")
+        lines.append("    int                 Count;          // Number of items")
+        lines.append("    float               Value;")
+        lines.append("    ImVec2              Pos;            // Position")
+        if settings.num_enums > 0:
+            lines.append("    " + get_enum_name(struct_index % settings.num_enums) + " Flags;")
+        if settings.num_vector_types > 0:
+            lines.append("    ImVector<" + get_vector_element_type(struct_index % settings.num_vector_types) +
+                         "> Items;")
+        lines.append("")
+        lines.append("    IMGUI_API " + name + "();")
+        for function_index in range(settings.num_member_functions):
+            if function_index % 2 == 0:
+                lines.append("    IMGUI_API void      Update" + str(function_index) + "(float dt, int flags = 0);")
+            else:
+                lines.append("    int                 GetCount" + str(function_index) +
+                             "() const { return Count + " + str(function_index) + "; }")
+        lines.append("};")
+        lines.append("")
+
+
+# Generate the text of a synthetic imgui.h using the settings given
+def generate_header(settings):
+    lines = [header_prologue]
+    generate_enums(settings, lines)
+    generate_functions(settings, lines)
+    generate_structs(settings, lines)
+    lines.append(header_epilogue)
+    return "\n".join(lines)
+
+
+# Write a synthetic imgui.h and imconfig.h to the directory given, returning the paths of the two files
+def write_header(settings, output_dir):
+    header_path = os.path.join(output_dir, "imgui.h")
+    imconfig_path = os.path.join(output_dir, "imconfig.h")
+    with open(header_path, "w") as f:
+        f.write(generate_header(settings))
+    with open(imconfig_path, "w") as f:
+        f.write(imconfig_text)
+    return header_path, imconfig_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic header generator")
+    parser.add_argument('--scale',
+                        type=int,
+                        default=1,
+                        help="Size of the header to generate (1 is roughly a quarter of the size of imgui.h, and the "
+                             "number of each construct generated is proportional to this)")
+    parser.add_argument('--output',
+                        default=".",
+                        help="Directory to write imgui.h and imconfig.h to (default: current directory)")
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    for path in write_header(SyntheticHeaderSettings(args.scale), args.output):
+        print("Wrote " + path)
+    sys.exit(0)
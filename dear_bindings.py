@@ -15,9 +15,23 @@
 #   dcimgui.json : full metadata to reconstruct bindings for other programming languages, including full comments.
 
 import os
+import io
+import json
+import contextlib
+import copy
+import filecmp
+import multiprocessing
+import pickle
+import string
+import tempfile
 from pathlib import Path
 from src import code_dom
 from src import c_lexer
+from src import parse_cache
+from src import pass_manager
+from src import profiler
+from src import dom_stats
+from src import modifiers
 from src import utils
 import argparse
 import sys
@@ -26,6 +40,9 @@ from src.modifiers import *
 from src.generators import *
 from src.type_comprehension import *
 
+# The version of Dear Bindings (this is also used to invalidate cached parse results)
+dear_bindings_version = "v0.19"
+
 
 # Insert a single header template file, complaining if it does not exist
 # Replaces any expansions in the expansions dictionary with the given result
@@ -58,15 +75,27 @@ def insert_header_templates(dest_file, template_dir, src_file_name, dest_file_ex
                            expansions)
 
 
-def parse_single_header(src_file, context):
-    print("Parsing " + src_file)
-
+# Parse a single header file into a DOMHeaderFile
+# If a ParseCache is supplied then that will be used to avoid parsing the file again if it has not changed
+def parse_single_header(src_file, context, header_cache=None):
     with open(src_file, "r") as f:
         file_content = f.read()
 
+    source_filename = os.path.split(src_file)[1]
+
+    if header_cache is not None:
+        with profiler.phase("Load cached parse of " + source_filename, "parse"):
+            dom_element = header_cache.load(source_filename, file_content)
+        if dom_element is not None:
+            print("Loaded cached parse of " + src_file)
+            return dom_element
+
+    print("Parsing " + src_file)
+
     # Tokenize file and then convert into a DOM
 
-    stream = c_lexer.tokenize(file_content)
+    with profiler.phase("Lex " + source_filename, "lex"):
+        stream = c_lexer.tokenize(file_content)
 
     if False:  # Debug dump tokens
         while True:
@@ -76,7 +105,23 @@ def parse_single_header(src_file, context):
             print(tok)
         return
 
-    return code_dom.DOMHeaderFile.parse(context, stream, os.path.split(src_file)[1])
+    with profiler.phase("Parse " + source_filename, "parse"):
+        dom_element = code_dom.DOMHeaderFile.parse(context, stream, source_filename)
+
+    if header_cache is not None:
+        header_cache.store(source_filename, file_content, dom_element)
+
+    return dom_element
+
+
+# Get the DOM for a header file
+# In batch mode every distinct header is parsed once up-front and passed in parsed_headers (keyed by real path) as a
+# pickled DOM, in which case we just need to unpickle a fresh copy of it (as conversion modifies the DOM, and this is
+# considerably faster than cloning an in-memory tree), otherwise the header gets parsed here
+def get_header_dom(src_file, context, header_cache=None, parsed_headers=None):
+    if (parsed_headers is not None) and (src_file in parsed_headers):
+        return pickle.loads(parsed_headers[src_file])
+    return parse_single_header(src_file, context, header_cache)
 
 
 # Parse the C++ header found in src_file, and write a C header to dest_file_no_ext.h, with binding implementation in
@@ -94,40 +139,128 @@ def convert_header(
         imgui_include_dir,
         backend_include_dir,
         emit_combined_json_metadata,
-        prefix_replacements
+        prefix_replacements,
+        header_cache=None,
+        parsed_headers=None
+):
+    with profiler.phase("Parse headers", "stage"):
+        dom_root, main_src_root = parse_headers(src_file, include_files, header_cache, parsed_headers)
+    with profiler.phase("Apply common modifiers", "stage"):
+        apply_common_modifiers(dom_root, main_src_root, is_backend)
+    with profiler.phase("Apply variant modifiers", "stage"):
+        apply_variant_modifiers(dom_root,
+                                main_src_root,
+                                src_file,
+                                no_struct_by_value_arguments,
+                                no_generate_default_arg_functions,
+                                generate_unformatted_functions,
+                                prefix_replacements)
+    with profiler.phase("Write output", "stage"):
+        write_output(dom_root,
+                     main_src_root,
+                     src_file,
+                     dest_file_no_ext,
+                     template_dir,
+                     is_backend,
+                     imgui_include_dir,
+                     backend_include_dir,
+                     emit_combined_json_metadata)
+
+
+# The convert_header() arguments that can differ between variants of the same header converted with
+# convert_header_variants() (everything else is shared by all the variants)
+variant_setting_names = [
+    "dest_file_no_ext",
+    "template_dir",
+    "no_struct_by_value_arguments",
+    "no_generate_default_arg_functions",
+    "generate_unformatted_functions",
+    "imgui_include_dir",
+    "backend_include_dir",
+    "emit_combined_json_metadata",
+    "prefix_replacements"
+]
+
+
+# Convert several variants of the same header (for example with and without --nogeneratedefaultargfunctions)
+# Rather than running the whole pipeline for each variant, this parses the headers and applies the modifiers that don't
+# depend on the variant settings once, and then forks each variant off a clone of the resulting DOM
+# variants should be a list of dictionaries, each containing the arguments named in variant_setting_names
+def convert_header_variants(
+        src_file,
+        include_files,
+        is_backend,
+        variants,
+        header_cache=None,
+        parsed_headers=None
 ):
+    dom_root, main_src_root = parse_headers(src_file, include_files, header_cache, parsed_headers)
+    apply_common_modifiers(dom_root, main_src_root, is_backend)
+
+    main_src_root_index = dom_root.children.index(main_src_root)
+
+    for variant_index, variant in enumerate(variants):
+        if variant_index < len(variants) - 1:
+            print("Forking variant " + variant["dest_file_no_ext"])
+            variant_dom_root = dom_root.clone()
+            variant_main_src_root = variant_dom_root.children[main_src_root_index]
+        else:
+            # The last variant can simply use the original DOM, as nothing else needs it afterwards
+            variant_dom_root = dom_root
+            variant_main_src_root = main_src_root
+
+        apply_variant_modifiers(variant_dom_root,
+                                variant_main_src_root,
+                                src_file,
+                                variant["no_struct_by_value_arguments"],
+                                variant["no_generate_default_arg_functions"],
+                                variant["generate_unformatted_functions"],
+                                variant["prefix_replacements"])
+        write_output(variant_dom_root,
+                     variant_main_src_root,
+                     src_file,
+                     variant["dest_file_no_ext"],
+                     variant["template_dir"],
+                     is_backend,
+                     variant["imgui_include_dir"],
+                     variant["backend_include_dir"],
+                     variant["emit_combined_json_metadata"])
+
+
+# Parse the main header and any include files into a new DOMHeaderFileSet
+# Returns the DOM root and the DOMHeaderFile for the main header
+def parse_headers(src_file, include_files, header_cache=None, parsed_headers=None):
     # Set up context and DOM root
     context = code_dom.ParseContext()
     dom_root = code_dom.DOMHeaderFileSet()
 
-    # Check if we'll do some special treatment for imgui_internal.h
-    is_imgui_internal = os.path.basename(src_file) == "imgui_internal.h"
-
     # Parse any configuration include files and add them to the DOM
     for include_file in include_files:
-        dom_root.add_child(parse_single_header(include_file, context))
+        dom_root.add_child(get_header_dom(include_file, context, header_cache, parsed_headers))
 
     # Parse and add the main header
-    main_src_root = parse_single_header(src_file, context)
+    main_src_root = get_header_dom(src_file, context, header_cache, parsed_headers)
     dom_root.add_child(main_src_root)
 
+    return dom_root, main_src_root
+
+
+# Apply the first part of the modifier pipeline, which is common to all variants of a header (i.e. everything up to the
+# point where the settings in variant_setting_names start to have an effect)
+def apply_common_modifiers(dom_root, main_src_root, is_backend):
     # Check if the version of ImGui we are dealing with has docking support
     have_docking_support = False
     for define in dom_root.list_all_children_of_type(code_dom.DOMDefine):
         if define.name == 'IMGUI_HAS_DOCK':
             have_docking_support = True
 
-    # Assign a destination filename based on the output file
-    dest_file_name_only = os.path.basename(dest_file_no_ext)
-    _, main_src_root.dest_filename = os.path.split(dest_file_no_ext)
-    main_src_root.dest_filename += ".h"  # Presume the primary output file is the .h
-
     dom_root.validate_hierarchy()
     #  dom_root.dump()
 
     print("Storing unmodified DOM")
 
-    dom_root.save_unmodified_clones()
+    with profiler.phase("save_unmodified_snapshots", "dom"):
+        dom_root.save_unmodified_snapshots()
 
     print("Applying modifiers")
 
@@ -254,11 +387,12 @@ def convert_header(
         have_getWindowFramebufferScale = False
         have_getWindowWorkAreaInsets = False
 
-        for field in dom_root.list_all_children_of_type(code_dom.DOMFieldDeclaration):
-            if field.get_fully_qualified_name() == "ImGuiPlatformIO::Platform_GetWindowFramebufferScale":
-                have_getWindowFramebufferScale = True
-            if field.get_fully_qualified_name() == "ImGuiPlatformIO::Platform_GetWindowWorkAreaInsets":
-                have_getWindowWorkAreaInsets = True
+        if len(dom_root.list_all_children_of_type_with_fully_qualified_name(
+                code_dom.DOMFieldDeclaration, "ImGuiPlatformIO::Platform_GetWindowFramebufferScale")) > 0:
+            have_getWindowFramebufferScale = True
+        if len(dom_root.list_all_children_of_type_with_fully_qualified_name(
+                code_dom.DOMFieldDeclaration, "ImGuiPlatformIO::Platform_GetWindowWorkAreaInsets")) > 0:
+            have_getWindowWorkAreaInsets = True
 
         # Implementation for these is in templates/imgui-header-template.cpp
         mod_add_manual_helper_functions.apply(dom_root,
@@ -308,6 +442,22 @@ def convert_header(
     mod_remove_operators.apply(dom_root)
     mod_remove_heap_constructors_and_destructors.apply(dom_root)
     mod_convert_references_to_pointers.apply(dom_root)
+
+
+# Apply the remainder of the modifier pipeline, which depends on the variant settings
+def apply_variant_modifiers(dom_root,
+                            main_src_root,
+                            src_file,
+                            no_struct_by_value_arguments,
+                            no_generate_default_arg_functions,
+                            generate_unformatted_functions,
+                            prefix_replacements):
+    # Check if we'll do some special treatment for imgui_internal.h
+    is_imgui_internal = os.path.basename(src_file) == "imgui_internal.h"
+
+    # Used to fuse runs of simple modifiers together (see pass_manager.PassManager)
+    passes = pass_manager.PassManager()
+
     if no_struct_by_value_arguments:
         mod_convert_by_value_struct_args_to_pointers.apply(dom_root)
     # Assume IM_VEC2_CLASS_EXTRA and IM_VEC4_CLASS_EXTRA are never defined as they are likely to just cause problems
@@ -342,16 +492,19 @@ def convert_header(
     mod_flatten_class_functions.apply(dom_root)
     mod_flatten_inheritance.apply(dom_root)
     mod_remove_nested_typedefs.apply(dom_root)
-    mod_remove_static_fields.apply(dom_root)
-    mod_remove_extern_fields.apply(dom_root)
-    mod_remove_constexpr.apply(dom_root)
+    # These are simple per-element rules, so the pass manager applies them together in a single traversal
+    passes.apply(mod_remove_static_fields, dom_root)
+    passes.apply(mod_remove_extern_fields, dom_root)
+    passes.apply(mod_remove_constexpr, dom_root)
+    passes.flush()
     mod_generate_imstr_helpers.apply(dom_root)
     mod_remove_enum_forward_declarations.apply(dom_root)
     mod_calculate_enum_values.apply(dom_root)
     # Treat enum values ending with _ as internal, and _COUNT as being count values
-    mod_mark_special_enum_values.apply(dom_root, internal_suffixes=["_"], count_suffixes=["_COUNT"])
+    passes.apply(mod_mark_special_enum_values, dom_root, internal_suffixes=["_"], count_suffixes=["_COUNT"])
     # Mark enums that end with Flags (or Flags_ for the internal ones) as being flag enums
-    mod_mark_flags_enums.apply(dom_root, ["Flags", "Flags_"])
+    passes.apply(mod_mark_flags_enums, dom_root, ["Flags", "Flags_"])
+    passes.flush()
 
     # These two are special cases because there are now (deprecated) overloads that differ from the main functions
     # only in the type of the callback function. The normal disambiguation system can't handle that, so instead we
@@ -368,30 +521,31 @@ def convert_header(
                                            )
 
     # The DirectX backends declare some DirectX types that need to not have _t appended to their typedef names
-    mod_mark_structs_as_using_unmodified_name_for_typedef.apply(dom_root,
-                                                                ["ID3D11Device",
-                                                                 "ID3D11DeviceContext",
-                                                                 "ID3D12Device",
-                                                                 "ID3D12DescriptorHeap",
-                                                                 "ID3D12GraphicsCommandList",
-                                                                 "D3D12_CPU_DESCRIPTOR_HANDLE",
-                                                                 "D3D12_GPU_DESCRIPTOR_HANDLE",
-                                                                 "IDirect3DDevice9",
-                                                                 "GLFWwindow",
-                                                                 "GLFWmonitor"
-                                                                 ])
+    passes.apply(mod_mark_structs_as_using_unmodified_name_for_typedef, dom_root,
+                 ["ID3D11Device",
+                  "ID3D11DeviceContext",
+                  "ID3D12Device",
+                  "ID3D12DescriptorHeap",
+                  "ID3D12GraphicsCommandList",
+                  "D3D12_CPU_DESCRIPTOR_HANDLE",
+                  "D3D12_GPU_DESCRIPTOR_HANDLE",
+                  "IDirect3DDevice9",
+                  "GLFWwindow",
+                  "GLFWmonitor"
+                  ])
 
     # These DirectX types are awkward and we need to use a pointer-based cast when converting them
-    mod_mark_types_for_pointer_cast.apply(dom_root, ["D3D12_CPU_DESCRIPTOR_HANDLE",
-                                                     "D3D12_GPU_DESCRIPTOR_HANDLE"])
+    passes.apply(mod_mark_types_for_pointer_cast, dom_root, ["D3D12_CPU_DESCRIPTOR_HANDLE",
+                                                             "D3D12_GPU_DESCRIPTOR_HANDLE"])
 
     # SDL backend forward-declared types
-    mod_mark_structs_as_using_unmodified_name_for_typedef.apply(dom_root,
-                                                                ["SDL_Window",
-                                                                 "SDL_Renderer",
-                                                                 "SDL_Gamepad",
-                                                                 "_SDL_GameController"
-                                                                 ])
+    passes.apply(mod_mark_structs_as_using_unmodified_name_for_typedef, dom_root,
+                 ["SDL_Window",
+                  "SDL_Renderer",
+                  "SDL_Gamepad",
+                  "_SDL_GameController"
+                  ])
+    passes.flush()
 
     if is_imgui_internal:
         # Some functions in imgui_internal already have the Ex suffix,
@@ -661,6 +815,8 @@ def convert_header(
         "IMGUI_VERSION_NUM",
         "IMGUI_VERSION"
     ], "DEAR_BINDINGS_INTERNAL_GLUE_CODE")
+    # Calculate values for integer constant defines (for the metadata)
+    mod_calculate_define_values.apply(dom_root)
 
     mod_forward_declare_structs.apply(dom_root)
     mod_wrap_with_extern_c.apply(main_src_root)  # main_src_root here to avoid wrapping the config headers
@@ -674,7 +830,7 @@ def convert_header(
     mod_align_enum_values.apply(dom_root)
     mod_align_function_names.apply(dom_root)
     mod_align_structure_field_names.apply(dom_root)
-    mod_align_comments.apply(dom_root)
+    # (comments are aligned when the header is written out, in write_output())
 
     # Exclude some defines that aren't really useful from the metadata
     mod_exclude_defines_from_metadata.apply(dom_root, [
@@ -706,6 +862,25 @@ def convert_header(
     # Test code
     # dom_root.dump()
 
+
+# Write out the C header, implementation and metadata files for a converted DOM
+def write_output(dom_root,
+                 main_src_root,
+                 src_file,
+                 dest_file_no_ext,
+                 template_dir,
+                 is_backend,
+                 imgui_include_dir,
+                 backend_include_dir,
+                 emit_combined_json_metadata):
+    # Check if we'll do some special treatment for imgui_internal.h
+    is_imgui_internal = os.path.basename(src_file) == "imgui_internal.h"
+
+    # Assign a destination filename based on the output file
+    dest_file_name_only = os.path.basename(dest_file_no_ext)
+    _, main_src_root.dest_filename = os.path.split(dest_file_no_ext)
+    main_src_root.dest_filename += ".h"  # Presume the primary output file is the .h
+
     # Cases where the varargs list version of a function does not simply have a V added to the name and needs a
     # custom suffix instead
     custom_varargs_list_suffixes = {'appendf': 'v'}
@@ -731,31 +906,42 @@ def convert_header(
     with open(dest_file_no_ext + ".h", "w") as file:
         insert_header_templates(file, template_dir, src_file_name_only, ".h", expansions)
 
+        # The header gets written to a line layout first, so that comments can be aligned based on the statement
+        # lengths recorded there, and then the layout gets written out
+        line_layout = code_dom.LineLayout()
         write_context = code_dom.WriteContext()
         write_context.for_c = True
         write_context.for_backend = is_backend
-        main_src_root.write_to_c(file, context=write_context)
+        write_context.line_layout = line_layout
+        with profiler.phase("write_to_c", "write"):
+            main_src_root.write_to_c(line_layout, context=write_context)
+        mod_align_comments.apply(main_src_root, line_layout)
+        with profiler.phase("write_line_layout", "write"):
+            line_layout.write_to(file)
 
     # Generate implementations
     with open(dest_file_no_ext + ".cpp", "w") as file:
         insert_header_templates(file, template_dir, src_file_name_only, ".cpp", expansions)
 
-        gen_struct_converters.generate(dom_root, file, indent=0)
+        with profiler.phase("gen_struct_converters", "write"):
+            gen_struct_converters.generate(dom_root, file, indent=0)
 
         # Extract custom types from everything we parsed,
         # but generate only for the main header
         imgui_custom_types = utils.get_imgui_custom_types(dom_root)
-        gen_function_stubs.generate(main_src_root, file, imgui_custom_types,
-                                    indent=0,
-                                    custom_varargs_list_suffixes=custom_varargs_list_suffixes,
-                                    is_backend=is_backend)
+        with profiler.phase("gen_function_stubs", "write"):
+            gen_function_stubs.generate(main_src_root, file, imgui_custom_types,
+                                        indent=0,
+                                        custom_varargs_list_suffixes=custom_varargs_list_suffixes,
+                                        is_backend=is_backend)
 
     # Generate metadata
     if emit_combined_json_metadata:
         metadata_file_name = dest_file_no_ext + ".json"
         with open(metadata_file_name, "w") as file:
             # We intentionally generate JSON starting from the root here so that we emit metadata from all dependencies
-            gen_metadata.generate(dom_root, file)
+            with profiler.phase("gen_metadata", "write"):
+                gen_metadata.generate(dom_root, file)
     else:
         # Emit separate metadata files for each header
         headers = dom_root.list_directly_contained_children_of_type(code_dom.DOMHeaderFile)
@@ -767,7 +953,288 @@ def convert_header(
 
             metadata_file_name = metadata_file_name + ".json"
             with open(metadata_file_name, "w") as file:
-                gen_metadata.generate(header, file)
+                with profiler.phase("gen_metadata", "write", {"header": header.source_filename}):
+                    gen_metadata.generate(header, file)
+
+
+# Work out the arguments to convert_header() from a set of command-line options (args can be either the result of
+# parsing the command line or an equivalent namespace built from a batch manifest entry)
+# Raises ValueError if the options are invalid
+def get_target_settings(args):
+    include_files = []
+
+    default_imconfig_path = os.path.dirname(os.path.realpath(args.src))
+
+    # If --backend was specified, assume imconfig.h is in the directory above (as that is where it will be in the
+    # standard layout
+    if args.backend:
+        default_imconfig_path = os.path.dirname(default_imconfig_path)
+
+    # Add imconfig.h to the include list to get any #defines set in that
+    imconfig_path = args.imconfig_path if args.imconfig_path is not None else (
+        os.path.join(default_imconfig_path, "imconfig.h"))
+
+    include_files.append(os.path.realpath(imconfig_path))
+
+    # Build a map from all the requested prefix replacements
+    prefix_replacements = {}
+    for replacement_str in args.replace_prefix:
+        if '=' not in replacement_str:
+            raise ValueError("--replace-prefix \"" + replacement_str + "\" is not of the form <old prefix>=<new prefix>")
+        index = replacement_str.index('=')
+        old_prefix = replacement_str[:index]
+        new_prefix = replacement_str[(index + 1):]
+        prefix_replacements[old_prefix] = new_prefix
+
+    # --custom-namespace-prefix is just handled as a handy short form for --replace-prefix ImGui_=<something>
+    if args.custom_namespace_prefix is not None:
+        prefix_replacements["ImGui_"] = args.custom_namespace_prefix
+
+    # Add any user-supplied config file as well
+    for include in args.include:
+        include_files.append(os.path.realpath(include))
+
+    return {
+        "src_file": os.path.realpath(args.src),
+        "include_files": include_files,
+        "dest_file_no_ext": args.output,
+        "template_dir": args.templatedir,
+        "no_struct_by_value_arguments": args.nopassingstructsbyvalue,
+        "no_generate_default_arg_functions": args.nogeneratedefaultargfunctions,
+        "generate_unformatted_functions": args.generateunformattedfunctions,
+        "is_backend": args.backend,
+        "imgui_include_dir": args.imgui_include_dir,
+        "backend_include_dir": args.backend_include_dir if args.backend_include_dir is not None
+        else args.imgui_include_dir,
+        "emit_combined_json_metadata": args.emit_combined_json_metadata,
+        "prefix_replacements": prefix_replacements
+    }
+
+
+# Convert a header twice, once with fusion of modifier passes disabled (writing the output to a temporary directory) and
+# once normally, and check that the output files are identical
+# Returns true if they were
+def convert_header_verifying_pass_fusion(target_settings, header_cache):
+    dest_file_no_ext = target_settings["dest_file_no_ext"]
+    with tempfile.TemporaryDirectory() as reference_dir:
+        # Use the same filename for the reference output, as it appears in the generated files
+        reference_settings = dict(target_settings,
+                                  dest_file_no_ext=os.path.join(reference_dir, os.path.basename(dest_file_no_ext)))
+        pass_manager.fuse_passes = False
+        try:
+            convert_header(header_cache=header_cache, **reference_settings)
+        finally:
+            pass_manager.fuse_passes = True
+
+        convert_header(header_cache=header_cache, **target_settings)
+
+        reference_files = sorted(os.listdir(reference_dir))
+        _, mismatches, errors = filecmp.cmpfiles(reference_dir, os.path.dirname(os.path.realpath(dest_file_no_ext)),
+                                                 reference_files, shallow=False)
+
+    if (len(mismatches) > 0) or (len(errors) > 0):
+        print("Output with fused modifier passes differs from output with unfused passes: " +
+              ", ".join(mismatches + errors))
+        return False
+
+    print("Output with fused modifier passes is identical to output with unfused passes (" +
+          str(len(reference_files)) + " files compared)")
+    return True
+
+
+# Substitute the variables given into a manifest setting (which may be a string, a list of strings or something else,
+# in which case it is returned as-is)
+# Raises ValueError if the setting references a variable that doesn't exist
+def substitute_batch_variables(value, variables):
+    if isinstance(value, list):
+        return [substitute_batch_variables(element, variables) for element in value]
+    if not isinstance(value, str):
+        return value
+    try:
+        return string.Template(value).substitute(variables)
+    except KeyError as e:
+        raise ValueError("\"" + value + "\" references unknown variable " + str(e))
+    except ValueError as e:
+        raise ValueError("\"" + value + "\" is not a valid setting (" + str(e) + ")")
+
+
+# Load a batch manifest, returning a list of convert_header() argument dictionaries (one per target)
+# The manifest is a JSON object with a "targets" list, where each target is an object containing the same options as
+# the command line takes (with the leading dashes removed, so "src", "output", "include", "backend", "imconfig-path"
+# and so on). Relative paths are taken as relative to the directory the manifest is in.
+# The manifest can also contain a "variables" object giving default values for variables, which are referenced in
+# settings as $name or ${name}. The values in variable_overrides (from --batch-variable) take precedence over these.
+# default_args gives the settings for anything a target doesn't specify (normally the options given on the command line
+# along with --batch, so that those apply to every target).
+# Raises ValueError if the manifest is invalid
+def load_batch_manifest(manifest_path, parser, default_args, variable_overrides):
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if (not isinstance(manifest, dict)) or (not isinstance(manifest.get("targets"), list)):
+        raise ValueError("manifest should be an object containing a \"targets\" list")
+
+    variables = manifest.get("variables", {})
+    if (not isinstance(variables, dict)) or any(not isinstance(value, str) for value in variables.values()):
+        raise ValueError("manifest \"variables\" should be an object containing string values")
+    variables = dict(variables, **variable_overrides)
+
+    manifest_dir = os.path.dirname(os.path.realpath(manifest_path))
+    valid_options = set(vars(parser.parse_args([])).keys()) - {"batch", "batch_variable", "jobs", "cache_dir",
+                                                                    "no_cache",
+                                                                    "validate_element_index",
+                                                                    "type_string_cache_stats",
+                                                                    "verify_pass_fusion",
+                                                                    "profile",
+                                                                    "profile_memory",
+                                                                    "dom_stats"}
+    path_options = ["src", "output", "templatedir", "imconfig_path"]
+
+    targets = []
+    for target_index, target in enumerate(manifest["targets"]):
+        if not isinstance(target, dict):
+            raise ValueError("target " + str(target_index) + " is not an object")
+
+        # Start from the defaults and then apply the settings from the manifest on top
+        args = copy.copy(default_args)
+        for key, value in target.items():
+            option = key.replace('-', '_')
+            if option not in valid_options:
+                raise ValueError("target " + str(target_index) + " has unknown option \"" + key + "\"")
+            try:
+                value = substitute_batch_variables(value, variables)
+            except ValueError as e:
+                raise ValueError("target " + str(target_index) + " option \"" + key + "\": " + str(e))
+            if option in ["include", "replace_prefix"] and not isinstance(value, list):
+                value = [value]
+            if (option in path_options) and (value is not None):
+                value = os.path.join(manifest_dir, value)
+            elif option == "include":
+                value = [os.path.join(manifest_dir, include) for include in value]
+            setattr(args, option, value)
+
+        if (args.src is None) or (args.output is None):
+            raise ValueError("target " + str(target_index) + " must specify both \"src\" and \"output\"")
+
+        targets.append(get_target_settings(args))
+
+    return targets
+
+
+# Headers shared with batch worker processes (set by init_batch_worker())
+batch_parsed_headers = None
+
+
+def init_batch_worker(parsed_headers, validate_element_index, type_string_cache_stats):
+    global batch_parsed_headers
+    batch_parsed_headers = parsed_headers
+    code_dom.elementindex.validate_queries = validate_element_index
+    code_dom.type.report_c_string_cache_stats = type_string_cache_stats
+
+
+# Group batch targets that are variants of the same header (i.e. differ only in the settings listed in
+# variant_setting_names), so that each group can be converted with convert_header_variants()
+# Returns a list of groups, each of which is a list of targets
+def group_batch_targets(targets):
+    groups = {}
+    for target_settings in targets:
+        key = (target_settings["src_file"], tuple(target_settings["include_files"]), target_settings["is_backend"])
+        groups.setdefault(key, []).append(target_settings)
+    return list(groups.values())
+
+
+# Convert a group of batch targets, returning a tuple of (success, log text)
+# Output is captured rather than printed so that the logs from targets being processed in parallel don't get mixed up
+def run_batch_target_group(target_group):
+    log = io.StringIO()
+    success = True
+    with contextlib.redirect_stdout(log):
+        try:
+            if len(target_group) == 1:
+                convert_header(parsed_headers=batch_parsed_headers, **target_group[0])
+            else:
+                variants = [{name: target_settings[name] for name in variant_setting_names}
+                            for target_settings in target_group]
+                convert_header_variants(target_group[0]["src_file"],
+                                        target_group[0]["include_files"],
+                                        target_group[0]["is_backend"],
+                                        variants,
+                                        parsed_headers=batch_parsed_headers)
+            if code_dom.type.report_c_string_cache_stats:
+                print(code_dom.type.get_c_string_cache_stats_string())
+        except:  # noqa - suppress warning about broad exception clause as it's intentionally broad
+            print("Exception during conversion:")
+            traceback.print_exc(file=log)
+            success = False
+    return success, log.getvalue()
+
+
+# Convert all the targets given, parsing each distinct header they use only once and then distributing the targets
+# across a pool of worker processes (with any variants of the same header being forked from a single conversion)
+# Returns true if all targets were converted successfully
+def run_batch(targets, num_jobs, header_cache):
+    # Parse all the headers up-front, so each only gets parsed once regardless of how many targets use it
+    parsed_headers = {}
+    context = code_dom.ParseContext()
+    # The DOM can be fairly deep, so make sure there is enough recursion headroom to pickle it
+    old_recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old_recursion_limit, 10000))
+    try:
+        for target_settings in targets:
+            for header_file in target_settings["include_files"] + [target_settings["src_file"]]:
+                if header_file not in parsed_headers:
+                    dom_element = parse_single_header(header_file, context, header_cache)
+                    parsed_headers[header_file] = pickle.dumps(dom_element, protocol=pickle.HIGHEST_PROTOCOL)
+    except:  # noqa - suppress warning about broad exception clause as it's intentionally broad
+        print("Exception during parsing:")
+        traceback.print_exc()
+        return False
+    finally:
+        sys.setrecursionlimit(old_recursion_limit)
+
+    # Output directories are created as needed, so that the manifest can completely describe a build
+    for target_settings in targets:
+        output_dir = os.path.dirname(target_settings["dest_file_no_ext"])
+        if output_dir != "":
+            os.makedirs(output_dir, exist_ok=True)
+
+    target_groups = group_batch_targets(targets)
+
+    if num_jobs is None:
+        num_jobs = os.cpu_count() or 1
+    num_jobs = min(num_jobs, len(target_groups))
+
+    print("Converting " + str(len(targets)) + " targets using " + str(num_jobs) + " worker process(es)")
+
+    num_failed = 0
+    if num_jobs <= 1:
+        init_batch_worker(parsed_headers, code_dom.elementindex.validate_queries,
+                          code_dom.type.report_c_string_cache_stats)
+        results = map(run_batch_target_group, target_groups)
+        num_failed = report_batch_results(target_groups, results)
+    else:
+        with multiprocessing.Pool(num_jobs, initializer=init_batch_worker,
+                                  initargs=(parsed_headers, code_dom.elementindex.validate_queries,
+                                            code_dom.type.report_c_string_cache_stats)) as pool:
+            num_failed = report_batch_results(target_groups, pool.imap(run_batch_target_group, target_groups))
+
+    if num_failed > 0:
+        print(str(num_failed) + " of " + str(len(targets)) + " targets failed")
+        return False
+    return True
+
+
+# Print the logs from a set of batch results (in target order), returning the number of failed targets
+def report_batch_results(target_groups, results):
+    num_failed = 0
+    for target_group, (success, log) in zip(target_groups, results):
+        print()
+        print("Processing " + target_group[0]["src_file"])
+        print()
+        print(log, end="")
+        if not success:
+            num_failed += len(target_group)
+    return num_failed
 
 
 if __name__ == '__main__':
@@ -787,9 +1254,9 @@ if __name__ == '__main__':
         epilog='Result code 0 is returned on success, 1 on conversion failure and 2 on '
                'parameter errors')
     parser.add_argument('src',
+                        nargs='?',
                         help='Path to source header file to process (generally imgui.h)')
     parser.add_argument('-o', '--output',
-                        required=True,
                         help='Path to output files (generally dcimgui). This should have no extension, '
                              'as <output>.h, <output>.cpp and <output>.json will be written.')
     parser.add_argument('-t', '--templatedir',
@@ -839,6 +1306,57 @@ if __name__ == '__main__':
                              "following suit)",
                         default=[],
                         action='append')
+    parser.add_argument('--cache-dir',
+                        default=os.path.join(os.path.dirname(os.path.realpath(__file__)), ".parse_cache"),
+                        help="Directory to cache parsed headers in, so that unchanged headers do not need to be "
+                             "parsed again on subsequent runs (default: ./.parse_cache)")
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help="Do not use (or update) the parsed header cache")
+    parser.add_argument('--batch',
+                        metavar='MANIFEST',
+                        help="Path to a JSON manifest listing multiple targets to generate in one go (see "
+                             "BuildAllBindings.json for an example). Each header is only parsed once, no matter how "
+                             "many targets use it. When this is given, src and --output should not be specified, and "
+                             "any other conversion options given apply to every target that doesn't set them itself.")
+    parser.add_argument('--batch-variable',
+                        metavar='NAME=VALUE',
+                        action='append',
+                        default=[],
+                        help="Set the value of a variable used in the --batch manifest (overriding the value the "
+                             "manifest gives it). Can be specified multiple times.")
+    parser.add_argument('--jobs',
+                        type=int,
+                        help="Number of worker processes to use in --batch mode (default: number of CPUs)")
+    parser.add_argument('--validate-element-index',
+                        action='store_true',
+                        help="Debug option: check the result of every element index query against a full walk of the "
+                             "DOM (this is very slow)")
+    parser.add_argument('--type-string-cache-stats',
+                        action='store_true',
+                        help="Profiling option: report how often the strings generated for types could be reused "
+                             "from the cache rather than being generated again")
+    parser.add_argument('--verify-pass-fusion',
+                        action='store_true',
+                        help="Debug option: convert the header a second time without fusing modifier passes together, "
+                             "and check that the output is identical")
+    parser.add_argument('--profile',
+                        metavar='TRACE_FILE',
+                        help="Profiling option: record the wall time, CPU time and change in the number of allocated "
+                             "memory blocks for each phase of the conversion (including every modifier applied), "
+                             "write them to TRACE_FILE in Chrome trace event format (which can be viewed with "
+                             "chrome://tracing or https://ui.perfetto.dev/) and print a summary")
+    parser.add_argument('--profile-memory',
+                        action='store_true',
+                        help="Profiling option: with --profile, also measure the bytes allocated and peak memory usage "
+                             "of each phase (this uses tracemalloc, which makes conversion much slower and distorts the "
+                             "relative times of phases)")
+    parser.add_argument('--dom-stats',
+                        action='store_true',
+                        help="Profiling option: after each modifier is applied, record the number of elements of each "
+                             "type in the DOM, the number of tokens, the number of elements cloned and the peak memory "
+                             "allocated while the modifier ran, and print a table of them (modifier passes are not "
+                             "fused together in this mode, so that each one can be measured separately)")
 
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
@@ -846,60 +1364,107 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    include_files = []
-
-    default_imconfig_path = os.path.dirname(os.path.realpath(args.src))
-
-    # If --backend was specified, assume imconfig.h is in the directory above (as that is where it will be in the
-    # standard layout
-    if args.backend:
-        default_imconfig_path = os.path.dirname(default_imconfig_path)
+    code_dom.elementindex.validate_queries = args.validate_element_index
+    code_dom.type.report_c_string_cache_stats = args.type_string_cache_stats
+
+    if args.profile_memory and (args.profile is None):
+        parser.error("--profile-memory can only be used with --profile")
+    if args.dom_stats and (args.profile is not None):
+        parser.error("--dom-stats cannot be used with --profile (as collecting statistics would distort the timings)")
+    if args.dom_stats and args.verify_pass_fusion:
+        parser.error("--dom-stats cannot be used with --verify-pass-fusion (as it disables pass fusion)")
+
+    header_cache = None
+    if not args.no_cache:
+        header_cache = parse_cache.ParseCache(args.cache_dir, dear_bindings_version)
+
+    if args.batch is not None:
+        if (args.src is not None) or (args.output is not None):
+            parser.error("src and --output cannot be specified when using --batch (the manifest gives them instead)")
+        if (args.jobs is not None) and (args.jobs < 1):
+            parser.error("--jobs must be at least 1")
+        if args.verify_pass_fusion:
+            parser.error("--verify-pass-fusion cannot be used with --batch")
+        if args.profile is not None:
+            parser.error("--profile cannot be used with --batch")
+        if args.dom_stats:
+            parser.error("--dom-stats cannot be used with --batch")
+
+        variable_overrides = {}
+        for variable_str in args.batch_variable:
+            if '=' not in variable_str:
+                parser.error("--batch-variable \"" + variable_str + "\" is not of the form <name>=<value>")
+            index = variable_str.index('=')
+            variable_overrides[variable_str[:index]] = variable_str[(index + 1):]
+
+        try:
+            targets = load_batch_manifest(args.batch, parser, args, variable_overrides)
+        except (OSError, ValueError) as e:
+            print("Unable to load batch manifest " + args.batch + ": " + str(e))
+            sys.exit(2)
+
+        success = run_batch(targets, args.jobs, header_cache)
+
+        if header_cache is not None:
+            print(header_cache.get_stats_string())
+
+        if not success:
+            sys.exit(1)
 
-    # Add imconfig.h to the include list to get any #defines set in that
-    imconfig_path = args.imconfig_path if args.imconfig_path is not None else (
-        os.path.join(default_imconfig_path, "imconfig.h"))
+        print("Done")
+        sys.exit(0)
 
-    include_files.append(imconfig_path)
+    if len(args.batch_variable) > 0:
+        parser.error("--batch-variable can only be used with --batch")
+    if args.src is None:
+        parser.error("the following arguments are required: src")
+    if args.output is None:
+        parser.error("the following arguments are required: -o/--output")
 
-    # Build a map from all the requested prefix replacements
-    prefix_replacements = {}
-    for replacement_str in args.replace_prefix:
-        if '=' not in replacement_str:
-            print("--replace-prefix \"" + replacement_str + "\" is not of the form <old prefix>=<new prefix>")
-            sys.exit(1)
-        index = replacement_str.index('=')
-        old_prefix = replacement_str[:index]
-        new_prefix = replacement_str[(index + 1):]
-        prefix_replacements[old_prefix] = new_prefix
+    try:
+        target_settings = get_target_settings(args)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
 
-    # --custom-namespace-prefix is just handled as a handy short form for --replace-prefix ImGui_=<something>
-    if args.custom_namespace_prefix is not None:
-        prefix_replacements["ImGui_"] = args.custom_namespace_prefix
+    if args.profile is not None:
+        profiler.instrument_modifiers(modifiers)
+        profiler.start(trace_memory=args.profile_memory)
 
-    # Add any user-supplied config file as well
-    for include in args.include:
-        include_files.append(os.path.realpath(include))
+    if args.dom_stats:
+        dom_stats.instrument_modifiers(modifiers)
+        pass_manager.fuse_passes = False
+        dom_stats.start()
 
     # Perform conversion
     try:
-        convert_header(
-            os.path.realpath(args.src),
-            include_files,
-            args.output,
-            args.templatedir,
-            args.nopassingstructsbyvalue,
-            args.nogeneratedefaultargfunctions,
-            args.generateunformattedfunctions,
-            args.backend,
-            args.imgui_include_dir,
-            args.backend_include_dir if args.backend_include_dir is not None else args.imgui_include_dir,
-            args.emit_combined_json_metadata,
-            prefix_replacements
-        )
+        if args.verify_pass_fusion:
+            success = convert_header_verifying_pass_fusion(target_settings, header_cache)
+        else:
+            convert_header(header_cache=header_cache, **target_settings)
+            success = True
     except:  # noqa - suppress warning about broad exception clause as it's intentionally broad
         print("Exception during conversion:")
         traceback.print_exc()
         sys.exit(1)
 
+    if args.profile is not None:
+        conversion_profiler = profiler.stop()
+        conversion_profiler.write_chrome_trace(args.profile)
+        print(conversion_profiler.get_summary_string())
+        print("Profile written to " + args.profile)
+
+    if args.dom_stats:
+        print(dom_stats.stop().get_table_string())
+
+    if not success:
+        sys.exit(1)
+
+    if code_dom.type.report_c_string_cache_stats:
+        print(code_dom.type.get_c_string_cache_stats_string())
+
+    if header_cache is not None:
+        print(header_cache.get_stats_string())
+
     print("Done")
     sys.exit(0)
@@ -1,5 +1,7 @@
 import ply.lex as lex
+import os
 import re
+import sys
 from src import token_stream
 
 # This implements a simple lexer for C
@@ -232,8 +234,69 @@ def t_pp_error(t):
     t.lexer.skip(1)
 
 
+# Flags used when compiling the lexer regular expressions
+lexer_reflags = int(re.VERBOSE | re.MULTILINE)
+
+# Module that PLY writes the lexer tables out to, so that later runs don't have to re-introspect this module and
+# rebuild the master regular expressions from scratch
+lextab_module = "src.c_lexer_lextab"
+lextab_dir = os.path.dirname(os.path.realpath(__file__))
+
+# The lexer all others are cloned from (created on first use by get_master_lexer())
+master_lexer = None
+
+
+# Get the path of the lextab file
+def get_lextab_file_path():
+    return os.path.join(lextab_dir, lextab_module.split('.')[-1] + ".py")
+
+
+# Returns true if there is a lextab file that was generated from the current version of this module
+def is_lextab_up_to_date():
+    lextab_file = get_lextab_file_path()
+    if not os.path.isfile(lextab_file):
+        return False
+    # If this file has been edited since the tables were written then they may be stale
+    return os.path.getmtime(lextab_file) >= os.path.getmtime(os.path.realpath(__file__))
+
+
+# Write the tables for the lexer given out to the lextab file
+# Write-then-rename so that other processes (such as batch workers, or other runs happening at the same time) never see
+# a partially written file
+def write_lextab(lexer):
+    temp_module = lextab_module + "_" + str(os.getpid()) + "_tmp"
+    temp_file_path = os.path.join(lextab_dir, temp_module.split('.')[-1] + ".py")
+    try:
+        lexer.writetab(temp_module, lextab_dir)
+        os.replace(temp_file_path, get_lextab_file_path())
+    except OSError:
+        # Not being able to cache the tables isn't fatal, it just means we build them again next time
+        if os.path.isfile(temp_file_path):
+            os.remove(temp_file_path)
+
+
+# Get the master lexer, building it if necessary
+# Building the lexer is relatively expensive (PLY has to collect and validate all the rules in this module and then
+# compile them into a master regex), so we only do it once per process and hand out clones of the result
+def get_master_lexer():
+    global master_lexer
+    if master_lexer is None:
+        this_module = sys.modules[__name__]
+        if is_lextab_up_to_date():
+            master_lexer = lex.lex(module=this_module, reflags=lexer_reflags, optimize=True, lextab=lextab_module)
+        else:
+            master_lexer = lex.lex(module=this_module, reflags=lexer_reflags)
+            write_lextab(master_lexer)
+    return master_lexer
+
+
+# Create a new lexer, ready to have input supplied to it
+def create_lexer():
+    return get_master_lexer().clone()
+
+
 # Lex a given source (string) and return a token stream for it
 def tokenize(source):
-    lexer = lex.lex(reflags=int(re.VERBOSE | re.MULTILINE))
+    lexer = create_lexer()
     lexer.input(source)
     return token_stream.TokenStream(lexer)
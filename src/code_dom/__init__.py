@@ -1,5 +1,7 @@
 from . import common
 from . import element
+from . import elementindex
+from . import elementsnapshot
 from . import blanklines
 from . import classstructunion
 from . import codeblock
@@ -16,6 +18,7 @@ from . import functionpointertype
 from . import headerfile
 from . import headerfileset
 from . import include
+from . import linelayout
 from . import namespace
 from . import pragma
 from . import preprocessorif
@@ -24,11 +27,13 @@ from . import type
 from . import typedef
 from . import undef
 from . import unparsablething
+from . import parsertable  # This needs to come last as it references parsers from all the other element types
 
-__all__ = ["blanklines", "classstructunion", "codeblock", "comment", "define", "element",
-           "enumelement", "error", "externc", "fielddeclaration", "functionargument", "functiondeclaration",
-           "functionpointertype", "headerfile", "headerfileset", "include", "namespace", "pragma",
-           "preprocessorif", "template", "type", "typedef", "undef", "unparsablething"]
+__all__ = ["blanklines", "classstructunion", "codeblock", "comment", "define", "element", "elementindex",
+           "elementsnapshot", "enumelement", "error", "externc", "fielddeclaration", "functionargument",
+           "functiondeclaration", "functionpointertype", "headerfile", "headerfileset", "include", "linelayout",
+           "namespace",
+           "parsertable", "pragma", "preprocessorif", "template", "type", "typedef", "undef", "unparsablething"]
 
 # Set up aliases to avoid having to refer to things inside the module by verbose names
 # There's probably a better way to do this but most of the things I've tried end up causing
@@ -40,6 +45,8 @@ DOMCodeBlock = codeblock.DOMCodeBlock
 DOMComment = comment.DOMComment
 DOMDefine = define.DOMDefine
 DOMElement = element.DOMElement
+DOMElementIndex = elementindex.DOMElementIndex
+DOMElementSnapshot = elementsnapshot.DOMElementSnapshot
 DOMEnum = enum.DOMEnum
 DOMEnumElement = enumelement.DOMEnumElement
 DOMError = error.DOMError
@@ -60,5 +67,7 @@ DOMTypedef = typedef.DOMTypedef
 DOMUndef = undef.DOMUndef
 DOMUnparsableThing = unparsablething.DOMUnparsableThing
 
+LineLayout = linelayout.LineLayout
 ParseContext = common.ParseContext
+ParserTable = parsertable.ParserTable
 WriteContext = common.WriteContext
@@ -4,6 +4,8 @@ from src import code_dom
 
 # A blank line
 class DOMBlankLines(code_dom.element.DOMElement):
+    __slots__ = ["num_blank_lines"]
+
     def __init__(self, num_lines=0):
         super().__init__()
         self.num_blank_lines = num_lines
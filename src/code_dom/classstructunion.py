@@ -4,9 +4,14 @@ from src import code_dom
 
 # Class/struct/union
 class DOMClassStructUnion(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "is_anonymous", "is_forward_declaration", "has_forward_declaration",
+                 "is_by_value", "structure_type", "is_imgui_api", "base_classes", "use_unmodified_name_for_typedef",
+                 "single_line_declaration"]
+
     def __init__(self):
         super().__init__()
         self.name = None  # Can be none for anonymous things if they haven't been given a temporary name
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.is_anonymous = True
         self.is_forward_declaration = True  # Is this a forward-declaration
         self.has_forward_declaration = False
@@ -66,6 +71,8 @@ class DOMClassStructUnion(code_dom.element.DOMElement):
 
         if stream.get_token_of_type(['LBRACE']) is not None:
             dom_element.is_forward_declaration = False
+            old_parser_table = context.current_parser_table
+            context.current_parser_table = code_dom.parsertable.classstructunion_parser_table
             while True:
                 tok = stream.peek_token()
                 if tok.type == 'RBRACE':
@@ -79,15 +86,16 @@ class DOMClassStructUnion(code_dom.element.DOMElement):
                     current_accessibility = tok.value
                     continue
 
-                child_element = context.current_content_parser()
+                child_element = context.parse_content(stream)
 
                 if child_element is not None:
                     child_element.accessibility = current_accessibility
                     if not child_element.no_default_add:
                         dom_element.add_child(child_element, context)
                 else:
-                    print("Unrecognised element: " + str(vars(tok)) + " in DOMClassStructUnion " + dom_element.name)
+                    print("Unrecognised element: " + str(tok) + " in DOMClassStructUnion " + dom_element.name)
                     break
+            context.current_parser_table = old_parser_table
 
         stream.get_token_of_type(['SEMICOLON'])  # Eat the trailing semicolon
 
@@ -102,6 +110,11 @@ class DOMClassStructUnion(code_dom.element.DOMElement):
         else:
             return ("::" if include_leading_colons else "") + name
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        if self.base_classes is not None:
+            clone.base_classes = self.base_classes.copy()
+
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
@@ -150,8 +163,7 @@ class DOMClassStructUnion(code_dom.element.DOMElement):
             else:
                 write_c_line(file, indent, context, self.add_attached_comment_to_line(context, declaration))
             write_c_line(file, indent, context, "{")
-            for child in self.children:
-                child.write_to_c(file, indent + 1, context)
+            self.write_children_to_c(self.children, file, indent + 1, context)
             if need_typedef:
                 write_c_line(file, indent, context, "} " + self.name + ";")
             else:
@@ -4,6 +4,8 @@ from src import code_dom
 
 # A comment
 class DOMComment(code_dom.element.DOMElement):
+    __slots__ = ["comment_text", "is_attached_comment", "is_preceding_comment", "alignment"]
+
     def __init__(self):
         super().__init__()
         self.comment_text = None
@@ -3,8 +3,15 @@
 
 class ParseContext:
     def __init__(self):
-        self.current_content_parser = None
+        self.current_parser_table = None  # The ParserTable for the scope currently being parsed
         self.last_element = None
+        # Statistics from DOMElement.classify_declaration()
+        self.num_speculative_parses_avoided = 0  # Declarations sent straight to the field parser
+        self.num_speculative_parses_failed = 0  # Declarations where the function parser was tried first and failed
+
+    # Parse the next element in the current scope from the stream given
+    def parse_content(self, stream):
+        return self.current_parser_table.parse(self, stream)
 
 
 class WriteContext:
@@ -20,25 +27,35 @@ class WriteContext:
         self.for_backend = False  # Are we outputting backend code?
         self.suppress_newlines = False  # Do we want to remove all newlines from the output?
         self.suppress_indent = False  # Do we want to skip adding indent? (set automatically by write_c_line())
+        self.line_layout = None  # LineLayout being written to, if any (see linelayout.py)
+
+
+# Token values that collapse_tokens_to_string() considers to be punctuation
+punctuation_token_values = frozenset(['+', '-', '<', '>', '(', ')', '=', '/', '\\', '!', '~',
+                                      '[', ']', '&', '"', "'", '%', '^', '*', ':', ';', '?',
+                                      '!', ',', '.', '{', '}'])
 
 
 # Collapse a list of tokens back into a C-style string, attempting to be reasonably intelligent and/or aesthetic
 # about the use of whitespace
 def collapse_tokens_to_string(tokens):
+    return collapse_token_values_to_string([token.value for token in tokens])
+
+
+# Collapse a list of token values (i.e. strings) into a C-style string, as per collapse_tokens_to_string()
+def collapse_token_values_to_string(values):
     result = ""
     need_space = False
     need_forced_space = False
-    for token in tokens:
-        token_is_punctuation = token.value in ['+', '-', '<', '>', '(', ')', '=', '/', '\\', '!', '~',
-                                               '[', ']', '&', '"', "'", '%', '^', '*', ':', ';', '?',
-                                               '!', ',', '.', '{', '}']
+    for value in values:
+        token_is_punctuation = value in punctuation_token_values
         if (need_space and not token_is_punctuation) or need_forced_space:
             result += " "
-        result += token.value
+        result += value
         need_space = not token_is_punctuation
         # Special-case here - semicolon and comma do not get a space before them, but do get a space after them,
         # even if the next character is punctuation
-        need_forced_space = token.value in [';', ',']
+        need_forced_space = (value == ';') or (value == ',')
     return result
 
 
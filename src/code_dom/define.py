@@ -5,10 +5,14 @@ from src import utils
 
 # A #define statement
 class DOMDefine(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "content", "value"]
+
     def __init__(self):
         super().__init__()
         self.name = None  # The name of the define
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.content = None  # The actual content of the define (None if it is just a basic #define)
+        self.value = None  # The integer value of the content, if it is a constant (see mod_calculate_define_values)
 
     # Parse tokens from the token stream given
     @staticmethod
@@ -1,115 +1,196 @@
 from .common import *
 import copy
+import itertools
+import operator
 import src.code_dom
 
+# Cache of the slot names for each element class, as (names, getter) tuples (see get_all_slots())
+all_slots_by_class = {}
+
+# Total number of elements that have been cloned (reported by --dom-stats)
+num_elements_cloned = 0
+
+
+# Get the names of all the slots of an element class (including those inherited from base classes), along with an
+# operator.attrgetter() that fetches the values of all of them from an element as a tuple
+def get_all_slots(element_class):
+    slots = all_slots_by_class.get(element_class)
+    if slots is None:
+        slot_names = []
+        for cls in reversed(element_class.__mro__):
+            slot_names.extend(cls.__dict__.get("__slots__", []))
+        slots = (tuple(slot_names), operator.attrgetter(*slot_names))
+        all_slots_by_class[element_class] = slots
+    return slots
+
 
 # Base class for all DOM elements
+# Elements (and the classes derived from this) use __slots__ to reduce the memory used by the DOM, so any new
+# attributes need to be added to the __slots__ list of the class as well as being initialised in __init__()
 class DOMElement:
+    __slots__ = ["tokens", "tokens_shared", "_parent", "_child_positions", "children", "pre_comments",
+                 "attached_comment", "no_default_add", "unmodified_element", "original_name_override", "is_internal",
+                 "exclude_from_metadata", "accessibility"]
+
     def __init__(self):
         self.tokens = []
-        self.parent = None  # The parent element
+        self.tokens_shared = False  # Are the token objects shared with clones of this element? (see
+        #                             get_writable_tokens())
+        self._parent = None  # The parent element (accessed via the parent property)
+        self._child_positions = None  # Cache used by find_child() (see there for details)
         self.children = []  # Basic child elements (note that some elements have multiple child lists)
         self.pre_comments = []  # If this element is preceded with comments that are related to it, they go here
         self.attached_comment = None  # If a comment appears after this element (on the same line), this is it
         self.no_default_add = False  # Should this element not be added to the DOM upon creation? (mainly for
         #                              attached comments)
-        self.unmodified_element = None  # The original (unmodified) element, as part of a complete clone of the
-        #                                 pre-modification document structure
+        self.unmodified_element = None  # Snapshot of the original (unmodified) element, as captured before any
+        #                                 modifiers were applied (see DOMElementSnapshot)
         self.original_name_override = None  # Optional name to use for the original name of this type
         #                                     (primarily for template parameter expansion and the like)
         self.is_internal = False  # Indicates that the associated element is an internal API component
         self.exclude_from_metadata = False  # Should this element be excluded from the generated metadata?
+        self.accessibility = None  # The accessibility (public/private/protected) of this element, if it is in a class
+
+    # The parent element
+    @property
+    def parent(self):
+        return self._parent
+
+    # Setting the parent is what ultimately happens whenever an element is added to or removed from the tree, so this
+    # also lets the element index for the tree (if there is one) know about the change
+    @parent.setter
+    def parent(self, new_parent):
+        old_parent = self._parent
+        self._parent = new_parent
+        if old_parent is not None:
+            if old_parent._child_positions is not None:
+                old_parent._child_positions.pop(self, None)
+            old_parent.mark_child_lists_changed()
+        if (new_parent is not None) and (new_parent is not old_parent):
+            new_parent.mark_child_lists_changed()
+
+    # Let the element index for the tree (if there is one) know that the child lists of this element may have changed
+    # Setting the parent of an element does this automatically, so this is only needed if children are removed without
+    # their parent being changed
+    def mark_child_lists_changed(self):
+        element_index = self.get_element_index()
+        if element_index is not None:
+            element_index.mark_dirty(self)
+
+    # The name of this element (for element types that have one)
+    # This is a property so that the element index can update its symbol tables when elements are renamed
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, new_name):
+        self._name = new_name
+        self.mark_name_changed()
+
+    # Let the element index for the tree (if there is one) know that the name of this element has changed
+    # Setting name does this automatically, so this is only needed if something else that affects the (fully-qualified)
+    # name of the element is changed, such as the names of a field
+    def mark_name_changed(self):
+        if self._parent is not None:
+            element_index = self.get_element_index()
+            if element_index is not None:
+                element_index.mark_renamed(self)
+
+    # Get the element index for the tree this element is in, or None if it doesn't have one
+    def get_element_index(self):
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        return root.element_index if isinstance(root, src.code_dom.headerfileset.DOMHeaderFileSet) else None
+
+    # Get the element index that should be used for list_all_children_of_type() queries on this element, or None if
+    # the tree should simply be walked instead (which is the case for anything that is a small part of the tree)
+    def get_query_element_index(self):
+        return None
 
     # Parse tokens that can appear anywhere, returning an appropriate element if possible or None if not
     @staticmethod
     def parse_common(context, stream):
-        tok = stream.peek_token(skip_newlines=False)
-        if tok is None:
-            return None
-        if (tok.type == 'LINE_COMMENT') or (tok.type == 'BLOCK_COMMENT'):
-            return src.code_dom.comment.DOMComment.parse(context, stream)
-        elif tok.type == 'PPDEFINE':
-            return src.code_dom.define.DOMDefine.parse(context, stream)
-        elif tok.type == 'PPUNDEF':
-            return src.code_dom.undef.DOMUndef.parse(context, stream)
-        elif (tok.type == 'PPIF') or (tok.type == 'PPIFDEF') or (tok.type == 'PPIFNDEF'):
-            return src.code_dom.preprocessorif.DOMPreprocessorIf.parse(context, stream)
-        elif tok.type == 'PRAGMA':
-            return src.code_dom.pragma.DOMPragma.parse(context, stream)
-        elif tok.type == 'PPERROR':
-            return src.code_dom.error.DOMError.parse(context, stream)
-        elif tok.type == 'PPINCLUDE':
-            return src.code_dom.include.DOMInclude.parse(context, stream)
-        elif tok.type == 'NEWLINE':
-            blank_lines = src.code_dom.blanklines.DOMBlankLines.parse(context, stream)
-            # A little bit of a convenience hack here - we don't really want tons of "zero blank lines"
-            # entries cluttering up the DOM every time we see a newline, so only return blank line elements if they
-            # actually represent a blank line as opposed to just a single newline
-            if blank_lines.num_blank_lines > 0:
-                return blank_lines
-            else:
-                context.last_element = None  # Clear last_element to avoid comments attaching across newlines
-                return DOMElement.parse_common(context, stream)
-        else:
-            return None
+        return src.code_dom.parsertable.common_parser_table.parse(context, stream)
 
     # Parse tokens that can appear in most scopes, returning an appropriate element if possible or None if not
     @staticmethod
     def parse_basic(context, stream):
-        common_element = DOMElement.parse_common(context, stream)
-        if common_element is not None:
-            return common_element
+        return src.code_dom.parsertable.basic_parser_table.parse(context, stream)
 
-        tok = stream.peek_token()
-        if tok is None:
+    # Parse one or more newlines, returning a blank lines element if they represent actual blank lines
+    @staticmethod
+    def parse_newlines(context, stream):
+        blank_lines = src.code_dom.blanklines.DOMBlankLines.parse(context, stream)
+        # A little bit of a convenience hack here - we don't really want tons of "zero blank lines"
+        # entries cluttering up the DOM every time we see a newline, so only return blank line elements if they
+        # actually represent a blank line as opposed to just a single newline (ParserTable.parse() then moves on to
+        # whatever follows the newline)
+        if blank_lines.num_blank_lines > 0:
+            return blank_lines
+        else:
+            context.last_element = None  # Clear last_element to avoid comments attaching across newlines
             return None
-        if (tok.type == 'STRUCT') or (tok.type == 'CLASS') or (tok.type == 'UNION'):
-            return src.code_dom.classstructunion.DOMClassStructUnion.parse(context, stream)
-        elif tok.type == 'PPDEFINE':
-            return src.code_dom.define.DOMDefine.parse(context, stream)
-        elif tok.type == 'PPUNDEF':
-            return src.code_dom.undef.DOMUndef.parse(context, stream)
-        elif (tok.type == 'PPIF') or (tok.type == 'PPIFDEF') or (tok.type == 'PPIFNDEF'):
-            return src.code_dom.preprocessorif.DOMPreprocessorIf.parse(context, stream)
-        elif tok.type == 'PRAGMA':
-            return src.code_dom.pragma.DOMPragma.parse(context, stream)
-        elif tok.type == 'PPERROR':
-            return src.code_dom.error.DOMError.parse(context, stream)
-        elif tok.type == 'PPINCLUDE':
-            return src.code_dom.include.DOMInclude.parse(context, stream)
-        elif tok.type == 'NAMESPACE':
-            return src.code_dom.namespace.DOMNamespace.parse(context, stream)
-        elif tok.type == 'TYPEDEF':
-            return src.code_dom.typedef.DOMTypedef.parse(context, stream)
-        elif tok.type == 'ENUM':
-            return src.code_dom.enum.DOMEnum.parse(context, stream)
-        elif tok.type == 'TEMPLATE':
-            return src.code_dom.template.DOMTemplate.parse(context, stream)
-        elif (tok.type == 'THING') or (tok.type == 'CONST') or (tok.type == 'CONSTEXPR') or (tok.type == 'SIGNED') or \
-                (tok.type == 'UNSIGNED') or \
-                (tok.type == '~'):  # ~ is necessary because destructor names start with it
-
-            # It might be an extern "C" statement
-
-            if tok.value == 'extern':
-                extern = src.code_dom.externc.DOMExternC.parse(context, stream)
-                if extern is not None:
-                    return extern
-
-            # This could be either a field declaration or a function declaration, so try both
 
+    # Parse a declaration that starts with an identifier-like token (a function, field, extern "C" block, or
+    # something we don't understand such as a macro)
+    @staticmethod
+    def parse_declaration(context, stream):
+        tok = stream.peek_token()
+
+        # It might be an extern "C" statement
+
+        if tok.value == 'extern':
+            extern = src.code_dom.externc.DOMExternC.parse(context, stream)
+            if extern is not None:
+                return extern
+
+        # This could be either a field declaration or a function declaration, so look ahead to see which of those
+        # it could possibly be and try the appropriate parser(s)
+
+        if DOMElement.classify_declaration(stream) == 'FIELD':
+            context.num_speculative_parses_avoided += 1
+        else:
             function_declaration = src.code_dom.functiondeclaration.DOMFunctionDeclaration.parse(context, stream)
             if function_declaration is not None:
                 return function_declaration
+            context.num_speculative_parses_failed += 1
 
-            field_declaration = src.code_dom.fielddeclaration.DOMFieldDeclaration.parse(context, stream)
-            if field_declaration is not None:
-                return field_declaration
+        field_declaration = src.code_dom.fielddeclaration.DOMFieldDeclaration.parse(context, stream)
+        if field_declaration is not None:
+            return field_declaration
 
-            # It may be a macro or something else we don't understand, so record it as unparsable and move on
-            return src.code_dom.unparsablething.DOMUnparsableThing.parse(context, stream)
-        else:
-            return None
+        # It may be a macro or something else we don't understand, so record it as unparsable and move on
+        return src.code_dom.unparsablething.DOMUnparsableThing.parse(context, stream)
+
+    # Look ahead from the current stream position to determine what kind of declaration is there, without consuming
+    # any tokens. This scans to the first (, ;, =, [ or { that is not inside template <> brackets - if that isn't a (,
+    # then the declaration cannot be a function (unless it is an operator, as those have names like "operator[]").
+    # Returns 'FIELD' if the declaration can only be a field, or 'FUNCTION_OR_FIELD' if it may be either (function
+    # pointer fields look like functions up to this point, so these still need to fall back to the field parser)
+    @staticmethod
+    def classify_declaration(stream):
+        checkpoint = stream.get_checkpoint()
+        result = 'FUNCTION_OR_FIELD'
+        triangle_bracket_depth = 0
+        while True:
+            tok = stream.get_token()
+            if tok is None:
+                break
+            if tok.type == 'LTRIANGLE':
+                triangle_bracket_depth += 1
+            elif tok.type == 'RTRIANGLE':
+                triangle_bracket_depth = max(triangle_bracket_depth - 1, 0)
+            elif triangle_bracket_depth == 0:
+                if (tok.type == 'SEMICOLON') or (tok.type == 'EQUAL') or (tok.type == 'LSQUARE') or \
+                        (tok.type == 'LBRACE'):
+                    result = 'FIELD'
+                    break
+                elif (tok.type == 'LPAREN') or (tok.type == 'RBRACE') or (tok.value == 'operator'):
+                    break
+        stream.rewind(checkpoint)
+        return result
 
     # Attach preceding comments
     def attach_preceding_comments(self, comments):
@@ -129,12 +210,17 @@ class DOMElement:
             else:
                 self.attached_comment.comment_text = self.attached_comment.comment_text + ", " + comment.comment_text
         self.pre_comments = []
+        self.mark_child_lists_changed()
 
     # Add an attached comment (if present) to the output line text given, respecting the comment alignment
     def add_attached_comment_to_line(self, context, line):
         if self.attached_comment is not None:
             if context.suppress_indent:
                 return line + " " + self.attached_comment.to_c_string(context)
+            elif (context.line_layout is not None) and not context.suppress_newlines:
+                # The line layout adds the comment when it gets written out, so that it can be aligned first
+                context.line_layout.add_comment_slot(line, self.attached_comment)
+                return line
             else:
                 padding = self.attached_comment.alignment - len(line)
                 padding = max(padding, 1)  # Always have at least one space after the body of the line
@@ -146,15 +232,29 @@ class DOMElement:
     def write_preceding_comments(self, file, indent=0, context=WriteContext()):
         if context.for_implementation:
             return  # No comments in implementation code
+        if context.line_layout is not None:
+            context.line_layout.begin_comments()
         for comment in self.pre_comments:
             write_c_line(file, indent, context, comment.to_c_string(context))
+        if context.line_layout is not None:
+            context.line_layout.end_comments()
+
+    # Write out the children given (which should be one of the child lists of this element) as C code, noting which
+    # lines belong to which child if writing to a line layout
+    def write_children_to_c(self, children, file, indent, context):
+        line_layout = context.line_layout
+        for child in children:
+            if line_layout is not None:
+                line_layout.begin_element(child, indent, children)
+            child.write_to_c(file, indent, context)
+            if line_layout is not None:
+                line_layout.end_element()
 
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
         write_c_line(file, indent, context, " // Unsupported element " + str(self))
-        for child in self.children:
-            child.write_to_c(file, indent + 1, context)
+        self.write_children_to_c(self.children, file, indent + 1, context)
         write_c_line(file, indent, context, self.add_attached_comment_to_line(context, " // End of unsupported element " + str(self)))
 
     # Dump this element for debugging
@@ -174,10 +274,9 @@ class DOMElement:
     # Gets the original source line number for this element, or None if it is not known (generally
     # synthetic elements will have no line number)
     def get_source_line(self):
-        # Look for the first token with a line number
-        for token in self.tokens:
-            if hasattr(token, 'lineno'):
-                return token.lineno
+        # All tokens have line numbers, so just use the first one
+        if len(self.tokens) > 0:
+            return self.tokens[0].lineno
         return None
 
     # Gets the fully-qualified name (C++-style) of this element (including namespaces/etc)
@@ -228,9 +327,10 @@ class DOMElement:
     def remove_child(self, child):
         if child.parent is not self:
             raise Exception("Attempt to remove child from element other than parent")
-        for child_list in self.get_writable_child_lists():
-            if child in child_list:
-                child_list.remove(child)
+        child_list, index = self.find_child(child)
+        if child_list is not None:
+            if any(child_list is writable_list for writable_list in self.get_writable_child_lists()):
+                del child_list[index]
                 child.parent = None
                 return
         # Types are not stored in a list, but are returned in one for traversal purposes. Thus they cannot be
@@ -238,6 +338,39 @@ class DOMElement:
         # by get_writable_child_lists()).
         raise Exception("Child not found in any list - this may be because it is attached as a type or similar")
 
+    # Remove multiple children from this element as a single operation
+    # Removing children one at a time with remove_child() shifts all the following children along, so their cached
+    # positions become stale and have to be searched for again - this instead rebuilds each affected list once (and
+    # records the new positions of the remaining children), so it is linear in the size of the lists
+    def remove_children(self, children):
+        children_to_remove = set()
+        for child in children:
+            if child.parent is not self:
+                raise Exception("Attempt to remove child from element other than parent")
+            children_to_remove.add(child)
+
+        # Find the lists that need rebuilding first, so that nothing is changed if any of the children can't be removed
+        writable_child_lists = self.get_writable_child_lists()
+        lists_to_rebuild = []  # (index in get_child_lists(), list) tuples
+        found_count = 0
+        for list_index, child_list in enumerate(self.get_child_lists()):
+            count = sum(1 for child in child_list if child in children_to_remove)
+            if (count > 0) and any(child_list is writable_list for writable_list in writable_child_lists):
+                lists_to_rebuild.append((list_index, child_list))
+                found_count += count
+        if found_count != len(children_to_remove):
+            raise Exception("Child not found in any list - this may be because it is attached as a type or similar")
+
+        if self._child_positions is None:
+            self._child_positions = {}
+        for list_index, child_list in lists_to_rebuild:
+            child_list[:] = [child for child in child_list if child not in children_to_remove]
+            for index, child in enumerate(child_list):
+                self._child_positions[child] = (list_index, index)
+
+        for child in children_to_remove:
+            child.parent = None
+
     # Get the depth of this node from the overall root
     def get_depth(self):
         depth = 0
@@ -279,27 +412,93 @@ class DOMElement:
         # totally different trees), return false
         return False
 
+    # Find the child list containing the child given, and the index of the child within it, as a tuple of
+    # (list index (in get_child_lists()), index within list), or None if it isn't a child of this element
+    # Positions are cached (and the navigation/insertion/removal functions record the positions of the elements they
+    # return, insert or move), so this is O(1) as long as the child lists haven't changed since the position was
+    # recorded. If they have (or the position wasn't known) the lists are searched, which is linear but fast compared to
+    # walking them.
+    def __find_child_position(self, child, child_lists):
+        if self._child_positions is None:
+            self._child_positions = {}
+
+        cached_position = self._child_positions.get(child)
+        if cached_position is not None:
+            list_index, index = cached_position
+            if list_index < len(child_lists):
+                child_list = child_lists[list_index]
+                if (index < len(child_list)) and (child_list[index] is child):
+                    return cached_position
+                # Most changes to child lists insert or remove a few children before this one, so look near the
+                # previous position first (searching a similar distance to the full search below at most)
+                search_distance = max(16, index // 8)
+                try:
+                    new_index = child_list.index(child, max(0, index - search_distance), index + search_distance + 1)
+                except ValueError:
+                    pass
+                else:
+                    # Everything else in that part of the list has most likely moved by the same amount, so record
+                    # new positions for as many children as it has moved
+                    self.__record_child_positions(list_index, child_list, new_index, max(16, abs(new_index - index)))
+                    return list_index, new_index
+
+        for list_index, child_list in enumerate(child_lists):
+            if child in child_list:
+                # Record the positions of the children following this one as well, so that visiting every child in
+                # the list in turn doesn't need a search for each (which would be quadratic)
+                # The number recorded grows with the index, so that only a logarithmic number of searches are needed,
+                # but is small enough compared to the search itself to not add much when the list is being modified
+                # and the positions won't be used
+                index = child_list.index(child)
+                self.__record_child_positions(list_index, child_list, index, max(16, index // 8))
+                return list_index, index
+
+        self._child_positions.pop(child, None)
+        return None
+
+    # Record the positions of count children in the child list given (which is at list_index in get_child_lists()),
+    # starting at index
+    def __record_child_positions(self, list_index, child_list, index, count):
+        recorded_children = itertools.islice(child_list, index, index + count)
+        self._child_positions.update(zip(recorded_children, zip(itertools.repeat(list_index), itertools.count(index))))
+
+    # Find the child list containing the child given, and the index of the child within it
+    # Returns (None, -1) if the child given isn't a child of this element
+    def find_child(self, child):
+        child_lists = self.get_child_lists()
+        position = self.__find_child_position(child, child_lists)
+        if position is None:
+            return None, -1
+        return child_lists[position[0]], position[1]
+
     # Find the element immediately prior to the child given
     def get_prev_child(self, child):
-        for child_list in self.get_child_lists():
-            for i in range(0, len(child_list)):
-                if child_list[i] == child:
-                    if i > 0:
-                        return child_list[i - 1]
-                    else:
-                        return None
-        raise Exception("Child not found in any list")
+        child_lists = self.get_child_lists()
+        position = self.__find_child_position(child, child_lists)
+        if position is None:
+            raise Exception("Child not found in any list")
+        list_index, index = position
+        if index > 0:
+            prev_child = child_lists[list_index][index - 1]
+            self._child_positions[prev_child] = (list_index, index - 1)  # Makes walking backwards O(1) per step
+            return prev_child
+        else:
+            return None
 
     # Find the element immediately after the child given
     def get_next_child(self, child):
-        for child_list in self.get_child_lists():
-            for i in range(0, len(child_list)):
-                if child_list[i] == child:
-                    if i < (len(child_list) - 1):
-                        return child_list[i + 1]
-                    else:
-                        return None
-        raise Exception("Child not found in any list")
+        child_lists = self.get_child_lists()
+        position = self.__find_child_position(child, child_lists)
+        if position is None:
+            raise Exception("Child not found in any list")
+        list_index, index = position
+        child_list = child_lists[list_index]
+        if index < (len(child_list) - 1):
+            next_child = child_list[index + 1]
+            self._child_positions[next_child] = (list_index, index + 1)  # Makes walking forwards O(1) per step
+            return next_child
+        else:
+            return None
 
     # Debug function - raises exception if the hierarchy is not valid
     def validate_hierarchy(self):
@@ -325,73 +524,185 @@ class DOMElement:
 
     # Tests if this element is a descendant of (or the same as) the element given
     def is_descendant_of(self, parent):
-        if self is parent:
-            return True
-        if self.parent is None:
-            return False
-        return self.parent.is_descendant_of(parent)
+        current = self
+        while current is not None:
+            if current is parent:
+                return True
+            current = current.parent
+        return False
 
     # Tests if this element is a descendant of (or the same as) the type given
     def is_descendant_of_type(self, element_type):
-        if isinstance(self, element_type):
-            return True
-        if self.parent is None:
-            return False
-        return self.parent.is_descendant_of_type(element_type)
+        current = self
+        while current is not None:
+            if isinstance(current, element_type):
+                return True
+            current = current.parent
+        return False
+
+    # Iterate over this element and all of its descendants, in document order (children are visited in the order
+    # get_child_lists() returns them)
+    # This doesn't use recursion, so it isn't limited by the depth of the tree
+    # types - if given, only elements that are instances of this type (or tuple of types) are returned
+    # prune - if given, the children of any element (other than this one) that is an instance of this type (or tuple of
+    #         types) are skipped - the element itself is still returned if it matches types. This can also be a
+    #         function, which should return True for elements that should have their children skipped.
+    # include_self - should this element itself be returned (if it matches types)?
+    # The children of each element are fetched when it is reached, so changing the children of the element that was
+    # last returned is fine, but other changes to the tree during iteration may or may not be seen
+    def iter_descendants(self, types=None, prune=None, include_self=True):
+        if isinstance(prune, (type, tuple)):
+            prune_types = prune
+
+            def prune(element):
+                return isinstance(element, prune_types)
+
+        # Comments can't contain other elements, so if we aren't looking for comments we don't need to visit the
+        # comments attached to elements at all
+        skip_comments = (types is not None) and not issubclass(src.code_dom.comment.DOMComment, types)
+
+        stack = [self]
+        while len(stack) > 0:
+            current = stack.pop()
+            if ((types is None) or isinstance(current, types)) and (include_self or (current is not self)):
+                yield current
+            if (prune is not None) and (current is not self) and prune(current):
+                continue
+            child_lists = current.get_child_lists()
+            # Push the children in reverse so that they come off the stack in the right order
+            for child_list_index in range(len(child_lists) - 1, -1, -1):
+                child_list = child_lists[child_list_index]
+                if skip_comments and ((child_list is current.pre_comments) or
+                                      ((len(child_list) == 1) and (child_list[0] is current.attached_comment))):
+                    continue
+                stack.extend(reversed(child_list))
 
     # Walk this element and all children, calling a function on them
     def walk(self, func):
-        func(self)
-        for child_list in self.get_child_lists():
-            for child in child_list:
-                child.walk(func)
+        for element in self.iter_descendants():
+            func(element)
 
     # Recursively find all the children of this element (and this element itself) that match the type supplied,
     # and return them as a list
     def list_all_children_of_type(self, element_type):
-        result = []
+        element_index = self.get_query_element_index()
+        if element_index is not None:
+            return element_index.list_elements_of_type(element_type, self)
+        return self.list_all_children_of_type_by_walking(element_type)
 
-        def walker(element):
-            if isinstance(element, element_type):
-                result.append(element)
-
-        self.walk(walker)
-
-        return result
+    # Implementation of list_all_children_of_type() that always walks the tree (rather than using any element index)
+    def list_all_children_of_type_by_walking(self, element_type):
+        return list(self.iter_descendants(types=element_type))
 
     # Recursively find all the children of this element (and this element itself) that match the types supplied,
     # and return them as a list
     def list_all_children_of_types(self, element_types):
-        result = []
-
-        def walker(element):
-            for element_type in element_types:
-                if isinstance(element, element_type):
-                    result.append(element)
-                    break
-
-        self.walk(walker)
-
-        return result
-
-    # Override for pickling that removes unmodified_element (mainly for cloning, as otherwise we would basically
-    # end up cloning the entire unmodified tree every time we cloned anything)
+        element_index = self.get_query_element_index()
+        if element_index is not None:
+            return element_index.list_elements_of_type(tuple(element_types), self)
+        return list(self.iter_descendants(types=tuple(element_types)))
+
+    # Recursively find all the children of this element (and this element itself) that match the type supplied and
+    # have the fully-qualified name given, and return them as a list
+    # Functions are always matched on their full name (i.e. as if return_fqn_even_for_member_functions was set)
+    def list_all_children_of_type_with_fully_qualified_name(self, element_type, fully_qualified_name):
+        get_name = src.code_dom.elementindex.get_fully_qualified_symbol_name
+        element_index = self.get_query_element_index()
+        if element_index is not None:
+            return element_index.list_elements_with_name(element_type, fully_qualified_name, get_name, self)
+        return [element for element in self.list_all_children_of_type_by_walking(element_type)
+                if get_name(element) == fully_qualified_name]
+
+    # Recursively find all the children of this element (and this element itself) that match the type supplied and
+    # have the (unqualified) name given, and return them as a list
+    def list_all_children_of_type_with_name(self, element_type, name):
+        get_name = src.code_dom.elementindex.get_unqualified_symbol_name
+        element_index = self.get_query_element_index()
+        if element_index is not None:
+            return element_index.list_elements_with_name(element_type, name, get_name, self)
+        return [element for element in self.list_all_children_of_type_by_walking(element_type)
+                if get_name(element) == name]
+
+    # Override for pickling that removes unmodified_element (as otherwise we would end up writing out the entire set of
+    # unmodified snapshots with anything we pickled)
     def __getstate__(self):
-        state = self.__dict__.copy()
-        if "unmodified_element" in state:
-            state["unmodified_element"] = None
+        slot_names, get_slot_values = get_all_slots(self.__class__)
+        state = dict(zip(slot_names, get_slot_values(self)))
+        state["unmodified_element"] = None
+        # The element index and child position cache don't get copied either (they will be rebuilt on demand)
+        if "element_index" in state:
+            state["element_index"] = None
+        state["_child_positions"] = None
         return state
 
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     # Performs a deep clone of this element and all children
+    # The clone starts out as a shallow copy of this element, and then populate_clone() replaces anything that can't
+    # be shared between the two (children, lists and so on) with copies. The clone is not attached to any parent.
     def clone(self):
-        # We need to temporarily remove our parent reference to prevent the tree above us getting cloned
-        temp_parent = self.parent
-        self.parent = None
-        clone = copy.deepcopy(self)
-        self.parent = temp_parent
-        clone.__reconnect_unmodified(self)
+        global num_elements_cloned
+        num_elements_cloned += 1
+        slot_names, get_slot_values = get_all_slots(self.__class__)
+        clone = self.__class__.__new__(self.__class__)
+        for name, value in zip(slot_names, get_slot_values(self)):
+            setattr(clone, name, value)
+        self.populate_clone(clone)
         return clone
 
+    # Fill in the clone of this element given (which starts out as a shallow copy of it) with copies of anything that
+    # can't be shared with it
+    # Element types that hold child elements or mutable state other than that in DOMElement need to override this to
+    # clone/copy those as well. Things that are never modified in-place (strings, references to other parts of the DOM
+    # such as DOMFunctionDeclaration.original_class, and unmodified_element) can simply be left shared.
+    def populate_clone(self, clone):
+        clone._parent = None
+        clone._child_positions = None
+        # Tokens are shared until one side wants to modify them (see get_writable_tokens())
+        clone.tokens = self.tokens.copy()
+        self.tokens_shared = True
+        clone.tokens_shared = True
+        clone.children = self.clone_child_list(self.children, clone)
+        clone.pre_comments = self.clone_child_list(self.pre_comments, clone)
+        clone.attached_comment = self.clone_child(self.attached_comment, clone)
+
+    # Helper for populate_clone() implementations - clones a child of this element, for adding to clone_parent (the
+    # clone of this element)
+    # child can be None, in which case this returns None
+    def clone_child(self, child, clone_parent):
+        if child is None:
+            return None
+        child_clone = child.clone()
+        # This bypasses the parent property, as the clone isn't part of any tree yet
+        if child._parent is self:
+            child_clone._parent = clone_parent
+        return child_clone
+
+    # Helper for populate_clone() implementations - clones a list of children of this element, for adding to
+    # clone_parent (the clone of this element)
+    def clone_child_list(self, child_list, clone_parent):
+        return [self.clone_child(child, clone_parent) for child in child_list]
+
+    # Get the tokens of this element for modifying in-place
+    # Clones share token objects with the element they were cloned from, so anything that changes the contents of
+    # tokens (rather than just replacing the token list) needs to get them via this, which copies them first if needed
+    def get_writable_tokens(self):
+        self.make_tokens_writable()
+        return self.tokens
+
+    # Make sure that the tokens of this element aren't shared with any other element (see get_writable_tokens())
+    def make_tokens_writable(self):
+        if self.tokens_shared:
+            self.copy_shared_tokens()
+            self.tokens_shared = False
+
+    # Replace the tokens of this element with copies, as part of make_tokens_writable()
+    # Element types that have other token lists that can be modified in-place override this to copy those too
+    def copy_shared_tokens(self):
+        self.tokens = [copy.copy(token) for token in self.tokens]
+
     # Clone this element but without any children, where "children" means explicit children, such as contained
     # function/fields or similar, but not technically-children like types/arguments/etc. Attached comments are cloned.
     def clone_without_children(self):
@@ -401,40 +712,10 @@ class DOMElement:
         self.children = temp_children
         return clone
 
-    # Reconnect "unmodified_element" on a whole tree of elements
-    # (used after cloning, as we don't clone unmodified_element)
-    def __reconnect_unmodified(self, original):
-        self.unmodified_element = original.unmodified_element
-
-        for child_list, original_child_list in zip(self.get_child_lists(), original.get_child_lists()):
-            for child, original_child in zip(child_list, original_child_list):
-                child.__reconnect_unmodified(original_child)
-
-    # This creates a clone of this element and all children, stored in the "unmodified_element" field of each
-    # corresponding element
-    def save_unmodified_clones(self):
-        clone = copy.deepcopy(self)
-        self.__attach_unmodified_clones(clone)
-
-    # Attach unmodified clones to the tree recursively
-    def __attach_unmodified_clones(self, clone):
-
-        # This shouldn't really be necessary, but as a sanity check make sure we're matching (probably) the correct
-        # elements to each other
-        if str(self) != str(clone):
-            raise Exception("Unmodified clone mismatch error")
-
-        self.unmodified_element = clone
-
-        if len(self.get_child_lists()) != len(clone.get_child_lists()):
-            raise Exception("Unmodified clone mismatch error")
-
-        for child_list, clone_child_list in zip(self.get_child_lists(), clone.get_child_lists()):
-            if len(child_list) != len(clone_child_list):
-                raise Exception("Unmodified clone mismatch error")
-
-            for child, clone_child in zip(child_list, clone_child_list):
-                child.__attach_unmodified_clones(clone_child)
+    # This creates a snapshot of the original state of this element and all children (see DOMElementSnapshot),
+    # stored in the "unmodified_element" field of each corresponding element
+    def save_unmodified_snapshots(self):
+        src.code_dom.elementsnapshot.DOMElementSnapshot.create(self, None, {})
 
     # Is this element a preprocessor container (#if or similar)?
     def is_preprocessor_container(self):
@@ -444,16 +725,12 @@ class DOMElement:
     # all children inside preprocessor #if blocks, but not children of contained structs/namespaces/etc
     # (so in other words, what the C compiler would consider children, after preprocessing has been done)
     def list_directly_contained_children(self):
-        result = []
-        for child_list in self.get_child_lists():
-            for child in child_list:
-                if child.is_preprocessor_container():
-                    # Recurse into preprocessor containers
-                    for container_child in child.list_directly_contained_children():
-                        result.append(container_child)
-                else:
-                    result.append(child)
-        return result
+        def is_not_preprocessor_container(element):
+            return not element.is_preprocessor_container()
+
+        # Descend into preprocessor containers, but nothing else
+        return [element for element in self.iter_descendants(prune=is_not_preprocessor_container, include_self=False)
+                if is_not_preprocessor_container(element)]
 
     # Get a list of all directly contained children that match the type supplied
     # (see list_directly_contained_children() for a definition of what "directly contained" means here)
@@ -469,46 +746,77 @@ class DOMElement:
     # Replace the direct child element given with one or more new children
     # Removes the child from any previous parent
     def replace_child(self, old_child, new_children):
-        old_child.parent = None
-        new_children.reverse()  # We're going to insert in backwards order
-        for child_list in self.get_child_lists():
-            for i in range(0, len(child_list)):
-                if child_list[i] == old_child:
-                    child_list.remove(old_child)
-                    for new_child in new_children:
-                        if new_child.parent is not None:
-                            new_child.parent.remove_child(new_child)
-                        child_list.insert(i, new_child)
-                        new_child.parent = self
-                    return
-        raise Exception("Unable to find child to replace")
+        self.__splice_children_at_child(old_child, new_children, 0, True, "Unable to find child to replace")
 
     # Insert children before the direct child element given
     # Removes the children from any previous parent
     def insert_before_child(self, existing_child, new_children):
-        new_children.reverse()  # We're going to insert in backwards order
-        for child_list in self.get_child_lists():
-            for i in range(0, len(child_list)):
-                if child_list[i] == existing_child:
-                    for new_child in new_children:
-                        if new_child.parent is not None:
-                            new_child.parent.remove_child(new_child)
-                        child_list.insert(i, new_child)
-                        new_child.parent = self
-                    return
-        raise Exception("Unable to find child to insert after")
+        self.__splice_children_at_child(existing_child, new_children, 0, False, "Unable to find child to insert after")
 
     # Insert children after the direct child element given
     # Removes the children from any previous parent
     def insert_after_child(self, existing_child, new_children):
-        new_children.reverse()  # We're going to insert in backwards order
-        for child_list in self.get_child_lists():
-            for i in range(0, len(child_list)):
-                if child_list[i] == existing_child:
-                    for new_child in new_children:
-                        if new_child.parent is not None:
-                            new_child.parent.remove_child(new_child)
-                        child_list.insert(i + 1, new_child)
-                        new_child.parent = self
-                    return
-        raise Exception("Unable to find child to insert after")
+        self.__splice_children_at_child(existing_child, new_children, 1, False, "Unable to find child to insert after")
+
+    # Insert children into the child list given (which must be one of the lists returned by get_child_lists()) at
+    # the index given, as a single operation
+    # Removes the children from any previous parent (note that if any of them were previously in the same list before
+    # index, then they will end up being inserted later than expected - replace_child()/insert_before_child()/
+    # insert_after_child() don't have this problem, and should be used in preference where possible)
+    def splice_children(self, child_list, index, new_children):
+        self.__detach_children(new_children)
+        child_list[index:index] = new_children
+        for new_child in new_children:
+            new_child.parent = self
+
+    # Remove the elements given from their current parents (if they have them), removing all the children of each
+    # parent in a single operation
+    @staticmethod
+    def __detach_children(elements):
+        elements_by_parent = {}
+        for element in elements:
+            if element.parent is not None:
+                elements_by_parent.setdefault(element.parent, []).append(element)
+        for parent, children in elements_by_parent.items():
+            parent.remove_children(children)
+
+    # Implementation of replace_child(), insert_before_child() and insert_after_child()
+    # Inserts new_children at offset from existing_child (0 = before it, 1 = after it), optionally removing
+    # existing_child first
+    def __splice_children_at_child(self, existing_child, new_children, offset, remove_existing_child, error_message):
+        # Copy the list, as the caller might pass in a list that removing the children from their parents modifies
+        new_children = list(new_children)
+
+        # existing_child may itself be one of the new children (for example when replacing an element with a list that
+        # contains it), in which case the new children all go where it is
+        includes_existing_child = any(new_child is existing_child for new_child in new_children)
+
+        # Remove the new children from their previous parents first, so that if that involves removing them from the
+        # same list existing_child is in, then we find the correct position for existing_child afterwards
+        # (existing_child itself stays where it is until we have found it)
+        self.__detach_children([new_child for new_child in new_children if new_child is not existing_child])
+
+        child_lists = self.get_child_lists()
+        position = self.__find_child_position(existing_child, child_lists)
+        if position is None:
+            raise Exception(error_message)
+        list_index, index = position
+        child_list = child_lists[list_index]
+
+        if remove_existing_child or includes_existing_child:
+            existing_child.parent = None
+            del child_list[index]
+        if not includes_existing_child:
+            index += offset
+
+        child_list[index:index] = new_children
+
+        # Record where everything ended up, so that (for example) inserting more elements after the last one added
+        # doesn't involve searching for it
+        for i, new_child in enumerate(new_children):
+            self._child_positions[new_child] = (list_index, index + i)
+        if (not remove_existing_child) and (not includes_existing_child) and (offset == 0):
+            self._child_positions[existing_child] = (list_index, index + len(new_children))
+
+        for new_child in new_children:
+            new_child.parent = self
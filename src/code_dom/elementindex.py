@@ -0,0 +1,330 @@
+import bisect
+import heapq
+import src.code_dom
+
+# Debug option - if this is set then every query made through an element index is cross-checked against the result of
+# actually walking the tree, and an exception is raised if they differ
+validate_queries = False
+
+
+# Get a map from each child of the element given to its position, in the order DOMElement.walk() visits them
+def get_child_ordinals(element):
+    ordinals = {}
+    for child_list in element.get_child_lists():
+        for child in child_list:
+            if child not in ordinals:
+                ordinals[child] = len(ordinals)
+    return ordinals
+
+
+# Get the fully-qualified name an element is looked up by in a symbol table
+# This is the same as get_fully_qualified_name(), except that member functions always return their full name
+def get_fully_qualified_symbol_name(element):
+    if isinstance(element, src.code_dom.functiondeclaration.DOMFunctionDeclaration):
+        return element.get_fully_qualified_name(return_fqn_even_for_member_functions=True)
+    return element.get_fully_qualified_name()
+
+
+# Get the (unqualified) name an element is looked up by in a symbol table
+# After flattening this is the name the element will have in the C output
+def get_unqualified_symbol_name(element):
+    return getattr(element, "name", None)
+
+
+# A table mapping names to the elements of a single class that have them, maintained by DOMElementIndex
+class SymbolTable:
+    def __init__(self, get_name):
+        self.get_name = get_name  # Function returning the name to look up an element by
+        self.elements_by_name = {}  # Map from name to a list of elements with that name, in document order
+        self.element_names = {}  # Map from element to the name it is currently registered under
+
+    # Add an element, using get_position to determine where it goes in document order
+    def add(self, element, get_position):
+        name = self.get_name(element)
+        self.element_names[element] = name
+        elements = self.elements_by_name.get(name)
+        if elements is None:
+            self.elements_by_name[name] = [element]
+        else:
+            bisect.insort(elements, element, key=get_position)
+
+    def remove(self, element):
+        if element not in self.element_names:
+            return
+        name = self.element_names.pop(element)
+        elements = self.elements_by_name[name]
+        elements.remove(element)
+        if len(elements) == 0:
+            del self.elements_by_name[name]
+
+
+# An index of all the elements in a DOM tree, by class
+# This is created on demand by the root of the tree (see DOMHeaderFileSet), and is then kept up-to-date incrementally.
+# Whenever an element is added to or removed from the tree its parent gets set, and DOMElement.parent then marks the
+# old and new parent elements as dirty in the index. The next time the index is queried, it compares the current
+# children of each dirty element with the ones it recorded previously and adds/removes elements accordingly. This
+# means that code which manipulates child lists directly is fine as long as it sets the parent of the elements involved
+# (or calls DOMElement.mark_child_lists_changed() if it doesn't).
+# Elements are kept in document order for each class, where the position of an element in the document is determined
+# by the index of each of its ancestors in the (concatenated) child lists of their respective parents.
+# The index also maintains symbol tables for looking elements up by their (fully-qualified or unqualified) name. These
+# are created for each class the first time they are needed, and updated when elements are added/removed or when
+# DOMElement.name is set (which calls DOMElement.mark_name_changed(), and as renaming an element can change the
+# fully-qualified names of its children the whole subtree gets updated). Note that only names that are derived from the
+# names of elements and the structure of the tree are supported - the "name" of a DOMType, for example, comes from its
+# tokens, and so looking up types by name isn't possible.
+class DOMElementIndex:
+    def __init__(self, root):
+        self.root = root
+        self.members = set()  # All elements currently in the index
+        self.elements_by_class = {}  # Map from element class to a list of elements of exactly that class
+        self.child_ordinals = {}  # The children of each element with children, as of the last update
+        self.dirty_parents = set()  # Elements whose children may have changed since the last update
+        self.classes_with_removals = set()  # Classes where elements_by_class contains elements that have been removed
+        self.query_cache = {}  # Results of previous queries (cleared whenever the tree changes)
+        self.symbol_tables = {}  # Map from (element class, name function) to the SymbolTable for that combination
+        self.symbol_tables_by_class = {}  # Map from element class to a list of all the symbol tables for that class
+        self.renamed_elements = set()  # Elements that have been renamed since the last update
+
+        for element in root.iter_descendants():
+            self.members.add(element)
+            ordinals = get_child_ordinals(element)
+            if len(ordinals) > 0:
+                self.child_ordinals[element] = ordinals
+            element_class = type(element)
+            if element_class not in self.elements_by_class:
+                self.elements_by_class[element_class] = []
+            self.elements_by_class[element_class].append(element)
+
+    # Note that the child lists of the element given may have changed
+    def mark_dirty(self, element):
+        self.dirty_parents.add(element)
+        self.query_cache.clear()
+
+    # Note that the name of the element given has changed
+    def mark_renamed(self, element):
+        if len(self.symbol_tables) > 0:
+            self.renamed_elements.add(element)
+
+    # Get the position of an element within the tree, as a tuple of child indices from the root
+    def get_position(self, element):
+        position = []
+        while element is not self.root:
+            parent = element.parent
+            position.append(self.child_ordinals[parent][element])
+            element = parent
+        position.reverse()
+        return tuple(position)
+
+    # Remove an element and all of its (previously recorded) descendants from the index
+    def remove_subtree(self, element):
+        stack = [element]
+        while len(stack) > 0:
+            current = stack.pop()
+            if current not in self.members:
+                continue
+            self.members.remove(current)
+            self.classes_with_removals.add(type(current))
+            for symbol_table in self.symbol_tables_by_class.get(type(current), ()):
+                symbol_table.remove(current)
+            ordinals = self.child_ordinals.pop(current, None)
+            if ordinals is not None:
+                stack.extend(ordinals)
+
+    # Add an element and all of its descendants to the index (apart from the per-class lists), appending the newly
+    # added elements to added_elements
+    def add_subtree(self, element, added_elements):
+        stack = [element]
+        while len(stack) > 0:
+            current = stack.pop()
+            if current in self.members:
+                continue
+            self.members.add(current)
+            added_elements.append(current)
+            ordinals = get_child_ordinals(current)
+            if len(ordinals) > 0:
+                self.child_ordinals[current] = ordinals
+                stack.extend(ordinals)
+
+    # Remove elements that are no longer in the tree from the per-class lists
+    def remove_deleted_elements(self):
+        for element_class in self.classes_with_removals:
+            self.elements_by_class[element_class] = [element for element in self.elements_by_class[element_class]
+                                                     if element in self.members]
+        self.classes_with_removals.clear()
+
+    # Bring the index up-to-date with any changes that have been made to the tree
+    def update(self):
+        positions = {}  # The tree doesn't change while we are updating, so positions can safely be cached
+
+        def get_cached_position(element):
+            position = positions.get(element)
+            if position is None:
+                position = self.get_position(element)
+                positions[element] = position
+            return position
+
+        if len(self.dirty_parents) > 0:
+            # Work out what has changed for each dirty element that is (still) in the tree
+            changes = []
+            for parent in self.dirty_parents:
+                if parent in self.members:
+                    changes.append((parent, self.child_ordinals.get(parent, {}), get_child_ordinals(parent)))
+            self.dirty_parents.clear()
+
+            # Do all the removals first, so that anything which has moved from one place to another gets removed from
+            # its old location before being added at the new one
+            for parent, old_ordinals, new_ordinals in changes:
+                removed_children = [child for child in old_ordinals if child not in new_ordinals]
+                # If any of the children that are still present have changed order then the simplest thing to do is to
+                # treat them all as having been removed and added again
+                if [child for child in old_ordinals if child in new_ordinals] != \
+                        [child for child in new_ordinals if child in old_ordinals]:
+                    removed_children = list(old_ordinals)
+                for child in removed_children:
+                    self.remove_subtree(child)
+
+            # Compact the per-class lists now, as elements that have moved will be re-added to them below
+            self.remove_deleted_elements()
+
+            added_children = []
+            for parent, old_ordinals, new_ordinals in changes:
+                if parent not in self.members:
+                    continue  # The parent itself was removed
+                if len(new_ordinals) > 0:
+                    self.child_ordinals[parent] = new_ordinals
+                else:
+                    self.child_ordinals.pop(parent, None)
+                for child in new_ordinals:
+                    if child not in self.members:
+                        added_children.append(child)
+
+            added_elements = []
+            for child in added_children:
+                self.add_subtree(child, added_elements)
+
+            # Now everything is in place we can insert the new elements into the per-class lists in the right places
+            for element in added_elements:
+                element_class = type(element)
+                if element_class not in self.elements_by_class:
+                    self.elements_by_class[element_class] = []
+                bisect.insort(self.elements_by_class[element_class], element, key=get_cached_position)
+                for symbol_table in self.symbol_tables_by_class.get(element_class, ()):
+                    symbol_table.add(element, get_cached_position)
+
+        if len(self.renamed_elements) > 0:
+            # Renaming an element can change the fully-qualified names of everything inside it, so update whole subtrees
+            updated_elements = set()
+            for renamed_element in self.renamed_elements:
+                if renamed_element not in self.members:
+                    continue  # Not in the tree any more
+                for element in renamed_element.iter_descendants():
+                    if (element in updated_elements) or (element not in self.members):
+                        continue
+                    updated_elements.add(element)
+                    for symbol_table in self.symbol_tables_by_class.get(type(element), ()):
+                        symbol_table.remove(element)
+                        symbol_table.add(element, get_cached_position)
+            self.renamed_elements.clear()
+
+    # Get a list of all the elements of the type (or tuple of types) given, in document order, optionally restricted
+    # to the descendants of a specific element (including the element itself)
+    def list_elements_of_type(self, element_type, within=None):
+        self.update()
+
+        result = self.query_cache.get(element_type)
+        if result is None:
+            matching_lists = [elements for element_class, elements in self.elements_by_class.items()
+                              if issubclass(element_class, element_type) and (len(elements) > 0)]
+            if len(matching_lists) == 1:
+                result = matching_lists[0]
+            else:
+                result = list(heapq.merge(*matching_lists, key=self.get_position))
+            self.query_cache[element_type] = result
+
+        if (within is not None) and (within is not self.root):
+            result = [element for element in result if element.is_descendant_of(within)]
+        else:
+            result = list(result)  # Return a copy so the caller can't modify the cached version
+
+        if validate_queries:
+            self.validate_query(element_type, within if within is not None else self.root, result)
+
+        return result
+
+    # Get the symbol table for the element class and name function given, creating it if necessary
+    def get_symbol_table(self, element_class, get_name):
+        symbol_table = self.symbol_tables.get((element_class, get_name))
+        if symbol_table is None:
+            symbol_table = SymbolTable(get_name)
+            for element in self.elements_by_class[element_class]:
+                # Elements are already in document order, so they can just be appended
+                name = get_name(element)
+                symbol_table.element_names[element] = name
+                if name not in symbol_table.elements_by_name:
+                    symbol_table.elements_by_name[name] = []
+                symbol_table.elements_by_name[name].append(element)
+            self.symbol_tables[(element_class, get_name)] = symbol_table
+            if element_class not in self.symbol_tables_by_class:
+                self.symbol_tables_by_class[element_class] = []
+            self.symbol_tables_by_class[element_class].append(symbol_table)
+        return symbol_table
+
+    # Get a list of all the elements of the type (or tuple of types) given for which get_name() returns name, in
+    # document order, optionally restricted to the descendants of a specific element (including the element itself)
+    # get_name should be get_fully_qualified_symbol_name() or get_unqualified_symbol_name()
+    def list_elements_with_name(self, element_type, name, get_name, within=None):
+        self.update()
+
+        matching_lists = []
+        for element_class in self.elements_by_class:
+            if issubclass(element_class, element_type):
+                elements = self.get_symbol_table(element_class, get_name).elements_by_name.get(name)
+                if elements is not None:
+                    matching_lists.append(elements)
+
+        if len(matching_lists) == 0:
+            result = []
+        elif len(matching_lists) == 1:
+            result = list(matching_lists[0])
+        else:
+            result = list(heapq.merge(*matching_lists, key=self.get_position))
+
+        if (within is not None) and (within is not self.root):
+            result = [element for element in result if element.is_descendant_of(within)]
+
+        if validate_queries:
+            self.validate_query(element_type, within if within is not None else self.root, result,
+                                lambda element: get_name(element) == name)
+
+        return result
+
+    # Get the elements from the collection given that are (still) in the tree, sorted into document order
+    def sort_in_document_order(self, elements):
+        self.update()
+
+        positions = {}
+        for element in elements:
+            if element in self.members:
+                positions[element] = self.get_position(element)
+        result = sorted(positions, key=positions.get)
+
+        if validate_queries:
+            element_set = set(elements)
+            self.validate_query(tuple(set(type(element) for element in element_set)), self.root, result,
+                                lambda element: element in element_set)
+
+        return result
+
+    # Check that a query result matches what walking the tree produces (optionally filtered by a predicate)
+    def validate_query(self, element_type, within, result, predicate=None):
+        expected = within.list_all_children_of_type_by_walking(element_type)
+        if predicate is not None:
+            expected = [element for element in expected if predicate(element)]
+        if len(expected) != len(result) or any(a is not b for a, b in zip(expected, result)):
+            missing = [str(element) for element in expected if element not in result]
+            unexpected = [str(element) for element in result if element not in expected]
+            raise Exception("Element index query for " + str(element_type) + " within " + str(within) +
+                            " does not match the tree (" + str(len(result)) + " elements, expected " +
+                            str(len(expected)) + "; missing " + str(missing[:5]) + ", unexpected " +
+                            str(unexpected[:5]) + ")")
@@ -0,0 +1,163 @@
+from .common import *
+import copy
+import src.code_dom
+
+
+# A lightweight read-only record of the original (i.e. unmodified) state of a DOM element, created by
+# DOMElement.save_unmodified_snapshots() before any modifiers are applied and stored in the "unmodified_element" field
+# of the element.
+# Rather than being a complete clone of the element, this only records the information that code looking at the
+# original elements actually uses - the element type, name, fully-qualified name, parent/children and (for types) a
+# copy of the tokens - and provides the same interface as DOMElement for accessing it.
+# Snapshots are never modified once created, so they (and their token tuples) can be freely shared between the
+# elements of a DOM and any clones of them.
+class DOMElementSnapshot:
+    __slots__ = ["element_class",  # The class of the original element
+                 "parent",  # Snapshot of the parent element
+                 "children",  # Tuple of snapshots of all the child elements (from every child list)
+                 "name",  # The original name of the element (or None if it has no name)
+                 "fully_qualified_name",  # The original fully-qualified name (None for types, which compute it)
+                 "fully_qualified_name_with_leading_colons",  # As above, but with leading colons
+                 "tokens",  # Tuple of copies of the original tokens (types only)
+                 "arguments",  # Tuple of snapshots of the original arguments (functions only)
+                 "return_type",  # Snapshot of the original return type (functions only)
+                 "arg_type",  # Snapshot of the original argument type (function arguments only)
+                 "is_array",  # Was this an array?
+                 "use_pointer_cast_conversion",  # Copied from DOMType
+                 "fallback_element"  # Detached clone of the element for things we can't represent as a snapshot
+                 ]
+
+    def __init__(self):
+        self.element_class = None
+        self.parent = None
+        self.children = ()
+        self.name = None
+        self.fully_qualified_name = None
+        self.fully_qualified_name_with_leading_colons = None
+        self.tokens = None
+        self.arguments = None
+        self.return_type = None
+        self.arg_type = None
+        self.is_array = False
+        self.use_pointer_cast_conversion = False
+        self.fallback_element = None
+
+    # Create a snapshot of an element and all of its children, storing the snapshot for each one in the
+    # "unmodified_element" field of the element
+    # token_copies is a map from the id() of tokens to the copies made of them, so that tokens that are referenced by
+    # more than one element only get copied once
+    @staticmethod
+    def create(element, parent_snapshot, token_copies):
+        snapshot = DOMElementSnapshot()
+        snapshot.element_class = type(element)
+        snapshot.parent = parent_snapshot
+        snapshot.name = getattr(element, "name", None)
+        snapshot.is_array = getattr(element, "is_array", False)
+
+        if isinstance(element, src.code_dom.type.DOMType):
+            # Types are entirely described by their tokens, so we just need copies of those (as the modifiers alter
+            # tokens in-place), and the fully-qualified name can be generated from them on demand
+            snapshot.tokens = tuple(DOMElementSnapshot.__copy_token(token, token_copies) for token in element.tokens)
+            snapshot.use_pointer_cast_conversion = element.use_pointer_cast_conversion
+        else:
+            if isinstance(element, src.code_dom.functionpointertype.DOMFunctionPointerType):
+                # Function pointers are complex enough to render that it isn't worth trying to duplicate the logic for
+                # them here, so just keep a detached clone around
+                # (this happens before element.unmodified_element gets set, so the clone doesn't get linked to us)
+                snapshot.fallback_element = element.clone()
+            snapshot.fully_qualified_name = element.get_fully_qualified_name()
+            snapshot.fully_qualified_name_with_leading_colons = \
+                element.get_fully_qualified_name(include_leading_colons=True)
+
+        element.unmodified_element = snapshot
+
+        children = []
+        for child_list in element.get_child_lists():
+            for child in child_list:
+                children.append(DOMElementSnapshot.create(child, snapshot, token_copies))
+        if len(children) > 0:
+            snapshot.children = tuple(children)
+
+        if isinstance(element, (src.code_dom.functiondeclaration.DOMFunctionDeclaration,
+                                src.code_dom.functionpointertype.DOMFunctionPointerType)):
+            snapshot.arguments = tuple(argument.unmodified_element for argument in element.arguments)
+            if element.return_type is not None:
+                snapshot.return_type = element.return_type.unmodified_element
+        elif isinstance(element, src.code_dom.functionargument.DOMFunctionArgument):
+            if element.arg_type is not None:
+                snapshot.arg_type = element.arg_type.unmodified_element
+
+        return snapshot
+
+    @staticmethod
+    def __copy_token(token, token_copies):
+        token_copy = token_copies.get(id(token))
+        if token_copy is None:
+            token_copy = copy.copy(token)
+            token_copies[id(token)] = token_copy
+        return token_copy
+
+    # Is this a snapshot of a type?
+    def is_type(self):
+        return self.tokens is not None
+
+    # Gets the original fully-qualified name of the element
+    # (leaf_name is only supported for compatibility with DOMElement, and must be empty)
+    def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
+        if leaf_name != "":
+            raise Exception("Element snapshots do not support generating fully-qualified names with leaf names")
+        if self.is_type():
+            context = WriteContext()
+            context.include_leading_colons = include_leading_colons
+            return self.to_c_string(context)
+        if include_leading_colons:
+            return self.fully_qualified_name_with_leading_colons
+        else:
+            return self.fully_qualified_name
+
+    # Gets the original fully-qualified name of the element (this is for consistency with DOMElement)
+    def get_original_fully_qualified_name(self, include_leading_colons=False):
+        return self.get_fully_qualified_name("", include_leading_colons)
+
+    # Get the snapshot of the class/struct/union this element was originally contained in (if any)
+    def get_parent_class(self):
+        current = self.parent
+        while current is not None:
+            if issubclass(current.element_class, src.code_dom.classstructunion.DOMClassStructUnion):
+                return current
+            current = current.parent
+        return None
+
+    # Returns a list of the snapshots of all the children of this element (recursively) that were of the element type
+    # given
+    def list_all_children_of_type(self, element_type):
+        result = []
+        stack = [self]
+        while len(stack) > 0:
+            current = stack.pop()
+            if issubclass(current.element_class, element_type):
+                result.append(current)
+            stack.extend(reversed(current.children))
+        return result
+
+    # Write the original element as a C string (only supported for types and function pointers)
+    def to_c_string(self, context=WriteContext()):
+        if self.fallback_element is not None:
+            return self.fallback_element.to_c_string(context)
+        if self.is_type():
+            return src.code_dom.type.DOMType.tokens_to_c_string(self.tokens, context)
+        raise Exception("Element snapshots of type " + self.element_class.__name__ + " cannot be written as C strings")
+
+    # Create a new (modifiable) element from this snapshot (only supported for types and function pointers)
+    def clone(self):
+        if self.fallback_element is not None:
+            return self.fallback_element.clone()
+        if self.is_type():
+            dom_type = src.code_dom.type.DOMType()
+            dom_type.tokens = [copy.copy(token) for token in self.tokens]
+            dom_type.use_pointer_cast_conversion = self.use_pointer_cast_conversion
+            return dom_type
+        raise Exception("Element snapshots of type " + self.element_class.__name__ + " cannot be cloned")
+
+    def __str__(self):
+        return "Snapshot: " + self.element_class.__name__ + " " + str(self.get_fully_qualified_name())
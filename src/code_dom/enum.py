@@ -4,9 +4,13 @@ from src import code_dom
 
 # An enum
 class DOMEnum(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "is_enum_class", "is_forward_declaration", "emit_as_anonymous_for_c",
+                 "storage_type", "is_flags_enum"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.is_enum_class = False
         self.is_forward_declaration = False
         self.emit_as_anonymous_for_c = False  # If this is true, then the enum will be emitted as anonymous in C
@@ -34,9 +38,9 @@ class DOMEnum(code_dom.element.DOMElement):
 
         dom_element.name = name_tok.value
 
-        # We need a custom content parser for enums
-        old_content_parser = context.current_content_parser
-        context.current_content_parser = lambda: DOMEnum.parse_content(context, stream)
+        # We need a custom parser table for enums
+        old_parser_table = context.current_parser_table
+        context.current_parser_table = code_dom.parsertable.enum_parser_table
 
         if stream.get_token_of_type(['LBRACE']) is not None:
             while True:
@@ -45,19 +49,20 @@ class DOMEnum(code_dom.element.DOMElement):
                     stream.get_token()  # Eat the closing brace
                     break
 
-                element = context.current_content_parser()
+                element = context.parse_content(stream)
 
                 if element is not None:
                     if not element.no_default_add:
                         dom_element.add_child(element, context)
                 else:
+                    context.current_parser_table = old_parser_table
                     stream.rewind(checkpoint)
                     return None
         else:
             # If there was no opening brace then this was a forward declaration
             dom_element.is_forward_declaration = True
 
-        context.current_content_parser = old_content_parser
+        context.current_parser_table = old_parser_table
 
         stream.get_token_of_type(['SEMICOLON'])  # Eat the trailing semicolon
 
@@ -65,22 +70,16 @@ class DOMEnum(code_dom.element.DOMElement):
 
     @staticmethod
     def parse_content(context, stream):
-        # Allow common element types (comments/etc)
-        common_element = code_dom.element.DOMElement.parse_common(context, stream)
-        if common_element is not None:
-            return common_element
+        return code_dom.parsertable.enum_parser_table.parse(context, stream)
 
+    # Parse an enum element (used for anything that isn't a common element type when parsing enum contents)
+    @staticmethod
+    def parse_enum_element(context, stream):
         # Eat commas - technically we shouldn't really need to do this but there are some constructs involving
         # #ifdefs inside enums that are hard to parse "correctly" without it
         stream.get_token_of_type(['COMMA'])
 
-        # Anything not a common element type must be an enum element
-        element = code_dom.enumelement.DOMEnumElement.parse(context, stream)
-
-        if element is not None:
-            return element
-        else:
-            return None
+        return code_dom.enumelement.DOMEnumElement.parse(context, stream)
 
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
         if self.is_enum_class:
@@ -100,6 +99,10 @@ class DOMEnum(code_dom.element.DOMElement):
             else:
                 return ("::" if include_leading_colons else "") + self.name
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.storage_type = self.clone_child(self.storage_type, clone)
+
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
 
@@ -116,8 +119,7 @@ class DOMEnum(code_dom.element.DOMElement):
             write_c_line(file, indent, context, "{")
 
             # Write enum elements
-            for child in self.children:
-                child.write_to_c(file, indent + 1, context)
+            self.write_children_to_c(self.children, file, indent + 1, context)
 
             if self.name is not None and not self.emit_as_anonymous_for_c:
                 write_c_line(file, indent, context, "} " + self.name + ";")
@@ -141,8 +143,7 @@ class DOMEnum(code_dom.element.DOMElement):
 
             if not self.is_forward_declaration:
                 write_c_line(file, indent, context, "{")
-                for child in self.children:
-                    child.write_to_c(file, indent + 1, context)
+                self.write_children_to_c(self.children, file, indent + 1, context)
                 write_c_line(file, indent, context, "};")
 
     def __str__(self):
@@ -4,9 +4,12 @@ from src import code_dom
 
 # A single element within an enum
 class DOMEnumElement(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "value_tokens", "value_alignment", "value", "is_count"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.value_tokens = None
         self.value_alignment = 0  # Column to align values to (for aesthetic purposes)
         self.value = None  # Evaluated actual value (if known)
@@ -73,6 +76,11 @@ class DOMEnumElement(code_dom.element.DOMElement):
         else:
             return collapse_tokens_to_string(self.value_tokens)
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        if self.value_tokens is not None:
+            clone.value_tokens = self.value_tokens.copy()
+
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
@@ -4,6 +4,8 @@ from src import code_dom
 
 # A #error statement
 class DOMError(code_dom.element.DOMElement):
+    __slots__ = []
+
     def __init__(self):
         super().__init__()
 
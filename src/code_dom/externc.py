@@ -4,6 +4,8 @@ from src import code_dom
 
 # An "extern C" statement
 class DOMExternC(code_dom.element.DOMElement):
+    __slots__ = ["is_cpp_guarded"]
+
     def __init__(self):
         super().__init__()
         self.is_cpp_guarded = False  # Is this extern block surrounded with an implicit #ifdef __cplusplus guard?
@@ -29,23 +31,28 @@ class DOMExternC(code_dom.element.DOMElement):
 
         has_braces = stream.get_token_of_type(['LBRACE'])
 
+        old_parser_table = context.current_parser_table
+        context.current_parser_table = code_dom.parsertable.externc_parser_table
+
         while True:
             tok = stream.peek_token()
             if has_braces and (tok.type == 'RBRACE'):
                 stream.get_token()  # Eat the closing brace
                 break
 
-            child_element = context.current_content_parser()
+            child_element = context.parse_content(stream)
             if child_element is not None:
                 if not child_element.no_default_add:
                     dom_element.add_child(child_element, context)
             else:
-                print("Unrecognised element: " + str(vars(tok)) + " in DOMExternC")
+                print("Unrecognised element: " + str(tok) + " in DOMExternC")
                 break
 
             if not has_braces:
                 break  # Only parse one element if there were no braces
 
+        context.current_parser_table = old_parser_table
+
         if not has_braces:
             stream.get_token_of_type(['SEMICOLON'])  # Eat the trailing semicolon
 
@@ -69,16 +76,14 @@ class DOMExternC(code_dom.element.DOMElement):
             # Single-line(-ish) version
             if self.is_cpp_guarded:
                 write_c_line(file, indent, context, '#endif')
-            for child in self.children:
-                child.write_to_c(file, indent + 1, context)
+            self.write_children_to_c(self.children, file, indent + 1, context)
         else:
             # Multi-line version
             write_c_line(file, indent, context, "{")
             if self.is_cpp_guarded:
                 write_c_line(file, indent, context, '#endif')
-            for child in self.children:
-                # Only indent in the non-guarded case, for aesthetic purposes
-                child.write_to_c(file, indent + (0 if self.is_cpp_guarded else 1), context)
+            # Only indent in the non-guarded case, for aesthetic purposes
+            self.write_children_to_c(self.children, file, indent + (0 if self.is_cpp_guarded else 1), context)
             if self.is_cpp_guarded:
                 write_c_line(file, indent, context, '#ifdef __cplusplus')
             write_c_line(file, indent, context, '} // End of extern "C" block')
@@ -4,10 +4,14 @@ from src import code_dom
 
 # A field declaration
 class DOMFieldDeclaration(code_dom.element.DOMElement):
+    __slots__ = ["field_type", "names", "old_names", "is_static", "is_extern", "is_anonymous", "is_array",
+                 "width_specifiers", "array_bounds_tokens", "is_imgui_api", "name_alignment", "default_value_tokens"]
+
     def __init__(self):
         super().__init__()
         self.field_type = None  # A DOMType giving the type of the field
         self.names = []
+        self.old_names = None  # The names prior to namespace flattening (see mod_flatten_namespaces)
         self.is_static = False
         self.is_extern = False
         self.is_anonymous = False  # True if the field is anonymous (an implicit field for a nested type declaration)
@@ -15,7 +19,6 @@ class DOMFieldDeclaration(code_dom.element.DOMElement):
         self.width_specifiers = []  # One per name
         self.array_bounds_tokens = []  # One list of tokens per name
         self.is_imgui_api = False  # Does this use IMGUI_API?
-        self.accessibility = None  # The field accessibility
         self.name_alignment = 0  # Column to align name to (for aesthetic purposes)
         self.default_value_tokens = None  # Tokens for the default value (if any)
 
@@ -141,6 +144,17 @@ class DOMFieldDeclaration(code_dom.element.DOMElement):
     def get_writable_child_lists(self):
         return code_dom.element.DOMElement.get_writable_child_lists(self)
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.field_type = self.clone_child(self.field_type, clone)
+        clone.names = self.names.copy()
+        clone.is_array = self.is_array.copy()
+        clone.width_specifiers = self.width_specifiers.copy()
+        clone.array_bounds_tokens = [(bounds_tokens.copy() if bounds_tokens is not None else None)
+                                     for bounds_tokens in self.array_bounds_tokens]
+        if self.default_value_tokens is not None:
+            clone.default_value_tokens = self.default_value_tokens.copy()
+
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
         if self.parent is not None:
             return self.parent.get_fully_qualified_name(self.names[0] if len(self.names) > 0 else leaf_name,
@@ -4,10 +4,14 @@ from src import code_dom
 
 # A single function argument
 class DOMFunctionArgument(code_dom.element.DOMElement):
+    __slots__ = ["arg_type", "_name", "old_name", "default_value_tokens", "is_varargs", "is_array", "array_bounds",
+                 "is_implicit_default", "is_instance_pointer", "stub_call_value"]
+
     def __init__(self):
         super().__init__()
         self.arg_type = None
         self.name = None  # May be none as arguments can be unnamed
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.default_value_tokens = None
         self.is_varargs = False
         self.is_array = False
@@ -97,6 +101,12 @@ class DOMFunctionArgument(code_dom.element.DOMElement):
     def get_writable_child_lists(self):
         return code_dom.DOMElement.get_writable_child_lists(self)
 
+    def populate_clone(self, clone):
+        code_dom.DOMElement.populate_clone(self, clone)
+        clone.arg_type = self.clone_child(self.arg_type, clone)
+        if self.default_value_tokens is not None:
+            clone.default_value_tokens = self.default_value_tokens.copy()
+
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
         if self.parent is not None:
             return self.parent.get_fully_qualified_name(self.name, include_leading_colons)
@@ -4,9 +4,16 @@ from src import code_dom
 
 # A function declaration
 class DOMFunctionDeclaration(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "return_type", "arguments", "initialiser_list_tokens", "body", "is_const",
+                 "is_constexpr", "is_static", "is_inline", "is_operator", "is_constructor", "is_by_value_constructor",
+                 "is_destructor", "is_imgui_api", "im_fmtargs", "im_fmtlist", "original_class",
+                 "is_default_argument_helper", "is_manual_helper", "has_imstr_helper", "is_imstr_helper",
+                 "function_name_alignment", "is_unformatted_helper", "is_loose_function_body"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.return_type = None
         self.arguments = []
         self.initialiser_list_tokens = None  # List of tokens making up the initialiser list if one exists
@@ -22,7 +29,6 @@ class DOMFunctionDeclaration(code_dom.element.DOMElement):
         self.is_imgui_api = False
         self.im_fmtargs = None
         self.im_fmtlist = None
-        self.accessibility = None  # The function accessibility (if part of a class)
         self.original_class = None  # The class this function belonged to pre-flattening
         #                             (set when functions are flattened)
         self.is_default_argument_helper = False  # Set if this is an autogenerated function with arguments defaulted
@@ -290,14 +296,14 @@ class DOMFunctionDeclaration(code_dom.element.DOMElement):
         lists.append(self.arguments)
         return lists
 
-    def clone(self):
-        # We don't want to clone the original class, but just keep a shallow reference to it
-        old_original_class = self.original_class
-        self.original_class = None
-        clone = code_dom.element.DOMElement.clone(self)
-        self.original_class = old_original_class
-        clone.original_class = old_original_class
-        return clone
+    # Note that original_class is deliberately not cloned, as it refers to the class elsewhere in the DOM
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.arguments = self.clone_child_list(self.arguments, clone)
+        clone.return_type = self.clone_child(self.return_type, clone)
+        clone.body = self.clone_child(self.body, clone)
+        if self.initialiser_list_tokens is not None:
+            clone.initialiser_list_tokens = self.initialiser_list_tokens.copy()
 
     # Get the prefixes and return type for this function
     # This is a separate function largely because mod_align_function_names needs it
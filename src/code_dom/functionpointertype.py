@@ -4,9 +4,12 @@ from src import code_dom
 
 # A function pointer type
 class DOMFunctionPointerType(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "return_type", "arguments", "is_cdecl"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.return_type = None
         self.arguments = []
         self.is_cdecl = False
@@ -95,6 +98,11 @@ class DOMFunctionPointerType(code_dom.element.DOMElement):
         lists.append(self.arguments)
         return lists
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.arguments = self.clone_child_list(self.arguments, clone)
+        clone.return_type = self.clone_child(self.return_type, clone)
+
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
         if self.parent is not None:
             return self.parent.get_fully_qualified_name(self.name, include_leading_colons)
@@ -4,9 +4,12 @@ from src import code_dom
 
 # A single header file
 class DOMHeaderFile(code_dom.element.DOMElement):
+    __slots__ = ["source_filename", "dest_filename"]
+
     def __init__(self):
         super().__init__()
         self.source_filename = None  # The filename this header came from
+        self.dest_filename = None  # The filename this header is being written to (set when writing output)
 
     # Parse tokens from the token stream given
     @staticmethod
@@ -15,12 +18,16 @@ class DOMHeaderFile(code_dom.element.DOMElement):
 
         dom_element.source_filename = source_filename
 
-        # Set up the default context parser
-        old_content_parser = context.current_content_parser
-        context.current_content_parser = lambda: DOMHeaderFile.parse_content(context, stream)
+        # Set up the parser table for the file scope
+        old_parser_table = context.current_parser_table
+        context.current_parser_table = code_dom.parsertable.header_parser_table
+
+        # Each file starts on a fresh line, so comments at the start of it should never get attached to the last
+        # element of whatever file was parsed before it (this also keeps the result independent of parse order)
+        context.last_element = None
 
         while True:
-            child_element = context.current_content_parser()
+            child_element = context.parse_content(stream)
 
             if child_element is not None:
                 if not child_element.no_default_add:
@@ -30,19 +37,25 @@ class DOMHeaderFile(code_dom.element.DOMElement):
 
         dom_element.parse_content(context, stream)
 
-        context.current_content_parser = old_content_parser
+        context.current_parser_table = old_parser_table
 
         return dom_element
 
+    # Header files make up most of a header file set, so queries on them use the index for the whole set (if we are in
+    # one)
+    def get_query_element_index(self):
+        if self.parent is not None:
+            return self.parent.get_query_element_index()
+        return None
+
     @staticmethod
     def parse_content(context, stream):
-        return code_dom.element.DOMElement.parse_basic(context, stream)
+        return code_dom.parsertable.header_parser_table.parse(context, stream)
 
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
-        for child in self.children:
-            child.write_to_c(file, indent=indent, context=context)
+        self.write_children_to_c(self.children, file, indent, context)
 
     # Get the original filename
     def get_source_filename(self):
@@ -4,14 +4,28 @@ from src import code_dom
 
 # A collection of header files
 class DOMHeaderFileSet(code_dom.element.DOMElement):
+    __slots__ = ["element_index"]
+
     def __init__(self):
         super().__init__()
+        self.element_index = None  # Index of all the elements in this tree (created when first needed)
+
+    # Queries on the whole set of headers use an index of the elements by type rather than walking the tree
+    def get_query_element_index(self):
+        if self.parent is not None:
+            return None
+        if self.element_index is None:
+            self.element_index = code_dom.elementindex.DOMElementIndex(self)
+        return self.element_index
+
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.element_index = None  # The clone will build its own index when needed
 
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
-        for child in self.children:
-            child.write_to_c(file, indent=indent, context=context)
+        self.write_children_to_c(self.children, file, indent, context)
 
     def __str__(self):
         return "Header file set"
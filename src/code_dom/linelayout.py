@@ -0,0 +1,115 @@
+# A line layout records the C code written for a DOM (via write_to_c()) along with which element each part of it came
+# from, so that things like comment alignment can be worked out from the text that is actually being written and then
+# the final output produced without rendering the DOM a second time.
+# To use one, set WriteContext.line_layout to it and pass it to write_to_c() as the file to write to. Once everything
+# has been written, write_to() emits the recorded text (with attached comments aligned according to their alignment
+# field at that point).
+
+
+# Everything written for a single element
+class LineLayoutElement:
+    __slots__ = ['element', 'indent', 'siblings', 'first_line', 'end_line', 'end_descendants']
+
+    def __init__(self, element, indent, siblings, first_line):
+        self.element = element
+        self.indent = indent  # The indent the element was written at
+        self.siblings = siblings  # The child list the element was written from
+        self.first_line = first_line  # Index of the first line written for the element
+        self.end_line = first_line  # Index of the line after the last one written for the element
+        # Index (in LineLayout.elements) of the element after the last descendant of this one
+        self.end_descendants = None
+
+
+class LineLayout:
+    def __init__(self):
+        # The text passed to each write() call (which is normally a single line) without any aligned comment, along
+        # with the length of the statement part of it (i.e. without any comment) and the length of any indent at the
+        # start of it (0 for writes that don't start a new line)
+        self.lines = []
+        self.statement_lengths = []
+        self.line_indent_lengths = []
+        # Map from line index to (line text, attached comment) for lines that have an attached comment slot (see
+        # add_comment_slot())
+        self.comment_slots = {}
+        # Indices of lines that are preceding comments rather than code
+        self.comment_lines = set()
+        self.elements = []  # LineLayoutElements, in the order the elements were written
+        self.element_stack = []  # Indices of the elements currently being written
+        self.pending_comment_slot = None
+        self.pending_length_adjustment = 0
+        self.writing_comments = False
+        self.at_line_start = True
+
+    # Called by write_c_line() (via the file interface) with the text to write
+    def write(self, text):
+        line_index = len(self.lines)
+        self.lines.append(text)
+        self.statement_lengths.append(len(text) + self.pending_length_adjustment)
+        self.pending_length_adjustment = 0
+        if self.at_line_start:
+            self.line_indent_lengths.append(len(text) - len(text.lstrip(' ')))
+        else:
+            self.line_indent_lengths.append(0)
+        self.at_line_start = text.endswith("\n")
+        if self.pending_comment_slot is not None:
+            self.comment_slots[line_index] = self.pending_comment_slot
+            self.pending_comment_slot = None
+        if self.writing_comments:
+            self.comment_lines.add(line_index)
+
+    # Note that the next line written is the line given followed by the attached comment given, but with the comment
+    # left out (so that it can be aligned later)
+    def add_comment_slot(self, line, comment):
+        self.pending_comment_slot = (line, comment)
+
+    # Adjust the statement length recorded for the next line written, for lines which contain an attached comment that
+    # doesn't get aligned (the length should be that of the line as it would be without the comment)
+    def adjust_next_statement_length(self, adjustment):
+        self.pending_length_adjustment = adjustment
+
+    # Begin/end a run of lines that are preceding comments
+    def begin_comments(self):
+        self.writing_comments = True
+
+    def end_comments(self):
+        self.writing_comments = False
+
+    # Begin writing an element (from the child list given) at the indent given
+    def begin_element(self, element, indent, siblings):
+        self.element_stack.append(len(self.elements))
+        self.elements.append(LineLayoutElement(element, indent, siblings, len(self.lines)))
+
+    # Finish writing the element most recently begun
+    def end_element(self):
+        layout_element = self.elements[self.element_stack.pop()]
+        layout_element.end_line = len(self.lines)
+        layout_element.end_descendants = len(self.elements)
+
+    # Get the length of the longest line written for the layout element given, ignoring any comments attached to it
+    # (or to its descendants) and measured as if the element had been written at an indent of 0
+    def get_statement_length(self, layout_element):
+        indent_length = layout_element.indent * 4
+        statement_lengths = self.statement_lengths
+        line_indent_lengths = self.line_indent_lengths
+        comment_lines = self.comment_lines
+        max_length = 0
+        for line_index in range(layout_element.first_line, layout_element.end_line):
+            if line_index in comment_lines:
+                continue
+            # Lines written at a fixed indent (such as preprocessor directives) don't move with the element
+            length = statement_lengths[line_index] - min(indent_length, line_indent_lengths[line_index])
+            max_length = max(max_length, length)
+        return max_length
+
+    # Write the recorded text out to the file given
+    def write_to(self, file):
+        comment_slots = self.comment_slots
+        for line_index, text in enumerate(self.lines):
+            comment_slot = comment_slots.get(line_index)
+            if comment_slot is not None:
+                # This mirrors DOMElement.add_attached_comment_to_line() and write_c_line()
+                line, comment = comment_slot
+                padding = max(comment.alignment - len(line), 1)  # Always have at least one space after the line
+                text = text[:len(text) - len(line.rstrip()) - 1] + \
+                    (line + (" " * padding) + comment.to_c_string()).rstrip() + "\n"
+            file.write(text)
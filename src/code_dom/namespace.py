@@ -4,9 +4,12 @@ from src import code_dom
 
 # Namespace
 class DOMNamespace(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
 
     # Parse tokens from the token stream given
     @staticmethod
@@ -31,6 +34,9 @@ class DOMNamespace(code_dom.element.DOMElement):
             stream.rewind(checkpoint)
             return None
 
+        old_parser_table = context.current_parser_table
+        context.current_parser_table = code_dom.parsertable.namespace_parser_table
+
         while True:
             tok = stream.peek_token()
             if tok.type == 'RBRACE':
@@ -38,15 +44,17 @@ class DOMNamespace(code_dom.element.DOMElement):
                 stream.get_token_of_type(['SEMICOLON'])  # Eat the trailing semicolon too
                 break
 
-            child_element = context.current_content_parser()
+            child_element = context.parse_content(stream)
 
             if child_element is not None:
                 if not child_element.no_default_add:
                     dom_element.add_child(child_element, context)
             else:
-                print("Unrecognised element: " + str(vars(tok)) + " in DOMNamespace " + dom_element.name)
+                print("Unrecognised element: " + str(tok) + " in DOMNamespace " + dom_element.name)
                 break
 
+        context.current_parser_table = old_parser_table
+
         return dom_element
 
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
@@ -63,8 +71,7 @@ class DOMNamespace(code_dom.element.DOMElement):
         self.write_preceding_comments(file, indent, context)
         write_c_line(file, indent, context, self.add_attached_comment_to_line(context, "namespace " + self.name))
         write_c_line(file, indent, context, "{")
-        for child in self.children:
-            child.write_to_c(file, indent + 1, context)
+        self.write_children_to_c(self.children, file, indent + 1, context)
         write_c_line(file, indent, context, "}")
 
     def __str__(self):
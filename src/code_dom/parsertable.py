@@ -0,0 +1,94 @@
+from src import code_dom
+
+
+# A table mapping the type of the first token of an element to the parser for that element
+# Each kind of scope (header file, struct, enum, etc) has its own table, which it installs in the parse context while
+# its contents are being parsed. Tables can be based on another table, in which case any token types they don't
+# handle themselves are looked up in the base table.
+class ParserTable:
+    def __init__(self, name, base_table=None):
+        self.name = name
+        self.base_table = base_table
+        self.parsers = {}  # Map from token type to parser function
+        self.fallback_parser = None  # Parser used for token types that have no explicit entry (if set)
+
+    # Register a parser for one or more token types
+    # The parser should be a function taking (context, stream) and returning the parsed element (or None on failure)
+    def add_parser(self, token_types, parser):
+        for token_type in token_types:
+            self.parsers[token_type] = parser
+
+    # Remove the parser for one or more token types (this does not affect any base tables)
+    def remove_parser(self, token_types):
+        for token_type in token_types:
+            self.parsers.pop(token_type, None)
+
+    # Set the parser used for any token type that does not have an explicit entry in this table or its bases
+    def set_fallback_parser(self, parser):
+        self.fallback_parser = parser
+
+    # Get the parser for the token type given, or None if there isn't one
+    def get_parser(self, token_type):
+        table = self
+        while table is not None:
+            parser = table.parsers.get(token_type)
+            if parser is not None:
+                return parser
+            table = table.base_table
+
+        table = self
+        while table is not None:
+            if table.fallback_parser is not None:
+                return table.fallback_parser
+            table = table.base_table
+
+        return None
+
+    # Parse the next element from the stream, returning None if there isn't one this table knows how to handle
+    def parse(self, context, stream):
+        while True:
+            tok = stream.peek_token(skip_newlines=False)
+            if tok is None:
+                return None
+            parser = self.get_parser(tok.type)
+            if parser is None:
+                return None
+            element = parser(context, stream)
+            # A newline that isn't part of a blank line doesn't produce an element, so if that is what we got then
+            # carry on with whatever follows it
+            if (element is not None) or (tok.type != 'NEWLINE'):
+                return element
+
+    def __str__(self):
+        return "Parser table: " + self.name
+
+
+# Elements that can appear anywhere (including inside enums)
+common_parser_table = ParserTable("common")
+common_parser_table.add_parser(['LINE_COMMENT', 'BLOCK_COMMENT'], code_dom.comment.DOMComment.parse)
+common_parser_table.add_parser(['PPDEFINE'], code_dom.define.DOMDefine.parse)
+common_parser_table.add_parser(['PPUNDEF'], code_dom.undef.DOMUndef.parse)
+common_parser_table.add_parser(['PPIF', 'PPIFDEF', 'PPIFNDEF'], code_dom.preprocessorif.DOMPreprocessorIf.parse)
+common_parser_table.add_parser(['PRAGMA'], code_dom.pragma.DOMPragma.parse)
+common_parser_table.add_parser(['PPERROR'], code_dom.error.DOMError.parse)
+common_parser_table.add_parser(['PPINCLUDE'], code_dom.include.DOMInclude.parse)
+common_parser_table.add_parser(['NEWLINE'], code_dom.element.DOMElement.parse_newlines)
+
+# Elements that can appear in most scopes
+basic_parser_table = ParserTable("basic", common_parser_table)
+basic_parser_table.add_parser(['STRUCT', 'CLASS', 'UNION'], code_dom.classstructunion.DOMClassStructUnion.parse)
+basic_parser_table.add_parser(['NAMESPACE'], code_dom.namespace.DOMNamespace.parse)
+basic_parser_table.add_parser(['TYPEDEF'], code_dom.typedef.DOMTypedef.parse)
+basic_parser_table.add_parser(['ENUM'], code_dom.enum.DOMEnum.parse)
+basic_parser_table.add_parser(['TEMPLATE'], code_dom.template.DOMTemplate.parse)
+basic_parser_table.add_parser(['THING', 'CONST', 'CONSTEXPR', 'SIGNED', 'UNSIGNED',
+                               '~'],  # ~ is necessary because destructor names start with it
+                              code_dom.element.DOMElement.parse_declaration)
+
+# Per-scope tables
+header_parser_table = ParserTable("header file", basic_parser_table)
+classstructunion_parser_table = ParserTable("class/struct/union", basic_parser_table)
+namespace_parser_table = ParserTable("namespace", basic_parser_table)
+externc_parser_table = ParserTable("extern \"C\"", basic_parser_table)
+enum_parser_table = ParserTable("enum", common_parser_table)
+enum_parser_table.set_fallback_parser(code_dom.enum.DOMEnum.parse_enum_element)
@@ -1,9 +1,12 @@
 from .common import *
 from src import code_dom
+import copy
 
 
 # A #if or #ifdef block (or #elif inside one)
 class DOMPreprocessorIf(code_dom.element.DOMElement):
+    __slots__ = ["is_ifdef", "is_elif", "is_negated", "is_include_guard", "expression_tokens", "else_children"]
+
     def __init__(self):
         super().__init__()
         self.is_ifdef = False
@@ -68,7 +71,7 @@ class DOMPreprocessorIf(code_dom.element.DOMElement):
             if stream.get_token_of_type(['PPENDIF']) is not None:
                 break
 
-            child_element = context.current_content_parser()
+            child_element = context.parse_content(stream)
 
             if child_element is not None:
                 if not child_element.no_default_add:
@@ -102,13 +105,13 @@ class DOMPreprocessorIf(code_dom.element.DOMElement):
     # Returns true if the element given is part of our else block
     # (see utils.is_in_else_clause for a version of this that works for non-direct-children)
     def is_element_in_else_block(self, element):
-        if element in self.else_children:
-            return True
-        if element in self.children:
-            return False
-        if element.parent is None:
+        # Find which of our direct children the element is (or is inside), and then which list that is in
+        while (element is not None) and (element.parent is not self):
+            element = element.parent
+        if element is None:
             return False
-        return self.is_element_in_else_block(element.parent)
+        child_list, _ = self.find_child(element)
+        return child_list is self.else_children
 
     # Get the expression used as a string
     def get_expression(self):
@@ -134,19 +137,21 @@ class DOMPreprocessorIf(code_dom.element.DOMElement):
         opening_clause = self.get_opening_clause()
         write_c_line(file, 0, context, opening_clause)
 
-        for child in self.children:
-            child.write_to_c(file, indent, context)
+        self.write_children_to_c(self.children, file, indent, context)
 
         if len(self.else_children) > 0:
             write_c_line(file, 0, context, "#else")
-            for child in self.else_children:
-                child.write_to_c(file, indent, context)
+            self.write_children_to_c(self.else_children, file, indent, context)
 
         # If we don't have an existing attached comment, note the opening clause
+        default_comment = " // " + self.remove_continuations(opening_clause)
         if self.attached_comment is not None:
             comment = self.attached_comment.to_c_string()
+            if context.line_layout is not None:
+                # For comment alignment, this line gets measured as if it had the default comment
+                context.line_layout.adjust_next_statement_length(len(default_comment) - len(comment))
         else:
-            comment = " // " + self.remove_continuations(opening_clause)
+            comment = default_comment
 
         write_c_line(file, 0, context, "#endif" + comment)
 
@@ -182,6 +187,20 @@ class DOMPreprocessorIf(code_dom.element.DOMElement):
         lists.append(self.else_children)
         return lists
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.else_children = self.clone_child_list(self.else_children, clone)
+        clone.expression_tokens = self.expression_tokens.copy()
+
+    # Get the expression tokens for modifying in-place (see DOMElement.get_writable_tokens())
+    def get_writable_expression_tokens(self):
+        self.make_tokens_writable()
+        return self.expression_tokens
+
+    def copy_shared_tokens(self):
+        code_dom.element.DOMElement.copy_shared_tokens(self)
+        self.expression_tokens = [copy.copy(token) for token in self.expression_tokens]
+
     def clone_without_children(self):
         temp_else_children = self.else_children
         self.else_children = []
@@ -4,6 +4,8 @@ from src import code_dom
 
 # A C++ template
 class DOMTemplate(code_dom.element.DOMElement):
+    __slots__ = ["template_parameter_tokens"]
+
     def __init__(self):
         super().__init__()
         self.template_parameter_tokens = []
@@ -117,14 +119,17 @@ class DOMTemplate(code_dom.element.DOMElement):
                 template_parameters.append(param)
         return template_parameters
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.template_parameter_tokens = self.template_parameter_tokens.copy()
+
     # Write this element out as C code
     def write_to_c(self, file, indent=0, context=WriteContext()):
         self.write_preceding_comments(file, indent, context)
         write_c_line(file, indent, context,
                      self.add_attached_comment_to_line(context, "template <" +
                                                        collapse_tokens_to_string(self.template_parameter_tokens) + ">"))
-        for child in self.children:
-            child.write_to_c(file, indent, context)
+        self.write_children_to_c(self.children, file, indent, context)
 
     def __str__(self):
         return "Template: " + collapse_tokens_to_string(self.template_parameter_tokens)
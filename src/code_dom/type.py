@@ -1,14 +1,38 @@
 from .common import *
 from src import code_dom
 from src import type_comprehension
-import copy
+
+
+# Statistics for the to_c_string() result cache in DOMType
+# (report_c_string_cache_stats is set by --type-string-cache-stats to print them after each conversion)
+report_c_string_cache_stats = False
+c_string_cache_hits = 0
+c_string_cache_misses = 0
+
+# Cache of the results of DOMType.is_user_type_name()
+user_type_names = {}
+
+
+# Get a description of the to_c_string() cache statistics, and reset them
+def get_c_string_cache_stats_string():
+    global c_string_cache_hits, c_string_cache_misses
+    total = c_string_cache_hits + c_string_cache_misses
+    result = "Type string cache: " + str(c_string_cache_hits) + " hits, " + str(c_string_cache_misses) + " misses (" + \
+             ("%.1f" % (c_string_cache_hits * 100.0 / total) if total > 0 else "0.0") + "% hit rate)"
+    c_string_cache_hits = 0
+    c_string_cache_misses = 0
+    return result
 
 
 # A type, represented by a sequence of tokens that define it
 class DOMType(code_dom.element.DOMElement):
+    __slots__ = ["use_pointer_cast_conversion", "c_string_cache", "c_string_cache_tokens"]
+
     def __init__(self):
         super().__init__()
         self.use_pointer_cast_conversion = False  # Should the function stub generator use a pointer-based cast?
+        self.c_string_cache = None  # Map from WriteContext settings to the result of to_c_string() with them
+        self.c_string_cache_tokens = None  # Copy of the token list that c_string_cache was generated from
 
     # Parse tokens from the token stream given
     @staticmethod
@@ -122,7 +146,7 @@ class DOMType(code_dom.element.DOMElement):
     # Return true if there are any (unresolved) template parameters in this type
     def contains_template_parameters(self):
         for tok in self.tokens:
-            if hasattr(tok, 'is_template_parameter') and tok.is_template_parameter:
+            if tok.is_template_parameter:
                 return True
         return False
 
@@ -158,45 +182,81 @@ class DOMType(code_dom.element.DOMElement):
             elif self.unmodified_element is not None:
                 return self.unmodified_element.to_c_string(context)
 
-        tokens_to_emit = self.tokens
+        # The result only depends on the tokens and a few of the context settings, and the same types get written many
+        # times over, so we cache it for each combination of those settings
+        # The cache is discarded if the token list changes or if the tokens are fetched for modification via
+        # get_writable_tokens() (which anything changing the tokens themselves is required to do)
+        global c_string_cache_hits, c_string_cache_misses
+        cache_key = (context.emit_converted_references_as_references, context.mark_non_nullable_pointers,
+                     context.include_leading_colons)
+        if (self.c_string_cache is not None) and (self.c_string_cache_tokens == self.tokens):
+            result = self.c_string_cache.get(cache_key)
+            if result is not None:
+                c_string_cache_hits += 1
+                return result
+        else:
+            self.c_string_cache = {}
+            self.c_string_cache_tokens = self.tokens.copy()
+
+        c_string_cache_misses += 1
+        result = DOMType.tokens_to_c_string(self.tokens, context)
+        self.c_string_cache[cache_key] = result
+        return result
+
+    # Discard the to_c_string() cache when the tokens may be about to change
+    def make_tokens_writable(self):
+        code_dom.element.DOMElement.make_tokens_writable(self)
+        self.c_string_cache = None
+
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        # The clone starts off with the same tokens, so the cached strings are still valid for it (and any changes to
+        # the tokens themselves will discard the cache via make_tokens_writable()), but it needs its own copy of the
+        # cache as it may go on to diverge from us
+        if self.c_string_cache is not None:
+            clone.c_string_cache = self.c_string_cache.copy()
+
+    # Convert a list of type tokens to a string, in the same way as to_c_string()
+    # (this is separate so that it can also be used with the tokens of element snapshots)
+    @staticmethod
+    def tokens_to_c_string(tokens, context=WriteContext()):
+        # We work on a list of the token values, rather than fudging copies of the tokens themselves
+        values = [tok.value for tok in tokens]
 
         if context.emit_converted_references_as_references:
             # Change any references that got turned into pointers _back_ into references
             # We have to do this before the non-nullable pointer conversion because references are always non-nullable
             # pointers and thus would get picked up by that
-            fudged_tokens = []
-            for tok in tokens_to_emit:
-                new_tok = copy.deepcopy(tok)
-                if (new_tok.value == '*') and (hasattr(new_tok, 'was_reference')) and new_tok.was_reference:
-                    new_tok.value = "&"
-                fudged_tokens.append(new_tok)
-            tokens_to_emit = fudged_tokens
+            for i, tok in enumerate(tokens):
+                if (values[i] == '*') and tok.was_reference:
+                    values[i] = "&"
 
         if context.mark_non_nullable_pointers:
             # Change any non-nullable pointers to ^s
-            fudged_tokens = []
-            for tok in tokens_to_emit:
-                new_tok = copy.deepcopy(tok)
-                if (new_tok.value == '*') and (hasattr(new_tok, 'nullable')) and (not new_tok.nullable):
-                    new_tok.value = "^"
-                fudged_tokens.append(new_tok)
-            tokens_to_emit = fudged_tokens
+            for i, tok in enumerate(tokens):
+                if (values[i] == '*') and (tok.nullable is False):
+                    values[i] = "^"
 
         if context.include_leading_colons:
             # Add leading colons to anything that looks like a user type
-            fudged_tokens = []
-            for tok in tokens_to_emit:
-                new_tok = copy.deepcopy(tok)
-                if new_tok.type == 'THING':
+            for i, tok in enumerate(tokens):
+                if tok.type == 'THING':
                     # Skip leading colons for builtin types
-                    built_in_type = type_comprehension.TCBuiltInType(new_tok.value)
-                    include_leading_colons = built_in_type.type == type_comprehension.builtin_type.BuiltinType.unknown
-                    if include_leading_colons:
-                        new_tok.value = "::" + new_tok.value
-                fudged_tokens.append(new_tok)
-            tokens_to_emit = fudged_tokens
-
-        return collapse_tokens_to_string(tokens_to_emit)
+                    if DOMType.is_user_type_name(values[i]):
+                        values[i] = "::" + values[i]
+
+        return collapse_token_values_to_string(values)
+
+    # Returns true if the (single-token) type name given is not a builtin type
+    # Token values are interned, so there are relatively few distinct names and we can cache the result for each
+    @staticmethod
+    def is_user_type_name(name):
+        result = user_type_names.get(name)
+        if result is None:
+            built_in_type = type_comprehension.TCBuiltInType(name)
+            result = built_in_type.type == type_comprehension.builtin_type.BuiltinType.unknown
+            user_type_names[name] = result
+        return result
 
     def __str__(self):
         result = "Type: " + collapse_tokens_to_string(self.tokens)
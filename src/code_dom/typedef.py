@@ -4,9 +4,12 @@ from src import code_dom
 
 # A typedef statement
 class DOMTypedef(code_dom.element.DOMElement):
+    __slots__ = ["_name", "old_name", "type", "structure_type"]
+
     def __init__(self):
         super().__init__()
         self.name = None
+        self.old_name = None  # The name prior to namespace flattening (see mod_flatten_namespaces)
         self.type = None
         self.structure_type = None  # One of STRUCT/CLASS/UNION as appropriate, or None if not supplied
 
@@ -53,6 +56,10 @@ class DOMTypedef(code_dom.element.DOMElement):
     def get_writable_child_lists(self):
         return code_dom.element.DOMElement.get_writable_child_lists(self)
 
+    def populate_clone(self, clone):
+        code_dom.element.DOMElement.populate_clone(self, clone)
+        clone.type = self.clone_child(self.type, clone)
+
     def get_fully_qualified_name(self, leaf_name="", include_leading_colons=False):
         if self.parent is not None:
             return self.parent.get_fully_qualified_name(self.name, include_leading_colons)
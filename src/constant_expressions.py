@@ -0,0 +1,496 @@
+import re
+
+# Evaluation of C integer constant expressions, as used for enum element values and #define values
+# Expressions are parsed into a tree of nodes (see parse()), which can then be evaluated against a dictionary mapping
+# the names of known values to their (integer) values. Evaluating an expression can't do anything other than look up
+# names in that dictionary, and the size of expressions and of the values they produce is limited, so this is safe to
+# use on headers from untrusted sources.
+# Values are calculated as C would, with the type of each literal and subexpression being tracked so that unsigned
+# arithmetic wraps and mixed signed/unsigned operations convert their operands in the same way. Anything that C
+# leaves undefined (signed overflow, out-of-range shifts, division by zero) is an error rather than producing a value.
+# As the size of long differs between platforms, expressions are evaluated for both the LP64 (most 64-bit Unix
+# platforms) and LLP64 (64-bit Windows) data models, and it is an error if the results differ.
+
+
+# Raised when an expression can't be parsed or evaluated
+class ConstantExpressionError(Exception):
+    pass
+
+
+# Expressions with more tokens than this are rejected (this also limits how deep the expression tree can be)
+max_expression_tokens = 256
+
+# Parenthesised/unary/conditional subexpressions nested more deeply than this are rejected, so that parsing can't run
+# out of stack
+max_nesting_depth = 64
+
+# Tokens in a constant expression (whitespace and line continuations are skipped)
+token_regex = re.compile(r"""
+    (?P<whitespace>(?:\s|\\\n)+) |
+    (?P<integer>(?:0[xX][0-9a-fA-F]+|0[bB][01]+|[0-9]+)(?:[uU]?[lL]{0,2}|[lL]{1,2}[uU])(?![\w.])) |
+    (?P<name>[A-Za-z_]\w*) |
+    (?P<operator><<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^~!()<>?:])
+""", re.VERBOSE)
+
+# Binary operators and their precedence (higher binds more tightly)
+binary_operator_precedence = {
+    '||': 1,
+    '&&': 2,
+    '|': 3,
+    '^': 4,
+    '&': 5,
+    '==': 6, '!=': 6,
+    '<': 7, '<=': 7, '>': 7, '>=': 7,
+    '<<': 8, '>>': 8,
+    '+': 9, '-': 9,
+    '*': 10, '/': 10, '%': 10
+}
+
+# Tokens that can start an operand, other than + and - (which are used to tell casts from parenthesised expressions)
+cast_operand_start_tokens = frozenset(['(', '~', '!'])
+
+# Names that can only be (part of) a type, so anything in brackets consisting only of these must be a cast
+builtin_type_names = frozenset(['int', 'unsigned', 'signed', 'short', 'long', 'char', 'bool'])
+
+# Cache of parsed expressions, indexed by expression text (see parse())
+parsed_expressions = {}
+
+
+# An integer type (after integer promotion, so int or larger)
+class IntegerType:
+    __slots__ = ['name', 'rank', 'is_unsigned']
+
+    def __init__(self, name, rank, is_unsigned):
+        self.name = name
+        self.rank = rank  # Conversion rank (0 for int, 1 for long, 2 for long long), which indexes data models
+        self.is_unsigned = is_unsigned
+
+    # Get the smallest and largest values this type can hold in the data model given
+    def get_range(self, data_model):
+        bits = data_model[self.rank]
+        if self.is_unsigned:
+            return 0, (1 << bits) - 1
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+
+
+int_type = IntegerType("int", 0, False)
+unsigned_int_type = IntegerType("unsigned int", 0, True)
+long_type = IntegerType("long", 1, False)
+unsigned_long_type = IntegerType("unsigned long", 1, True)
+long_long_type = IntegerType("long long", 2, False)
+unsigned_long_long_type = IntegerType("unsigned long long", 2, True)
+
+# The unsigned type corresponding to each rank
+unsigned_types_by_rank = [unsigned_int_type, unsigned_long_type, unsigned_long_long_type]
+
+# The number of bits in int, long and long long in each of the data models expressions are evaluated with
+data_models = [
+    (32, 64, 64),  # LP64
+    (32, 32, 64)   # LLP64
+]
+
+# The types an integer literal can have, in the order C tries them, indexed by (is decimal, suffix)
+# Named values are given the first of int, unsigned int, long long and unsigned long long that can hold them (which
+# matches the type of an unsuffixed hexadecimal literal, but doesn't depend on the data model)
+literal_types = {
+    (True, ""): [int_type, long_type, long_long_type],
+    (False, ""): [int_type, unsigned_int_type, long_type, unsigned_long_type, long_long_type, unsigned_long_long_type],
+    (True, "u"): [unsigned_int_type, unsigned_long_type, unsigned_long_long_type],
+    (False, "u"): [unsigned_int_type, unsigned_long_type, unsigned_long_long_type],
+    (True, "l"): [long_type, long_long_type],
+    (False, "l"): [long_type, unsigned_long_type, long_long_type, unsigned_long_long_type],
+    (True, "ul"): [unsigned_long_type, unsigned_long_long_type],
+    (False, "ul"): [unsigned_long_type, unsigned_long_long_type],
+    (True, "ll"): [long_long_type],
+    (False, "ll"): [long_long_type, unsigned_long_long_type],
+    (True, "ull"): [unsigned_long_long_type],
+    (False, "ull"): [unsigned_long_long_type]
+}
+named_value_types = [int_type, unsigned_int_type, long_long_type, unsigned_long_long_type]
+
+
+# Get the first of the types given that can hold value in the data model given (or None if none can)
+def get_first_type_holding(value, types, data_model):
+    for value_type in types:
+        min_value, max_value = value_type.get_range(data_model)
+        if min_value <= value <= max_value:
+            return value_type
+    return None
+
+
+# Convert value to the type given, wrapping it if it is out of range (this is modular for unsigned types, and two's
+# complement for signed ones, which is implementation-defined in C but universal in practice)
+def convert(value, to_type, data_model):
+    min_value, max_value = to_type.get_range(data_model)
+    if min_value <= value <= max_value:
+        return value
+    return ((value - min_value) % (max_value - min_value + 1)) + min_value
+
+
+# Get the common type of two operands after the usual arithmetic conversions
+def get_common_type(left_type, right_type, data_model):
+    if left_type is right_type:
+        return left_type
+    if left_type.is_unsigned == right_type.is_unsigned:
+        return left_type if left_type.rank >= right_type.rank else right_type
+    unsigned_type, signed_type = (left_type, right_type) if left_type.is_unsigned else (right_type, left_type)
+    if unsigned_type.rank >= signed_type.rank:
+        return unsigned_type
+    if data_model[signed_type.rank] > data_model[unsigned_type.rank]:
+        return signed_type  # The signed type can hold every value of the unsigned type
+    return unsigned_types_by_rank[signed_type.rank]
+
+
+# Get the result of an arithmetic operation in the type given, wrapping it if the type is unsigned
+def get_arithmetic_result(value, result_type, data_model):
+    if result_type.is_unsigned:
+        return convert(value, result_type, data_model)
+    min_value, max_value = result_type.get_range(data_model)
+    if not (min_value <= value <= max_value):
+        raise ConstantExpressionError("Result " + str(value) + " overflows " + result_type.name)
+    return value
+
+
+# Parse a C integer literal (with any suffix), returning the value and the list of types it can have
+def parse_integer_literal(text):
+    digits = text.rstrip("uUlL")
+    suffix = text[len(digits):].lower()
+    suffix = ("u" if "u" in suffix else "") + suffix.replace("u", "")
+    if digits[:2] in ("0x", "0X"):
+        base, digits = 16, digits[2:]
+    elif digits[:2] in ("0b", "0B"):
+        base, digits = 2, digits[2:]
+    elif (len(digits) > 1) and (digits[0] == '0'):
+        base, digits = 8, digits[1:]
+    else:
+        base = 10
+    # Anything with more than 64 significant digits can't fit in 64 bits in any base (and checking this first avoids
+    # converting arbitrarily long strings of digits)
+    if len(digits.lstrip("0")) > 64:
+        raise ConstantExpressionError("Integer literal with " + str(len(digits)) + " digits is too large")
+    try:
+        value = int(digits, base)
+    except ValueError:
+        raise ConstantExpressionError("Invalid integer literal " + text)
+    return value, literal_types[(base == 10, suffix)]
+
+
+# Integer division and remainder, rounding towards zero as C does
+def divide(left, right):
+    if right == 0:
+        raise ConstantExpressionError("Division by zero")
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def remainder(left, right):
+    return left - (right * divide(left, right))
+
+
+# Operators that apply the usual arithmetic conversions to their operands and produce a value of the common type
+arithmetic_operator_functions = {
+    '|': lambda left, right: left | right,
+    '^': lambda left, right: left ^ right,
+    '&': lambda left, right: left & right,
+    '+': lambda left, right: left + right,
+    '-': lambda left, right: left - right,
+    '*': lambda left, right: left * right,
+    '/': divide,
+    '%': remainder
+}
+
+# Operators that apply the usual arithmetic conversions to their operands and produce an int
+comparison_operator_functions = {
+    '==': lambda left, right: left == right,
+    '!=': lambda left, right: left != right,
+    '<': lambda left, right: left < right,
+    '<=': lambda left, right: left <= right,
+    '>': lambda left, right: left > right,
+    '>=': lambda left, right: left >= right
+}
+
+
+# An integer literal
+class IntegerLiteral:
+    __slots__ = ['value', 'types']
+
+    def __init__(self, value, types):
+        self.value = value
+        self.types = types  # The types this literal can have, in the order C tries them
+
+    def evaluate(self, values, data_model):
+        value_type = get_first_type_holding(self.value, self.types, data_model)
+        if value_type is None:
+            raise ConstantExpressionError("Integer literal " + str(self.value) + " is too large")
+        return self.value, value_type
+
+
+# A reference to a named value (such as an enum element)
+class NameReference:
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+    def evaluate(self, values, data_model):
+        value = values.get(self.name)
+        if value is None:
+            raise ConstantExpressionError(self.name + " is not a known value")
+        value_type = get_first_type_holding(value, named_value_types, data_model)
+        if value_type is None:
+            raise ConstantExpressionError("Value of " + self.name + " is too large")
+        return value, value_type
+
+
+class UnaryOperation:
+    __slots__ = ['operator', 'operand']
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+
+    def evaluate(self, values, data_model):
+        value, value_type = self.operand.evaluate(values, data_model)
+        if self.operator == '!':
+            return int(value == 0), int_type
+        if self.operator == '-':
+            return get_arithmetic_result(-value, value_type, data_model), value_type
+        if self.operator == '~':
+            return convert(~value, value_type, data_model), value_type
+        return value, value_type
+
+
+class BinaryOperation:
+    __slots__ = ['operator', 'left', 'right']
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def evaluate(self, values, data_model):
+        left, left_type = self.left.evaluate(values, data_model)
+        # && and || only evaluate their right-hand side if they need to
+        if self.operator == '&&':
+            return int((left != 0) and (self.right.evaluate(values, data_model)[0] != 0)), int_type
+        if self.operator == '||':
+            return int((left != 0) or (self.right.evaluate(values, data_model)[0] != 0)), int_type
+
+        right, right_type = self.right.evaluate(values, data_model)
+
+        if self.operator in ('<<', '>>'):
+            # The result has the type of the left operand, and shifting by its width or more is undefined
+            bits = data_model[left_type.rank]
+            if not (0 <= right < bits):
+                raise ConstantExpressionError("Shift amount " + str(right) + " is out of range for " + left_type.name)
+            if self.operator == '>>':
+                return left >> right, left_type
+            # Shifting bits out of a signed value wraps (as C++20 defines, and compilers do in practice)
+            return convert(left << right, left_type, data_model), left_type
+
+        common_type = get_common_type(left_type, right_type, data_model)
+        left = convert(left, common_type, data_model)
+        right = convert(right, common_type, data_model)
+        if self.operator in comparison_operator_functions:
+            return int(comparison_operator_functions[self.operator](left, right)), int_type
+        result = arithmetic_operator_functions[self.operator](left, right)
+        return get_arithmetic_result(result, common_type, data_model), common_type
+
+
+# The ternary ?: operator
+class ConditionalOperation:
+    __slots__ = ['condition', 'if_true', 'if_false']
+
+    def __init__(self, condition, if_true, if_false):
+        self.condition = condition
+        self.if_true = if_true
+        self.if_false = if_false
+
+    def evaluate(self, values, data_model):
+        condition = self.condition.evaluate(values, data_model)[0]
+        # The type of the result depends on both branches, so we need to evaluate both
+        if_true, if_true_type = self.if_true.evaluate(values, data_model)
+        if_false, if_false_type = self.if_false.evaluate(values, data_model)
+        result_type = get_common_type(if_true_type, if_false_type, data_model)
+        return convert(if_true if condition != 0 else if_false, result_type, data_model), result_type
+
+
+class Cast:
+    __slots__ = ['type_name', 'operand']
+
+    def __init__(self, type_name, operand):
+        self.type_name = type_name  # List of the names making up the type
+        self.operand = operand
+
+    def evaluate(self, values, data_model):
+        value, value_type = self.operand.evaluate(values, data_model)
+        names = self.type_name
+
+        if not all(name in builtin_type_names for name in names) or \
+                (("char" in names) and ("signed" not in names) and ("unsigned" not in names)):
+            # We don't know the size or signedness of anything other than built-in types (and it isn't fixed for
+            # char), so we can only say the value is unchanged if it fits in any integer type
+            if not (0 <= value <= 127):
+                raise ConstantExpressionError("Can't tell how casting " + str(value) + " to " + " ".join(names) +
+                                              " changes the value")
+            return value, value_type
+
+        if "bool" in names:
+            return int(value != 0), int_type
+
+        is_unsigned = "unsigned" in names
+        if ("char" in names) or ("short" in names):
+            # These get promoted back to int after the conversion
+            bits = 8 if "char" in names else 16
+            small_type = IntegerType(" ".join(names), 0, is_unsigned)
+            return convert(value, small_type, (bits,)), int_type
+
+        rank = names.count("long")
+        if rank > 2:
+            raise ConstantExpressionError("Invalid type " + " ".join(names))
+        result_type = unsigned_types_by_rank[rank] if is_unsigned else [int_type, long_type, long_long_type][rank]
+        return convert(value, result_type, data_model), result_type
+
+
+# Recursive descent parser for the expression text given
+class ExpressionParser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = []  # (token type, token text) tuples
+        self.index = 0  # Index of the next token
+        self.depth = 0  # Current nesting depth of subexpressions
+        position = 0
+        while position < len(text):
+            match = token_regex.match(text, position)
+            if match is None:
+                raise ConstantExpressionError("Unsupported syntax at \"" + text[position:position + 32] + "\"")
+            if match.lastgroup != "whitespace":
+                if len(self.tokens) >= max_expression_tokens:
+                    raise ConstantExpressionError("Expression is too long")
+                self.tokens.append((match.lastgroup, match.group()))
+            position = match.end()
+
+    def peek(self, offset=0):
+        if self.index + offset < len(self.tokens):
+            return self.tokens[self.index + offset]
+        return None, None
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ConstantExpressionError("Unexpected end of expression")
+        self.index += 1
+        return token
+
+    def expect(self, value):
+        token_type, token_value = self.next()
+        if token_value != value:
+            raise ConstantExpressionError("Expected " + value + " but found " + token_value)
+
+    # Enter a nested subexpression, checking that it isn't nested too deeply (exit_nesting() must be called afterwards)
+    def enter_nesting(self):
+        self.depth += 1
+        if self.depth > max_nesting_depth:
+            raise ConstantExpressionError("Expression is nested too deeply")
+
+    def exit_nesting(self):
+        self.depth -= 1
+
+    def parse(self):
+        if len(self.tokens) == 0:
+            raise ConstantExpressionError("Empty expression")
+        expression = self.parse_conditional()
+        if self.index < len(self.tokens):
+            raise ConstantExpressionError("Unexpected " + self.tokens[self.index][1])
+        return expression
+
+    def parse_conditional(self):
+        self.enter_nesting()
+        condition = self.parse_binary(1)
+        if self.peek()[1] != '?':
+            self.exit_nesting()
+            return condition
+        self.next()
+        if_true = self.parse_conditional()
+        self.expect(':')
+        if_false = self.parse_conditional()
+        self.exit_nesting()
+        return ConditionalOperation(condition, if_true, if_false)
+
+    # Parse a sequence of binary operations with at least the precedence given
+    def parse_binary(self, min_precedence):
+        left = self.parse_unary()
+        while True:
+            token_type, token_value = self.peek()
+            precedence = binary_operator_precedence.get(token_value) if token_type == "operator" else None
+            if (precedence is None) or (precedence < min_precedence):
+                return left
+            self.next()
+            right = self.parse_binary(precedence + 1)  # All binary operators are left-associative
+            left = BinaryOperation(token_value, left, right)
+
+    def parse_unary(self):
+        self.enter_nesting()
+        token_type, token_value = self.peek()
+        if (token_type == "operator") and (token_value in ('-', '+', '~', '!')):
+            self.next()
+            expression = UnaryOperation(token_value, self.parse_unary())
+        else:
+            type_name = self.get_cast_type_name() if token_value == '(' else None
+            if type_name is not None:
+                expression = Cast(type_name, self.parse_unary())
+            else:
+                expression = self.parse_primary()
+        self.exit_nesting()
+        return expression
+
+    # If the tokens from the current position are a cast, skip them and return the list of names in the type being
+    # cast to, otherwise return None
+    # Other than for built-in types, "(name) - 1" is treated as a subtraction rather than the cast of -1, as we can't
+    # tell types from values here
+    def get_cast_type_name(self):
+        length = 1
+        while self.peek(length)[0] == "name":
+            length += 1
+        if (length == 1) or (self.peek(length)[1] != ')'):
+            return None
+        names = [value for _, value in self.tokens[self.index + 1:self.index + length]]
+        following_type, following_value = self.peek(length + 1)
+        if (following_type not in ("integer", "name")) and (following_value not in cast_operand_start_tokens):
+            if (following_value not in ('-', '+')) or not all(name in builtin_type_names for name in names):
+                return None
+        self.index += length + 1
+        return names
+
+    def parse_primary(self):
+        token_type, token_value = self.next()
+        if token_type == "integer":
+            return IntegerLiteral(*parse_integer_literal(token_value))
+        if token_type == "name":
+            return NameReference(token_value)
+        if token_value == '(':
+            expression = self.parse_conditional()
+            self.expect(')')
+            return expression
+        raise ConstantExpressionError("Unexpected " + token_value)
+
+
+# Parse the expression given, returning the root node of the expression tree
+# Raises ConstantExpressionError if the expression isn't a supported constant expression
+def parse(text):
+    expression = parsed_expressions.get(text)
+    if expression is None:
+        expression = ExpressionParser(text).parse()
+        parsed_expressions[text] = expression
+    return expression
+
+
+# Evaluate the expression given, with values giving the values of any names that can be referenced
+# Raises ConstantExpressionError if the expression can't be evaluated, or its value depends on the platform
+def evaluate(text, values):
+    expression = parse(text)
+    results = [expression.evaluate(values, data_model)[0] for data_model in data_models]
+    if any(result != results[0] for result in results):
+        raise ConstantExpressionError("Value depends on the size of long (" +
+                                      " or ".join(str(result) for result in results) + ")")
+    return results[0]
@@ -0,0 +1,138 @@
+import collections
+import functools
+import tracemalloc
+from src import code_dom
+
+# The recorder currently collecting statistics (see start()), or None if --dom-stats is not enabled
+current_recorder = None
+
+
+# The state of the DOM after a modifier has been applied
+class DOMStatsEntry:
+    __slots__ = ['name', 'node_counts', 'num_nodes', 'num_tokens', 'num_clones', 'peak_memory']
+
+    def __init__(self, name, node_counts, num_tokens, num_clones, peak_memory):
+        self.name = name
+        self.node_counts = node_counts  # Counter of the number of elements of each class, by class name
+        self.num_nodes = sum(node_counts.values())
+        self.num_tokens = num_tokens  # Number of distinct token objects in the DOM
+        self.num_clones = num_clones  # Number of elements cloned by the modifier
+        self.peak_memory = peak_memory  # Peak memory newly allocated while the modifier ran, in bytes
+
+
+# Records the size of the DOM after each modifier is applied, so that modifiers that inflate the tree (or the memory
+# used during conversion) can be identified
+# Every conversion gets an initial entry for the DOM before any modifiers were applied, and the change each modifier
+# makes is calculated relative to the previous entry for the same conversion
+class DOMStatsRecorder:
+    def __init__(self):
+        self.entries = []  # List of (DOMStatsEntry, previous DOMStatsEntry) tuples, in the order they were recorded
+        self.current_root = None  # The DOM the most recent entry was for
+        self.last_entry = None  # The most recent entry
+
+    # Apply a modifier by calling apply_function, and record the state of the DOM afterwards
+    def apply_modifier(self, name, dom_root, apply_function, args, kwargs):
+        # Modifiers are sometimes applied to just one header, but we want statistics for the whole DOM
+        while dom_root.parent is not None:
+            dom_root = dom_root.parent
+
+        if dom_root is not self.current_root:
+            # This is a new conversion, so record the state before any modifiers get applied to act as a baseline
+            self.current_root = dom_root
+            self.last_entry = self.create_entry("(Initial DOM)", dom_root, 0, 0)
+            self.entries.append((self.last_entry, None))
+
+        start_clones = code_dom.element.num_elements_cloned
+        # Memory is only traced while the modifier itself runs, as tracemalloc slows everything down considerably
+        # (this means that the peak only counts memory allocated by the modifier)
+        tracemalloc.start()
+        try:
+            result = apply_function(*args, **kwargs)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        entry = self.create_entry(name, dom_root, code_dom.element.num_elements_cloned - start_clones, peak_memory)
+        self.entries.append((entry, self.last_entry))
+        self.last_entry = entry
+        return result
+
+    @staticmethod
+    def create_entry(name, dom_root, num_clones, peak_memory):
+        node_counts = collections.Counter()
+        token_ids = set()
+        for element in dom_root.iter_descendants():
+            node_counts[type(element).__name__] += 1
+            token_ids.update(map(id, element.tokens))
+        return DOMStatsEntry(name, node_counts, len(token_ids), num_clones, peak_memory)
+
+    # Get a description of the largest changes in the number of elements of each class between two entries
+    @staticmethod
+    def get_node_changes_string(entry, previous_entry, max_changes=3):
+        changes = entry.node_counts.copy()
+        changes.subtract(previous_entry.node_counts)
+        changes = [(class_name, change) for class_name, change in changes.items() if change != 0]
+        changes.sort(key=lambda change: abs(change[1]), reverse=True)
+        return ", ".join("%+d %s" % (change, class_name) for class_name, change in changes[:max_changes])
+
+    # Get a table of the recorded statistics, followed by a list of the modifiers that added the most elements
+    def get_table_string(self):
+        lines = ["DOM statistics after each modifier (node and token changes are relative to the previous modifier):",
+                 "  %-50s %8s %8s %8s %8s %7s %10s  %s" %
+                 ("Modifier", "Nodes", "Change", "Tokens", "Change", "Clones", "Peak (KB)", "Largest node changes")]
+        growth = []
+        for entry, previous_entry in self.entries:
+            name = entry.name if len(entry.name) <= 50 else entry.name[:47] + "..."
+            if previous_entry is None:
+                lines.append("  %-50s %8d %8s %8d %8s %7s %10s" %
+                             (name, entry.num_nodes, "", entry.num_tokens, "", "", ""))
+                continue
+            node_change = entry.num_nodes - previous_entry.num_nodes
+            lines.append("  %-50s %8d %+8d %8d %+8d %7d %10.1f  %s" %
+                         (name, entry.num_nodes, node_change, entry.num_tokens,
+                          entry.num_tokens - previous_entry.num_tokens, entry.num_clones, entry.peak_memory / 1024,
+                          self.get_node_changes_string(entry, previous_entry)))
+            if node_change > 0:
+                growth.append((node_change, entry, previous_entry))
+
+        if len(growth) > 0:
+            lines.append("Modifiers that added the most nodes:")
+            growth.sort(key=lambda item: item[0], reverse=True)
+            for node_change, entry, previous_entry in growth[:5]:
+                lines.append("  %-50s %+8d (%+.1f%%)" %
+                             (entry.name, node_change, node_change * 100.0 / max(previous_entry.num_nodes, 1)))
+        return "\n".join(lines)
+
+
+# Start recording statistics, returning the new recorder
+def start():
+    global current_recorder
+    current_recorder = DOMStatsRecorder()
+    return current_recorder
+
+
+# Stop recording statistics, returning the recorder that was in use
+def stop():
+    global current_recorder
+    recorder = current_recorder
+    current_recorder = None
+    return recorder
+
+
+# Wrap the apply() function of every modifier in the package given so that the state of the DOM gets recorded after
+# each call when statistics are being collected
+def instrument_modifiers(modifiers_package):
+    for name, module in vars(modifiers_package).items():
+        if name.startswith("mod_") and hasattr(module, "apply") and not hasattr(module.apply, "dom_stats_wrapped"):
+            module.apply = make_modifier_wrapper(name, module.apply)
+
+
+def make_modifier_wrapper(modifier_name, apply_function):
+    @functools.wraps(apply_function)
+    def wrapper(dom_root, *args, **kwargs):
+        if current_recorder is None:
+            return apply_function(dom_root, *args, **kwargs)
+        return current_recorder.apply_modifier(modifier_name, dom_root, apply_function, (dom_root,) + args, kwargs)
+
+    wrapper.dom_stats_wrapped = True
+    return wrapper
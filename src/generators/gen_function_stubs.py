@@ -152,8 +152,9 @@ def generate(dom_root, file, imgui_custom_types, indent=0, custom_varargs_list_s
         function = function.clone_without_children()  # Clone so we aren't altering the original
         function.name = "cimgui::" + function.name
         for type_data in function.list_all_children_of_type(code_dom.DOMType):
-            for tok in type_data.tokens:
-                if tok.value in imgui_custom_types:
+            for i in range(0, len(type_data.tokens)):
+                if type_data.tokens[i].value in imgui_custom_types:
+                    tok = type_data.get_writable_tokens()[i]
                     tok.value = "cimgui::" + tok.value
 
         # We need to remove the "self" argument, partially because we don't want it and partially because if we
@@ -283,7 +284,7 @@ def generate(dom_root, file, imgui_custom_types, indent=0, custom_varargs_list_s
             # If the return type was a reference that we turned into a pointer, turn it into a pointer here
             # (note that we do no marshalling to make sure this is safe memory-wise!)
             for tok in function.return_type.tokens:
-                if hasattr(tok, "was_reference") and tok.was_reference:
+                if tok.was_reference:
                     thunk_call += "&"
 
         if function.is_constructor:
@@ -306,7 +307,7 @@ def generate(dom_root, file, imgui_custom_types, indent=0, custom_varargs_list_s
             dereferences = ""
             if arg.arg_type is not None:
                 for tok in arg.arg_type.tokens:
-                    if hasattr(tok, "was_reference") and tok.was_reference:
+                    if tok.was_reference:
                         dereferences += "*"
 
             # Generate a cast if required
@@ -484,6 +484,8 @@ def emit_define(define):
         if content.startswith('(') and content.endswith(')'):
             content = content[1:len(content)-1]
         result["content"] = content
+    if define.value is not None:
+        result["value"] = define.value
 
     add_comments(define, result)
     add_preprocessor_conditionals(define, result)
@@ -48,6 +48,7 @@ from . import mod_remove_constexpr
 from . import mod_assign_anonymous_type_names
 from . import mod_add_forward_declarations
 from . import mod_calculate_enum_values
+from . import mod_calculate_define_values
 from . import mod_mark_special_enum_values
 from . import mod_mark_flags_enums
 from . import mod_add_unformatted_functions
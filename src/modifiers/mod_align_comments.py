@@ -1,20 +1,26 @@
 from src import code_dom
-from src import utils
 
 
 # This modifier tries to align attached comments that appear together where possible (purely for aesthetic purposes)
-def apply(dom_root):
-    # First generate groups of comments from structures/enums, as we want to be sure those are grouped together
+# Statement lengths come from line_layout, which should be the LineLayout that dom_root has just been written to, and
+# the alignment gets applied when the layout is written out (see LineLayout.write_to())
+def apply(dom_root, line_layout):
+    layout_elements = line_layout.elements
 
-    comment_groups = []  # Array of group arrays
-    grouped_elements = {}  # Elements we have already assigned to groups
+    # First generate groups of comments from structures/enums, as we want to be sure those are grouped together
 
-    structure_elements = []
+    comment_groups = []  # Array of group arrays (containing LineLayoutElements)
+    grouped_elements = set()  # Elements we have already assigned to groups
 
-    structure_elements.extend(dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion))
-    structure_elements.extend(dom_root.list_all_children_of_type(code_dom.DOMEnum))
+    structure_indices = []
+    structure_indices.extend(index for index, layout_element in enumerate(layout_elements)
+                             if isinstance(layout_element.element, code_dom.DOMClassStructUnion))
+    structure_indices.extend(index for index, layout_element in enumerate(layout_elements)
+                             if isinstance(layout_element.element, code_dom.DOMEnum))
 
-    for struct in structure_elements:
+    for index in structure_indices:
+        layout_struct = layout_elements[index]
+        struct = layout_struct.element
         # Don't try and do anything with forward declarations at this point, as they don't have any children
         # and trying to be clever here just impairs our ability to nicely align blocks of "typedef struct" statements
         # (which the loose element scan below will do just fine)
@@ -25,37 +31,44 @@ def apply(dom_root):
 
         if struct.attached_comment is not None:
             # Count the struct itself as part of the group if it has a comment
-            group.append(struct)
-            grouped_elements[struct] = True
-
-        def walker(walker_element):
-            if walker_element.attached_comment is not None:
-                group.append(walker_element)
-                grouped_elements[walker_element] = True
+            group.append(layout_struct)
+            grouped_elements.add(struct)
 
-        struct.walk(walker)
+        for layout_child in layout_elements[index + 1:layout_struct.end_descendants]:
+            if layout_child.element.attached_comment is not None:
+                group.append(layout_child)
+                grouped_elements.add(layout_child.element)
 
         comment_groups.append(group)
 
     # Next look for any other elements with comments that seem interesting and group them according to their
     # position in the file
 
-    for element in dom_root.list_all_children_of_type(code_dom.DOMElement):
-        if (element.attached_comment is not None) and (element not in grouped_elements):
+    siblings_by_list = {}  # Layout elements for each child list that was written, in order
+    for layout_element in layout_elements:
+        siblings_by_list.setdefault(id(layout_element.siblings), []).append(layout_element)
+
+    for siblings in siblings_by_list.values():
+        index = 0
+        while index < len(siblings):
+            element = siblings[index].element
+            if (element.attached_comment is None) or (element in grouped_elements):
+                index += 1
+                continue
+
             group = []
 
             # Scan down until we hit a blank line or an already-grouped element
-            current = element
-            while (current is not None) and \
-                    (not isinstance(current, code_dom.DOMBlankLines)) and \
-                    (current not in grouped_elements):
+            while (index < len(siblings)) and \
+                    (not isinstance(siblings[index].element, code_dom.DOMBlankLines)) and \
+                    (siblings[index].element not in grouped_elements):
                 # We add statements here even if they don't have an attached comment themselves, because it looks bad if
                 # we have a bunch of interspaced statements that are longer than the comment alignment.
                 # But we ignore full-on comments as they tend to be long and don't affect the aesthetics so much.
-                if not isinstance(current, code_dom.DOMComment):
-                    group.append(current)
-                    grouped_elements[current] = True
-                current = current.parent.get_next_child(current)
+                if not isinstance(siblings[index].element, code_dom.DOMComment):
+                    group.append(siblings[index])
+                    grouped_elements.add(siblings[index].element)
+                index += 1
 
             comment_groups.append(group)
 
@@ -63,39 +76,9 @@ def apply(dom_root):
 
     for group in comment_groups:
 
-        # First calculate the length of each statement in the group
-
-        statement_lengths = []
+        # First calculate the length of each statement in the group (not counting comments)
 
-        # A fake file we get the DOM to write the C code to so we can evaluate the length
-        class FakeFile:
-            def __init__(self):
-                self.max_length = 0
-
-            def write(self, line):
-                self.max_length = max(self.max_length, len(line))
-
-        # Context for writing - needs to match that used by the actual header file output
-        write_context = code_dom.WriteContext()
-        write_context.for_c = True
-
-        for element in group:
-            # Temporarily remove any comments so we can get the actual statement length without them
-            comment = element.attached_comment
-            pre_comments = element.pre_comments
-            element.attached_comment = None
-            element.pre_comments = []
-
-            # Write to fake file and extract maximum length
-            file = FakeFile()
-            element.write_to_c(file, 0, write_context)
-            statement_lengths.append(file.max_length)
-
-            # Reattach comments
-            element.attached_comment = comment
-            element.pre_comments = pre_comments
-            #  if element.attached_comment:
-            #    element.attached_comment.comment_text += " (statement length " + str(file.max_length) + ")"
+        statement_lengths = [line_layout.get_statement_length(layout_element) for layout_element in group]
 
         # Calculate the average statement length
 
@@ -115,7 +98,6 @@ def apply(dom_root):
 
         # Set all elements in the group to align to the same value
 
-        for element in group:
-            if element.attached_comment is not None:
-                element.attached_comment.alignment = alignment
-
+        for layout_element in group:
+            if layout_element.element.attached_comment is not None:
+                layout_element.element.attached_comment.alignment = alignment
@@ -16,6 +16,11 @@ def apply(dom_root):
     elements_to_consider.extend(dom_root.list_all_children_of_type(code_dom.DOMEnum))
     elements_to_consider.extend(dom_root.list_all_children_of_type(code_dom.DOMEnumElement))
 
+    # Find all the comments first and then remove them from their parents in one go, as removing them one at a time
+    # would mean the positions of the following siblings needing to be found again each time
+    elements_and_comments = []  # (element, comments) tuples
+    comments_by_parent = {}  # Comments to remove from each parent element
+
     for element in elements_to_consider:
         comments = []
 
@@ -29,6 +34,12 @@ def apply(dom_root):
         if len(comments) > 0:
             # Reverse the order of the comments as we collected them backwards
             comments.reverse()
+            elements_and_comments.append((element, comments))
+            comments_by_parent.setdefault(element.parent, []).extend(comments)
+
+    for parent, comments in comments_by_parent.items():
+        parent.remove_children(comments)
 
-            # Add them to the element as preceding comments
-            element.attach_preceding_comments(comments)
+    for element, comments in elements_and_comments:
+        # Add them to the element as preceding comments
+        element.attach_preceding_comments(comments)
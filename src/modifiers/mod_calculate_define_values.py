@@ -0,0 +1,40 @@
+from src import code_dom
+from src import constant_expressions
+
+
+# This modifier calculates the values of #defines that are integer constants (for example
+# "#define IM_COL32_A_SHIFT 24"), so that they can be included in the metadata
+# Defines can reference enum values (so this should be applied after mod_calculate_enum_values) and other defines,
+# but if a define appears more than once with different values (for example on either side of an #ifdef) then it can't
+# be referenced.
+def apply(dom_root):
+    known_values = {}  # Values that expressions can reference
+    for enum_element in dom_root.list_all_children_of_type(code_dom.DOMEnumElement):
+        if enum_element.value is not None:
+            known_values[enum_element.name] = enum_element.value
+
+    define_values = {}  # The value of each define seen so far (None if it didn't have one)
+    ambiguous_names = set()  # Defines that have appeared with more than one value
+
+    for define in dom_root.list_all_children_of_type(code_dom.DOMDefine):
+        define.value = None
+
+        if "(" in define.name:
+            continue  # Function-style define
+
+        if define.content is not None:
+            try:
+                define.value = constant_expressions.evaluate(define.content, known_values)
+            except constant_expressions.ConstantExpressionError:
+                pass  # Not an integer constant (a string, a type name or similar)
+
+        if define.name in ambiguous_names:
+            continue
+        if (define.name in define_values) and (define_values[define.name] != define.value):
+            ambiguous_names.add(define.name)
+            known_values.pop(define.name, None)
+            continue
+
+        define_values[define.name] = define.value
+        if define.value is not None:
+            known_values[define.name] = define.value
@@ -1,5 +1,5 @@
 from src import code_dom
-from src import utils
+from src import constant_expressions
 
 
 # This modifier calculates the actual values for enum values
@@ -8,8 +8,7 @@ def apply(dom_root):
     # Dictionary of known existing name/value pairs for evaluation
     # There is at least one case where a value from one enum is used in another (ImDrawFlags_RoundCornersNone),
     # so we have to make this a global
-    # We initialise this to set __builtins__ to empty to prevent access to Python default functions
-    existing_values = {"__builtins__": {}}
+    existing_values = {}
 
     for enum in dom_root.list_all_children_of_type(code_dom.DOMEnum):
         last_value = -1  # By default the first value should be zero
@@ -22,23 +21,14 @@ def apply(dom_root):
                 value = last_value + 1
             else:
                 # We need to evaluate this expression
-
-                # Fudge some odd values that have '(int)' casts in them.
-                # This is not perfect, but shouldn't cause any problems.
-                value_string = value_string.replace("(int)", "")
-
-                compiled = compile(value_string, "<string>", "eval")
-
-                # This is partly about checking for unknown values, but mostly about preventing the use of anything
-                # not on our list above for security purposes (so that a theoretical malicious modification to the
-                # input file can't cause arbitrary code execution here). This likely isn't perfect, though, so
-                # care should be exercised when converting untrusted headers.
-                for name in compiled.co_names:
-                    if name not in existing_values:
-                        raise Exception("Enum " + enum.name + " element " + enum_element.name + " references " +
-                                        name + " in expression " + value_string + ", which is not a known enum value")
-
-                value = eval(compiled, existing_values, {})
+                # This only supports integer constant expressions that reference previously-seen enum values, so
+                # a malicious modification to the input file can't do anything other than fail here
+                try:
+                    value = constant_expressions.evaluate(value_string, existing_values)
+                except constant_expressions.ConstantExpressionError as e:
+                    raise Exception("Enum " + str(enum.name) + " element " + enum_element.name +
+                                    " has value expression " + value_string + " which could not be evaluated: " +
+                                    str(e))
 
             # print(enum_element.name + " = " + value_string + " = " + str(value))
             enum_element.value = value
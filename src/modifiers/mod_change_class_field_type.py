@@ -4,10 +4,8 @@ from src import utils
 
 # This modifier changes the type of a class field
 def apply(dom_root, class_name, field_name, new_field_type):
-    for class_element in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
-        if class_element.get_fully_qualified_name() != class_name:
-            continue
-
+    for class_element in dom_root.list_all_children_of_type_with_fully_qualified_name(code_dom.DOMClassStructUnion,
+                                                                                      class_name):
         fields = class_element.list_directly_contained_children_of_type(code_dom.DOMFieldDeclaration)
 
         for field in fields:
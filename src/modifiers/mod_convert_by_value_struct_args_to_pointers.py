@@ -5,14 +5,14 @@ from src import utils
 # This modifier turns all instances of passing a struct by value as a function parameter into a pass-by-pointer instead
 # (for the benefit of langauge bindings that don't want to deal with the complexities of C's struct-as-value rules)
 def apply(dom_root):
-    for type_element in dom_root.list_all_children_of_type(code_dom.DOMType):
+    # Make a list of all structs we know about
 
-        # Make a list of all structs we know about
+    all_structs = {}
 
-        all_structs = {}
+    for struct in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
+        all_structs[struct.name] = struct
 
-        for struct in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
-            all_structs[struct.name] = struct
+    for type_element in dom_root.list_all_children_of_type(code_dom.DOMType):
 
         # Look for struct arguments
 
@@ -3,6 +3,33 @@ from src import utils
 import sys
 
 
+# The parts of a function that disambiguation looks at, calculated once per function (see get_function_signature())
+class FunctionSignature:
+    __slots__ = ['argument_types', 'primary_type_names', 'is_varargs', 'is_function_pointer', 'conditional_context']
+
+    def __init__(self, function):
+        arguments = function.arguments
+        # The C type of each argument ("..." for varargs)
+        self.argument_types = tuple("..." if arg.is_varargs else arg.arg_type.to_c_string() for arg in arguments)
+        # The primary type name of each argument (None for varargs)
+        self.primary_type_names = tuple(None if arg.is_varargs else arg.arg_type.get_primary_type_name()
+                                        for arg in arguments)
+        self.is_varargs = tuple(arg.is_varargs for arg in arguments)
+        self.is_function_pointer = tuple(isinstance(arg.arg_type, code_dom.DOMFunctionPointerType)
+                                         for arg in arguments)
+        # The preprocessor conditionals the function is inside (see utils.get_preprocessor_conditional_context())
+        self.conditional_context = utils.get_preprocessor_conditional_context(function)
+
+
+# Get the signature of a function, using (and updating) the cache of signatures given
+def get_function_signature(function, signatures):
+    signature = signatures.get(function)
+    if signature is None:
+        signature = FunctionSignature(function)
+        signatures[function] = signature
+    return signature
+
+
 # This modifier finds any overloaded functions with identical names and disambiguates them
 # name_suffix_remaps gives a dictionary remapping type names for types that have awkward or unwanted names
 # functions_to_ignore gives a list of functions that are known not to need disambiguation (but look like they do)
@@ -24,6 +51,10 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
             # Add to list
             functions_by_name[function.name].append(function)
 
+    # Signatures are only calculated for functions that are involved in collisions
+    signatures = {}  # Map from function to FunctionSignature
+    renamed_functions = []  # Functions that have been given a new name
+
     # Resolve collisions
 
     for functions in functions_by_name.values():
@@ -33,24 +64,27 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
         if functions[0].name in functions_to_ignore:
             continue
 
+        function_signatures = [get_function_signature(function, signatures) for function in functions]
+
         if len(functions) == 2:
             # Special case - if we have exactly two functions, and they're in #ifdef or similar blocks that make them
             # mutually exclusive (i.e. they can never both be compiled in), then this isn't a name clash and can be
             # ignored
 
-            if utils.are_elements_mutually_exclusive(functions[0], functions[1]):
+            if utils.are_conditional_contexts_mutually_exclusive(function_signatures[0].conditional_context,
+                                                                 function_signatures[1].conditional_context):
                 continue
 
         # Count the number of arguments that are identical across all overloads
+        first_argument_types = function_signatures[0].argument_types
         num_common_args = 0
         finished_common_arguments = False
-        while num_common_args < len(functions[0].arguments):
-            for function in functions:
-                if num_common_args >= len(function.arguments):
+        while num_common_args < len(first_argument_types):
+            for signature in function_signatures:
+                if num_common_args >= len(signature.argument_types):
                     finished_common_arguments = True
                     break  # Ran out of arguments
-                if function.arguments[num_common_args].arg_type.to_c_string() != \
-                        functions[0].arguments[num_common_args].arg_type.to_c_string():
+                if signature.argument_types[num_common_args] != first_argument_types[num_common_args]:
                     finished_common_arguments = True
                     break  # Arguments don't match
             if finished_common_arguments:
@@ -62,16 +96,15 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
         lowest_arg_count = sys.maxsize
         lowest_arg_priority = -1
         lowest_arg_function = None
-        for function in functions:
-            if len(function.arguments) <= lowest_arg_count:
+        for function, signature in zip(functions, function_signatures):
+            if len(signature.argument_types) <= lowest_arg_count:
                 function_priority = 0
-                for arg in function.arguments:
-                    arg_type = arg.arg_type.to_c_string()
+                for arg_type in signature.argument_types:
                     if arg_type in type_priorities:
                         function_priority += type_priorities[arg_type]
 
-                if (len(function.arguments) < lowest_arg_count) or (function_priority > lowest_arg_priority):
-                    lowest_arg_count = len(function.arguments)
+                if (len(signature.argument_types) < lowest_arg_count) or (function_priority > lowest_arg_priority):
+                    lowest_arg_count = len(signature.argument_types)
                     lowest_arg_priority = function_priority
                     lowest_arg_function = function
 
@@ -79,7 +112,7 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
 
         suffixes_by_function = {}  # Dictionary indexed by function, containing proposed suffix lists
 
-        for function in functions:
+        for function, signature in zip(functions, function_signatures):
 
             function_suffixes = []
             suffixes_by_function[function] = function_suffixes
@@ -89,23 +122,23 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
             if (function == lowest_arg_function) and (function.name not in functions_to_rename_everything):
                 continue
 
-            for i in range(num_common_args, len(function.arguments)):
-                if not function.arguments[i].is_varargs:  # Don't try and append a suffix for ... arguments
+            for i in range(num_common_args, len(signature.argument_types)):
+                if not signature.is_varargs[i]:  # Don't try and append a suffix for ... arguments
                     # Check to see if the full type name is in the remap list, and if so remap it
-                    full_name = function.arguments[i].arg_type.to_c_string()
+                    full_name = signature.argument_types[i]
 
                     if full_name in name_suffix_remaps:
                         suffix_name = name_suffix_remaps[full_name]
                     else:
                         # Otherwise make a best guess
-                        if isinstance(function.arguments[i].arg_type, code_dom.DOMFunctionPointerType):
+                        if signature.is_function_pointer[i]:
                             suffix_name = "Callback"  # All function pointers get called "callback" for simplicity
                         else:
-                            suffix_name = function.arguments[i].arg_type.get_primary_type_name()
+                            suffix_name = signature.primary_type_names[i]
                         # Capitalise the first letter of the name
                         suffix_name = suffix_name[0].upper() + suffix_name[1:]
                         # Slight bodge to differentiate pointers
-                        if function.arguments[i].arg_type.to_c_string().endswith('*'):
+                        if full_name.endswith('*'):
                             suffix_name += "Ptr"
 
                     # Semi-hack - "Ref" is rarely meaningful as a disambiguator and just clutters things, so don't
@@ -142,6 +175,8 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
 
         # Apply the optimised names
 
+        original_name = functions[0].name
+
         for function in functions:
             suffixes = suffixes_by_function[function]
             if len(suffixes) > num_suffixes_needed:
@@ -158,9 +193,8 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
                 else:
                     functions[1].name += "_Const"
 
-        # Verify we now have no name clashes
-        # (note that this only checks that we resolved the collisions between the functions that were initially
-        # overloaded, and doesn't check for the possibility that a previously non-colliding function now collides)
+        # Verify we now have no name clashes between the functions that were initially overloaded
+        # (collisions with other functions are checked for once everything has been renamed, below)
 
         new_names = {}
 
@@ -172,3 +206,33 @@ def apply(dom_root, name_suffix_remaps, functions_to_ignore, functions_to_rename
                 raise Exception("Unresolved function name collision")
 
             new_names[function.name] = function
+
+            if function.name != original_name:
+                renamed_functions.append(function)
+
+    # Check that none of the new names collide with the name of another function - either one that was never renamed
+    # (which functions_by_name tells us about) or one that was renamed to the same thing from a different overload set
+    # Functions that can never be compiled at the same time (because of preprocessor conditionals) don't count.
+
+    renamed_functions_by_name = {}
+    for function in renamed_functions:
+        if function.name not in renamed_functions_by_name:
+            renamed_functions_by_name[function.name] = []
+        renamed_functions_by_name[function.name].append(function)
+
+    for function in renamed_functions:
+        # Functions that were originally called this but have since been renamed don't count
+        other_functions = [other_function for other_function in functions_by_name.get(function.name, [])
+                           if other_function.name == function.name]
+        other_functions += renamed_functions_by_name[function.name]
+        for other_function in other_functions:
+            if other_function is function:
+                continue
+            if utils.are_conditional_contexts_mutually_exclusive(
+                    get_function_signature(function, signatures).conditional_context,
+                    get_function_signature(other_function, signatures).conditional_context):
+                continue
+            print("Disambiguating " + function.name + " made it collide with another function:")
+            print(function.name + " : " + str(function))
+            print(other_function.name + " : " + str(other_function))
+            raise Exception("Function name collision introduced by disambiguation")
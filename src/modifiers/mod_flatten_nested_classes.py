@@ -27,7 +27,7 @@ def apply(dom_root):
             found_element_to_change = False
             for i in range(0, len(type_element.tokens)):
                 if type_element.tokens[i].value == struct.name:
-                    type_element.tokens[i].value = new_name
+                    type_element.get_writable_tokens()[i].value = new_name
                     found_element_to_change = True
 
             if found_element_to_change:
@@ -49,7 +49,7 @@ def apply(dom_root):
             found_element_to_change = False
             for i in range(0, len(type_element.tokens)):
                 if type_element.tokens[i].value == qualified_name:
-                    type_element.tokens[i].value = new_name
+                    type_element.get_writable_tokens()[i].value = new_name
 
             if found_element_to_change:
                 if type_element.original_name_override is None:
@@ -84,18 +84,87 @@ def find_default_insertion_point(dom_root):
     return template_insertion_point
 
 
+# Index the types given by the names of the templates they (may) reference, adding them to template_references (a map
+# from template name to a set of types)
+# If updated_template_names is supplied, the name of each template that gains references is added to it
+# This is only a quick filter - any token followed by a < (within the range that extract_template_parameter() looks at)
+# is taken to be a template name, so it is up to the caller to check that the references are genuine
+def index_template_references(types, template_references, updated_template_names=None):
+    for type_element in types:
+        tokens = type_element.tokens
+        for i in range(0, len(tokens) - 3):
+            if tokens[i + 1].value == '<':
+                if tokens[i].value not in template_references:
+                    template_references[tokens[i].value] = set()
+                template_references[tokens[i].value].add(type_element)
+                if updated_template_names is not None:
+                    updated_template_names.add(tokens[i].value)
+
+
+# Index the template references in the types within the element given (see index_template_references()), adding those
+# inside template definitions to template_definition_references and the rest to pending_references (and the names of
+# the templates they reference to updated_template_names)
+# The template definitions found are added to templates_by_name (a map from template name to a list of templates)
+def index_template_references_within(element, pending_references, template_definition_references, templates_by_name,
+                                     updated_template_names):
+    # Template definitions are a small part of the DOM, so it's quicker to gather the types in them up-front than to
+    # check the ancestors of every type we look at
+    types_in_templates = set()
+    for template_definition in element.list_all_children_of_type(code_dom.DOMTemplate):
+        types_in_templates.update(template_definition.iter_descendants(types=code_dom.DOMType))
+        template_name = template_definition.get_templated_object().name
+        if template_name not in templates_by_name:
+            templates_by_name[template_name] = []
+        templates_by_name[template_name].append(template_definition)
+
+    index_template_references(types_in_templates, template_definition_references)
+    index_template_references([type_element for type_element in element.list_all_children_of_type(code_dom.DOMType)
+                               if type_element not in types_in_templates], pending_references,
+                              updated_template_names)
+
+
+# Get the elements from the collection given that are in the DOM, in document order
+def get_elements_in_document_order(dom_root, elements, element_type):
+    element_index = dom_root.get_query_element_index()
+    if element_index is not None:
+        return element_index.sort_in_document_order(elements)
+    return [element for element in dom_root.list_all_children_of_type_by_walking(element_type) if element in elements]
+
+
+# Get the names of the parameters the tokens given instantiate the template name given with, as a tuple (the entries of
+# which are all None if the tokens don't reference the template)
+def get_template_parameter_names(template_name, tokens, num_template_parameters):
+    return tuple(extract_template_parameter(template_name, tokens, i)[0] for i in range(0, num_template_parameters))
+
+
 # This modifier finds templates and flattens them, creating concrete classes/functions for each required instantiation
 # custom_type_fudges can be used to supply strings which will be matched and replaced in modified types within the
 # instantiation as a way of working around some issues with the subtleties of template expansion rules (notably
 # "const T*" with T as "Blah *" expanding to "Blah* const*" rather than the lexical substitution "const Blah**")
 def apply(dom_root, custom_type_fudges={}):
-    generated_instantiations = []
+    generated_instantiations = set()
+
+    # Rather than searching every type in the DOM for references to each template (and again for each instantiation),
+    # the types that reference each template are indexed up-front. References outside template definitions act as a
+    # worklist - they are removed once they have been replaced, and the references in each instantiation are added as
+    # it is generated (which is the only way new references appear). References inside template definitions don't
+    # get instantiated (that happens when the template containing them is), so those are kept separately.
+    # Each iteration only looks at the templates that have gained references since the previous one (or still have
+    # some it couldn't resolve), rather than going through every template again.
+    pending_references = {}  # Map from template name to the set of types outside template definitions referencing it
+    template_definition_references = {}  # Map from template name to the set of types in template definitions
+    templates_by_name = {}  # Map from template name to the list of templates with that name
+    updated_template_names = set()  # The names of templates that need looking at in the next iteration
+    index_template_references_within(dom_root, pending_references, template_definition_references, templates_by_name,
+                                     updated_template_names)
 
     # We potentially need to apply multiple passes to resolve things inside instantiations
     pass_index = 1
     while True:
         # print("Template flatten pass " + str(pass_index))
-        more_to_do = apply_single_iteration(dom_root, custom_type_fudges, generated_instantiations)
+        more_to_do = apply_single_iteration(dom_root, custom_type_fudges, generated_instantiations,
+                                            pending_references, template_definition_references, templates_by_name,
+                                            updated_template_names)
         if not more_to_do:
             break
         pass_index += 1
@@ -113,30 +182,46 @@ class TemplateInstantiationParameter:
         self.is_unresolved = False  # Is this an unresolved parameter?
 
 
-# Flattens one nesting level of templates. 
-# Returns list of template types that still have non-flattened usages.
-def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiations) -> bool:
+# Flattens one nesting level of templates.
+# pending_references, template_definition_references, templates_by_name and updated_template_names are the indices of
+# templates and the references to them (see apply())
+# Returns True if another iteration is needed to resolve references inside the instantiations generated.
+def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiations, pending_references,
+                           template_definition_references, templates_by_name, updated_template_names) -> bool:
     more_to_do = False  # Do we need another iteration?
 
-    # Iterate through all templates
-    for template in dom_root.list_all_children_of_type(code_dom.DOMTemplate):
+    # Iterate through the templates that need looking at in document order. Instantiating a template can add references
+    # to others - any of those after the current one in the document get looked at in this iteration (as they would be
+    # if we went through every template in order), and the rest in the next one.
+    templates = get_elements_in_document_order(
+        dom_root, [template for template_name in updated_template_names
+                   for template in templates_by_name.get(template_name, ())], code_dom.DOMTemplate)
+    template_names_seen = set(updated_template_names)
+    updated_template_names.clear()
+    visited_templates = set()
+    template_list_index = 0
+    while template_list_index < len(templates):
+        template = templates[template_list_index]
+        template_list_index += 1
+        visited_templates.add(template)
+
         templated_obj = template.get_templated_object()
         template_name = templated_obj.name
         template_parameters = template.get_template_parameters()
         num_template_parameters = len(template_parameters)
 
-        # Instantiation parameters sets as they exist in the DOM at present
-        instantiation_parameter_sets = []
-        # Instantiation parameters in their implementation form (if that exists, None if not)
-        implementation_instantiation_parameter_sets = []
+        references = pending_references.get(template_name)
+        if (references is None) or (len(references) == 0):
+            continue  # Nothing references this template (or at least, nothing we haven't already dealt with)
 
-        # Find all references to this template
-        for type_element in dom_root.list_all_children_of_type(code_dom.DOMType):
-            # Don't look for instantiations inside template definitions (those will get expanded on subsequent passes
-            # when their instantiations are examined)
-            if type_element.is_descendant_of_type(code_dom.DOMTemplate):
-                continue
+        # Instantiation parameter sets as they exist in the DOM at present, keyed by the parameter names
+        # Each is a tuple of the list of TemplateInstantiationParameters and the implementation form of the parameters
+        # (if that exists, None if not). Where several references use the same parameters the implementation form from
+        # the last of them is used, and the sets are ordered by the position of that reference.
+        instantiation_parameter_sets = {}
 
+        # Find all references to this template
+        for type_element in get_elements_in_document_order(dom_root, references, code_dom.DOMType):
             instantiation_parameters = []  # Array of TemplateInstantiationParameters
 
             # This checks if the type tokens look like an instance of our template and extracts the parameter list
@@ -147,8 +232,7 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                     if instantiation_parameter is not None:
                         is_unresolved = False
                         for k in range(first_token, last_token):
-                            if (hasattr(type_element.tokens[k], 'is_template_parameter') and
-                                    type_element.tokens[k].is_template_parameter):
+                            if type_element.tokens[k].is_template_parameter:
                                 # This is itself an unresolved template parameter
                                 is_unresolved = True
                                 break
@@ -162,66 +246,41 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
             # len(instantiation_parameters) will be 0 if this isn't our template, so this doubles as a check for that
             # too
             if len(instantiation_parameters) == num_template_parameters:
-                if instantiation_parameters not in instantiation_parameter_sets:
-                    human_readable_param_list = ""
-                    first = True
-                    for param in instantiation_parameters:
-                        if not first:
-                            human_readable_param_list += ", "
-                        human_readable_param_list += param.name
-                        first = False
-
-                    # Check if there are any unresolved template parameters here
-
-                    if type_element.contains_template_parameters():
-                        # If the type contains unresolved template parameters, then we can't do anything with them
-                        # yet - we need to do another resolution pass
-                        #print(
-                        #    "Template " + template_name + " referenced in " + str(type_element) + " with parameters " +
-                        #    human_readable_param_list + " (but we are ignoring this for now as it is unresolved)")
-                        more_to_do = True  # Mark us as needing another resolution pass
-                    else:
-                        #print("Template " + template_name + " referenced in " + str(type_element) +
-                        #      " with parameters " + human_readable_param_list)
-
-                        instantiation_parameter_sets.append(instantiation_parameters)
-
-                        # Figure out what the implementation parameters are and record them
-                        implementation_instantiation_parameters = None
-                        if type_element.original_name_override is not None:
-                            opening_bracket = type_element.original_name_override.index('<')
-                            closing_bracket = type_element.original_name_override.index('>')
-                            if (opening_bracket >= 0) and (closing_bracket > opening_bracket):
-                                implementation_parameters = \
-                                    type_element.original_name_override[opening_bracket + 1:closing_bracket]
-                                # Split on commas and strip whitespace
-                                implementation_instantiation_parameters = [x.strip() for x in
-                                                                           implementation_parameters.split(',')]
-
-                        implementation_instantiation_parameter_sets.append(implementation_instantiation_parameters)
+                # Check if there are any unresolved template parameters here
+
+                if type_element.contains_template_parameters():
+                    # If the type contains unresolved template parameters, then we can't do anything with them
+                    # yet - we need to do another resolution pass (it remains in the worklist for that)
+                    more_to_do = True  # Mark us as needing another resolution pass
+                else:
+                    # Figure out what the implementation parameters are and record them
+                    implementation_instantiation_parameters = None
+                    if type_element.original_name_override is not None:
+                        opening_bracket = type_element.original_name_override.index('<')
+                        closing_bracket = type_element.original_name_override.index('>')
+                        if (opening_bracket >= 0) and (closing_bracket > opening_bracket):
+                            implementation_parameters = \
+                                type_element.original_name_override[opening_bracket + 1:closing_bracket]
+                            # Split on commas and strip whitespace
+                            implementation_instantiation_parameters = [x.strip() for x in
+                                                                       implementation_parameters.split(',')]
+
+                    parameter_names = tuple(param.name for param in instantiation_parameters)
+                    # Removing any existing entry first moves this set to the position of this reference
+                    instantiation_parameter_sets.pop(parameter_names, None)
+                    instantiation_parameter_sets[parameter_names] = (instantiation_parameters,
+                                                                     implementation_instantiation_parameters)
 
         # Reverse so that when we add these to the DOM (which in turn reverses the order), they end up in the original
         # order they were seen
-        instantiation_parameter_sets.reverse()
-        implementation_instantiation_parameter_sets.reverse()
+        instantiation_parameter_sets = list(reversed(instantiation_parameter_sets.values()))
 
         # Duplicate the template for each instantiation
 
         instantiation_names = []  # List of the actual C names for the instantiations
-        instantiations = []  # List of the instantiation objects themselves
-
-        for (instantiation_parameters, implementation_instantiation_parameters) in \
-                zip(instantiation_parameter_sets, implementation_instantiation_parameter_sets):
-            instantiation = templated_obj.clone()
-            instantiation.parent = None
-
-            instantiations.append(instantiation)
-
-            # We need to set up an override so that instead of using the original template typename the
-            # implementation uses the name with parameter substitution doe
-            if instantiation.original_name_override is None:
-                instantiation.original_name_override = instantiation.get_fully_qualified_name()
+        instantiations = []  # List of the instantiation objects themselves (None for ones generated previously)
 
+        for (instantiation_parameters, implementation_instantiation_parameters) in instantiation_parameter_sets:
             # Reformat the instantiation parameter list into a string, using the implementation version if possible,
             # so we get "ImVector<ImGuiTextFilter::TextRange>" instead of "ImVector<ImGuiTextFilter_TextRange>"
 
@@ -239,17 +298,30 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                         instantiation_parameters_as_string += ", "
                     instantiation_parameters_as_string += param.name.strip()
                     first = False
-            instantiation.original_name_override += "<" + instantiation_parameters_as_string + ">"
 
             # Generate a new name for the instantiation
-            instantiation.name += "_" + utils.sanitise_name_for_identifier(instantiation_parameters_as_string)
-            instantiation_names.append(instantiation.name)
+            instantiation_name = templated_obj.name + "_" + \
+                utils.sanitise_name_for_identifier(instantiation_parameters_as_string)
+            instantiation_names.append(instantiation_name)
 
-            if instantiation.name in generated_instantiations:
+            if instantiation_name in generated_instantiations:
                 # We already have this instantiation, so we don't actually want to emit it
+                instantiations.append(None)
                 continue
 
-            generated_instantiations.append(instantiation.name)
+            generated_instantiations.add(instantiation_name)
+
+            instantiation = templated_obj.clone()
+            instantiation.parent = None
+
+            instantiations.append(instantiation)
+
+            # We need to set up an override so that instead of using the original template typename the
+            # implementation uses the name with parameter substitution doe
+            if instantiation.original_name_override is None:
+                instantiation.original_name_override = instantiation.get_fully_qualified_name()
+            instantiation.original_name_override += "<" + instantiation_parameters_as_string + ">"
+            instantiation.name = instantiation_name
 
             # print("Generating template instantiation: " + instantiation.original_name_override)
 
@@ -287,7 +359,7 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
 
                         # Replace the template parameter with type instance
 
-                        for tok in element.tokens:
+                        for tok in element.get_writable_tokens():
                             if tok.value == element_instantiation_parameter:
                                 tok.value = instantiation_parameters[j].name
                                 # Reset the "is unresolved template parameter" flag on the token
@@ -314,9 +386,10 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                 for i in range(0, len(element.tokens)):
                     for j in range(0, num_template_parameters):
                         if element.tokens[i].value == template_parameters[j].name:
-                            element.tokens[i].value = instantiation_parameters[j].name
+                            tok = element.get_writable_tokens()[i]
+                            tok.value = instantiation_parameters[j].name
                             # Reset the "is unresolved template parameter" flag on the token
-                            element.tokens[i].is_template_parameter = instantiation_parameters[j].is_unresolved
+                            tok.is_template_parameter = instantiation_parameters[j].is_unresolved
                             # We've just generated an instantiation with an unresolved parameter, so we need another
                             # iteration to resolve that
                             if instantiation_parameters[j].is_unresolved:
@@ -355,7 +428,7 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                             # Figure out if any of our source type had reference->pointer conversions done on it
                             num_converted_references = 0
                             for tok in element.tokens:
-                                if hasattr(tok, "was_reference") and tok.was_reference:
+                                if tok.was_reference:
                                     num_converted_references += 1
 
                             # Supporting this wouldn't be horrifically difficult, but right now it's hard due to the
@@ -375,6 +448,11 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                                 element.original_name_override = element.original_name_override \
                                     .replace(fudge_key, custom_type_fudges[fudge_key])
 
+            # Any references to templates in the instantiation need examining (including references to this template,
+            # which get replaced below)
+            index_template_references_within(instantiation, pending_references, template_definition_references,
+                                             templates_by_name, updated_template_names)
+
             # Optionally insert new struct instances into the DOM at the very end to avoid problems with referencing
             # things that aren't declared yet at the point the template appears
             place_instantiation_at_end = False
@@ -404,22 +482,23 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
             comment.comment_text = "// Instantiation of " + template_name + "<" + instantiation_parameters_as_string + ">"
             instantiation.attach_preceding_comments([comment])
 
+        # Gather the references to this template (including those in the instantiations we just generated and in
+        # template definitions) by the parameters they use, so that each instantiation only looks at its own
+        references_by_parameters = {}
+        for type_element in get_elements_in_document_order(dom_root, references.union(
+                template_definition_references.get(template_name, ())), code_dom.DOMType):
+            parameter_names = get_template_parameter_names(template_name, type_element.tokens, num_template_parameters)
+            if parameter_names not in references_by_parameters:
+                references_by_parameters[parameter_names] = []
+            references_by_parameters[parameter_names].append(type_element)
+
         # Replace any references to the original template types with the new instantiations
-        for (instantiation_parameters, instantiation_name, instantiation) in \
+        for ((instantiation_parameters, _), instantiation_name, instantiation) in \
                 zip(instantiation_parameter_sets, instantiation_names, instantiations):
             first_reference = True
-            for type_element in dom_root.list_all_children_of_type(code_dom.DOMType):
-                all_match = True
-                for i in range(0, num_template_parameters):
-                    element_instantiation_parameter, _, _ = \
-                        extract_template_parameter(template_name, type_element.tokens, i)
-                    if element_instantiation_parameter != instantiation_parameters[i].name:
-                        all_match = False
-
-                # Skip anything that doesn't match the parameter set for this instantiation
-                if not all_match:
-                    continue
-
+            # Types can get added to this list as we go (see below)
+            for type_element in references_by_parameters.get(tuple(param.name for param in instantiation_parameters),
+                                                              []):
                 # Get the range of tokens occupied by the template parameters
                 first_token, last_token = extract_template_parameter_range(template_name, type_element.tokens)
                 # Set the original (parameterised) name as the override so it gets used for the
@@ -432,15 +511,23 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                 # -1 because first_token is the <, so we need to step back over the template name
                 first_token_of_reference = first_token - 1
 
-                type_element.tokens[first_token_of_reference].value = instantiation_name
+                type_element.get_writable_tokens()[first_token_of_reference].value = instantiation_name
                 del type_element.tokens[first_token_of_reference + 1:last_token + 1]  # +1 to eat the closing >
 
+                # If the type references this template again (with parameters we haven't dealt with yet) then it needs
+                # to be looked at again for that
+                parameter_names = get_template_parameter_names(template_name, type_element.tokens,
+                                                               num_template_parameters)
+                if parameter_names in references_by_parameters:
+                    references_by_parameters[parameter_names].append(type_element)
+
                 # Next check to see if the template was declared in a different header from this reference
                 # and has not been used previously -  if so, we want to move the instantiation into this header
                 # instead. This is mostly relevant to the Vulkan backend at the moment, which has a couple of
-                # unique ImVector<> instantiations.
+                # unique ImVector<> instantiations. If the instantiation was generated previously then it has already
+                # been put in the right place.
 
-                if first_reference:
+                if first_reference and (instantiation is not None):
                     instantiation_header = utils.find_nearest_parent_of_type(instantiation, code_dom.DOMHeaderFile)
                     reference_header = utils.find_nearest_parent_of_type(type_element, code_dom.DOMHeaderFile)
                     if instantiation_header is not reference_header:
@@ -465,5 +552,26 @@ def apply_single_iteration(dom_root, custom_type_fudges, generated_instantiation
                         insert_point.parent.insert_after_child(insert_point, [instantiation])
 
                 first_reference = False
-    
+
+        # Anything that still references this template (because it has unresolved parameters, for example) stays in
+        # the worklist for the next iteration
+        pending_references[template_name] = {type_element for type_element in references
+                                             if extract_template_parameter(template_name, type_element.tokens, 0)[0]
+                                             is not None}
+        if len(pending_references[template_name]) > 0:
+            updated_template_names.add(template_name)
+
+        # Pick up any templates later in the document that have gained references from the instantiations we generated
+        new_template_names = updated_template_names.difference(template_names_seen)
+        if len(new_template_names) > 0:
+            template_names_seen.update(new_template_names)
+            new_templates = [new_template for new_template_name in new_template_names
+                             for new_template in templates_by_name.get(new_template_name, ())
+                             if new_template not in visited_templates]
+            if len(new_templates) > 0:
+                remaining_templates = get_elements_in_document_order(
+                    dom_root, templates[template_list_index:] + new_templates + [template], code_dom.DOMTemplate)
+                templates = remaining_templates[remaining_templates.index(template) + 1:]
+                template_list_index = 0
+
     return more_to_do
@@ -1,7 +1,15 @@
 from src import code_dom
 
+# Node modifier settings (see pass_manager.PassManager)
+node_types = [code_dom.DOMFunctionDeclaration]
+order_sensitive = False
+
 
 # This modifier simply sets the "use IMGUI_API" (which will become CIMGUI_API when written out) flag on all functions
 def apply(dom_root):
     for function in dom_root.list_all_children_of_type(code_dom.DOMFunctionDeclaration):
-        function.is_imgui_api = True
+        apply_to_node(function)
+
+
+def apply_to_node(function):
+    function.is_imgui_api = True
@@ -1,10 +1,18 @@
 from src import code_dom
 from src import utils
 
+# Node modifier settings (see pass_manager.PassManager)
+node_types = [code_dom.DOMClassStructUnion]
+order_sensitive = False
+
 
 # This modifier adds a marker to structs that should be treated as pass-by-value, which subsequent modifiers
 # (and the code generator) can use
 def apply(dom_root, by_value_structs):
     for struct in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
-        if struct.name in by_value_structs:
-            struct.is_by_value = True
+        apply_to_node(struct, by_value_structs)
+
+
+def apply_to_node(struct, by_value_structs):
+    if struct.name in by_value_structs:
+        struct.is_by_value = True
@@ -1,9 +1,17 @@
 from src import code_dom
 
+# Node modifier settings (see pass_manager.PassManager)
+node_types = [code_dom.DOMClassStructUnion]
+order_sensitive = False
+
 
 # This modifier marks structs with "use_unmodified_name_for_typedef", which prevents "_t" being added to their
 # typedef name.
 def apply(dom_root, struct_names):
     for struct in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
-        if struct.name in struct_names:
-            struct.use_unmodified_name_for_typedef = True
+        apply_to_node(struct, struct_names)
+
+
+def apply_to_node(struct, struct_names):
+    if struct.name in struct_names:
+        struct.use_unmodified_name_for_typedef = True
@@ -7,9 +7,14 @@ def apply(dom_root):
 
     elements_to_consider = dom_root.list_all_children_of_type(code_dom.DOMBlankLines)
 
+    # The merged lines are all removed from their parents at the end, as removing them one at a time would mean the
+    # positions of the following siblings needing to be found again each time
+    merged_lines = set()
+    merged_lines_by_parent = {}  # Lines to remove from each parent element
+
     for element in elements_to_consider:
-        if element.parent is None:
-            continue  # Element has been removed
+        if element in merged_lines:
+            continue  # Element has been merged into another one
 
         surrounding_lines = []
 
@@ -27,5 +32,9 @@ def apply(dom_root):
 
         # Merge lines into this one
         for line in surrounding_lines:
-            line.parent.remove_child(line)
+            merged_lines.add(line)
+            merged_lines_by_parent.setdefault(line.parent, []).append(line)
             element.num_blank_lines += line.num_blank_lines
+
+    for parent, lines in merged_lines_by_parent.items():
+        parent.remove_children(lines)
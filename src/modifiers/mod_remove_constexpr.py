@@ -1,18 +1,28 @@
 from src import code_dom
 
+# Node modifier settings (see pass_manager.PassManager)
+node_types = [code_dom.DOMFunctionDeclaration, code_dom.DOMType]
+order_sensitive = False
+
 
 # This modifier removes constexpr from everything in the DOM that has it
 def apply(dom_root):
 
     # First functions
     for function in dom_root.list_all_children_of_type(code_dom.DOMFunctionDeclaration):
-        function.is_constexpr = False
+        apply_to_node(function)
 
     # Then any constexpr tokens in types
     for domType in dom_root.list_all_children_of_type(code_dom.DOMType):
-        if domType.is_constexpr():
-            new_tokens = []
-            for token in domType.tokens:
-                if token.type != 'CONSTEXPR':
-                    new_tokens.append(token)
-            domType.tokens = new_tokens
+        apply_to_node(domType)
+
+
+def apply_to_node(element):
+    if isinstance(element, code_dom.DOMFunctionDeclaration):
+        element.is_constexpr = False
+    elif element.is_constexpr():
+        new_tokens = []
+        for token in element.tokens:
+            if token.type != 'CONSTEXPR':
+                new_tokens.append(token)
+        element.tokens = new_tokens
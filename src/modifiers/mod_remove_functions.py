@@ -5,8 +5,11 @@ from src import utils
 # This modifier removes functions with the (fully-qualified) names specified
 # Optionally removal can be limited to only functions within a specified preprocessor conditional expression
 def apply(dom_root, function_names, preprocessor_conditional_expression=None):
-    for function in dom_root.list_all_children_of_type(code_dom.DOMFunctionDeclaration):
-        if function.get_fully_qualified_name(return_fqn_even_for_member_functions=True) in function_names:
+    # Find everything we want to remove first, and then remove it all in one go
+    functions_to_remove = []
+    for function_name in dict.fromkeys(function_names):  # (removing duplicate names)
+        for function in dom_root.list_all_children_of_type_with_fully_qualified_name(code_dom.DOMFunctionDeclaration,
+                                                                                     function_name):
             if preprocessor_conditional_expression is not None:
                 do_not_remove = True
                 for conditional in utils.get_preprocessor_conditionals(function):
@@ -18,9 +21,12 @@ def apply(dom_root, function_names, preprocessor_conditional_expression=None):
                 if do_not_remove:
                     continue
 
-            if isinstance(function.parent, code_dom.DOMTemplate):
-                # If the function is templated, remove the template too
-                template = function.parent
-                template.parent.remove_child(template)
-            else:
-                function.parent.remove_child(function)
+            functions_to_remove.append(function)
+
+    for function in functions_to_remove:
+        if isinstance(function.parent, code_dom.DOMTemplate):
+            # If the function is templated, remove the template too
+            template = function.parent
+            template.parent.remove_child(template)
+        else:
+            function.parent.remove_child(function)
@@ -1,9 +1,18 @@
 from src import code_dom
 
+# Node modifier settings (see pass_manager.PassManager)
+# This is order-sensitive because it looks at the classes containing typedefs
+node_types = [code_dom.DOMTypedef]
+order_sensitive = True
+
 
 # This modifier removes any typedefs that are left inside classes/structs
 # (since C doesn't allow that, but fortunately we know none are relevant)
 def apply(dom_root):
     for typedef in dom_root.list_all_children_of_type(code_dom.DOMTypedef):
-        if typedef.get_parent_class() is not None:
-            typedef.parent.remove_child(typedef)
+        apply_to_node(typedef)
+
+
+def apply_to_node(typedef):
+    if typedef.get_parent_class() is not None:
+        typedef.parent.remove_child(typedef)
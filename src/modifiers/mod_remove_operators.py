@@ -1,8 +1,16 @@
 from src import code_dom
 
+# Node modifier settings (see pass_manager.PassManager)
+node_types = [code_dom.DOMFunctionDeclaration]
+order_sensitive = False
+
 
 # This modifier removes any operator methods
 def apply(dom_root):
     for function in dom_root.list_all_children_of_type(code_dom.DOMFunctionDeclaration):
-        if function.is_operator:
-            function.parent.remove_child(function)
+        apply_to_node(function)
+
+
+def apply_to_node(function):
+    if function.is_operator:
+        function.parent.remove_child(function)
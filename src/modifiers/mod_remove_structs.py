@@ -3,11 +3,18 @@ from src import code_dom
 
 # This modifier removes structs/classes with the (fully-qualified) names specified
 def apply(dom_root, struct_names):
-    for struct in dom_root.list_all_children_of_type(code_dom.DOMClassStructUnion):
-        if struct.get_fully_qualified_name() in struct_names:
-            if isinstance(struct.parent, code_dom.DOMTemplate):
-                # If the class is templated, remove the template too
-                template = struct.parent
-                template.parent.remove_child(template)
-            else:
-                struct.parent.remove_child(struct)
+    # Find everything we want to remove first, and then remove it all in one go
+    structs_to_remove = []
+    for struct_name in dict.fromkeys(struct_names):  # (removing duplicate names)
+        structs_to_remove.extend(
+            dom_root.list_all_children_of_type_with_fully_qualified_name(code_dom.DOMClassStructUnion, struct_name))
+
+    for struct in structs_to_remove:
+        if struct.parent is None:
+            continue  # Already removed along with an enclosing struct
+        if isinstance(struct.parent, code_dom.DOMTemplate):
+            # If the class is templated, remove the template too
+            template = struct.parent
+            template.parent.remove_child(template)
+        else:
+            struct.parent.remove_child(struct)
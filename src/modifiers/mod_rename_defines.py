@@ -16,10 +16,11 @@ def apply(dom_root, name_map):
 
         if len(define.tokens) > 0:
             # Define is using tokens
-            for token in define.tokens:
+            for i in range(0, len(define.tokens)):
                 did_anything = False
                 for old_name in name_map:
-                    if old_name in token.value:
+                    if old_name in define.tokens[i].value:
+                        token = define.get_writable_tokens()[i]
                         token.value = token.value.replace(old_name, name_map[old_name])
                         did_anything = True
         else:
@@ -45,8 +46,9 @@ def apply(dom_root, name_map):
     # Rename in any conditional expressions
     for conditional in dom_root.list_all_children_of_type(code_dom.DOMPreprocessorIf):
         did_anything = False
-        for token in conditional.expression_tokens:
-            if token.value in name_map:
+        for i in range(0, len(conditional.expression_tokens)):
+            if conditional.expression_tokens[i].value in name_map:
+                token = conditional.get_writable_expression_tokens()[i]
                 token.value = name_map[token.value]
                 did_anything = True
 
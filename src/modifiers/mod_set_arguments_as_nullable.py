@@ -6,6 +6,6 @@ from src import utils
 def apply(dom_root, argument_names, nullable):
     for arg in dom_root.list_all_children_of_type(code_dom.DOMFunctionArgument):
         if arg.name in argument_names:
-            for tok in arg.arg_type.tokens:
+            for tok in arg.arg_type.get_writable_tokens():
                 if tok.type == 'ASTERISK':
                     tok.nullable = nullable
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+
+# Source files whose contents affect the DOM produced by parsing - if any of these change then cached DOMs are stale
+def get_parser_source_files():
+    src_dir = os.path.dirname(os.path.realpath(__file__))
+    code_dom_dir = os.path.join(src_dir, "code_dom")
+    files = [os.path.join(src_dir, "c_lexer.py"),
+             os.path.join(src_dir, "token_stream.py")]
+    for filename in sorted(os.listdir(code_dom_dir)):
+        if filename.endswith(".py"):
+            files.append(os.path.join(code_dom_dir, filename))
+    return files
+
+
+# Calculate a hash of the lexer/parser source code
+def get_parser_source_hash():
+    hasher = hashlib.sha256()
+    for filename in get_parser_source_files():
+        with open(filename, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+# An on-disk cache of parsed header files
+# Entries are keyed by a hash of the header content and name, the generator version and the lexer/parser source code,
+# so that editing either the header or the parser automatically results in a cache miss
+class ParseCache:
+    def __init__(self, cache_dir, generator_version):
+        self.cache_dir = cache_dir
+        self.generator_version = generator_version
+        self.parser_source_hash = get_parser_source_hash()
+        self.hits = 0
+        self.misses = 0
+        self.load_time = 0.0  # Total time spent loading cached DOMs (in seconds)
+
+    # Get the cache key for a header file
+    def get_key(self, source_filename, file_content):
+        hasher = hashlib.sha256()
+        hasher.update(self.generator_version.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(self.parser_source_hash.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(source_filename.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(file_content.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def get_cache_file_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pickle")
+
+    # Load the DOM for the header given from the cache, returning None if it is not present
+    def load(self, source_filename, file_content):
+        start_time = time.perf_counter()
+        cache_file_path = self.get_cache_file_path(self.get_key(source_filename, file_content))
+        dom_element = None
+        if os.path.isfile(cache_file_path):
+            try:
+                with open(cache_file_path, "rb") as f:
+                    dom_element = pickle.load(f)
+            except Exception as e:  # noqa - any failure here just means we need to parse the file again
+                print("Ignoring unreadable parse cache entry " + cache_file_path + " (" + str(e) + ")")
+                dom_element = None
+
+        if dom_element is not None:
+            self.hits += 1
+            self.load_time += time.perf_counter() - start_time
+        else:
+            self.misses += 1
+        return dom_element
+
+    # Store the DOM for the header given in the cache
+    def store(self, source_filename, file_content, dom_element):
+        cache_file_path = self.get_cache_file_path(self.get_key(source_filename, file_content))
+        temp_file_path = cache_file_path + "." + str(os.getpid()) + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # The DOM can be fairly deep, so make sure we have enough recursion headroom to pickle it
+            old_recursion_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(old_recursion_limit, 10000))
+            try:
+                with open(temp_file_path, "wb") as f:
+                    pickle.dump(dom_element, f, protocol=pickle.HIGHEST_PROTOCOL)
+            finally:
+                sys.setrecursionlimit(old_recursion_limit)
+            # Write-then-rename so that concurrent runs never see a partially written entry
+            os.replace(temp_file_path, cache_file_path)
+        except (OSError, pickle.PicklingError, RecursionError) as e:
+            print("Unable to write parse cache entry " + cache_file_path + " (" + str(e) + ")")
+            if os.path.isfile(temp_file_path):
+                os.remove(temp_file_path)
+
+    # Get a one-line summary of cache usage
+    def get_stats_string(self):
+        return "Parse cache: " + str(self.hits) + " hits, " + str(self.misses) + " misses, " + \
+               ("%.3f" % self.load_time) + "s loading"
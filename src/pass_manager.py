@@ -0,0 +1,96 @@
+from src import profiler
+
+# Debug option - if this is cleared then every modifier is applied separately (with its own traversal of the DOM),
+# rather than runs of consecutive node modifiers being fused together (see PassManager)
+# --verify-pass-fusion uses this to generate a reference copy of the output to compare against
+fuse_passes = True
+
+
+# Is the modifier given a node modifier? (see PassManager)
+def is_node_modifier(modifier):
+    return hasattr(modifier, "apply_to_node")
+
+
+# Applies modifiers to the DOM
+# Most modifiers are applied immediately, but "node modifiers" (simple modifiers that just apply a rule to each element
+# of certain types in turn) are queued up, so that a run of consecutive node modifiers can all be applied in a single
+# traversal of the DOM, rather than each having to find the elements it is interested in separately.
+# As well as the usual apply() function, a node modifier module provides:
+#   node_types - a list of the element types the modifier is interested in
+#   order_sensitive - set if the modifier can't be fused with others (see below)
+#   apply_to_node(element, ...) - applies the modifier to a single element, taking the same additional arguments as
+#                                 apply() (which must be equivalent to calling apply_to_node() on every element of the
+#                                 types in node_types in document order)
+# apply_to_node() may change the element it is given (including removing it from the DOM), but must not change any
+# other elements, or add anything to the DOM. If the result also depends on anything other than the element itself
+# (the state of its parent class, for example), then order_sensitive must be set, as when passes are fused each element
+# gets all the passes applied to it before moving on to the next, which means that passes can see the effects of later
+# passes on elements earlier in the DOM.
+# Other modifiers can be applied via the pass manager too (which applies any queued passes first), but otherwise flush()
+# must be called at the end of a run of node modifiers, before anything else looks at or modifies the DOM.
+class PassManager:
+    def __init__(self):
+        self.pending_root = None  # The element the pending passes are to be applied to
+        self.pending_passes = []  # List of (modifier, args, kwargs) tuples waiting to be applied
+
+    # Apply a modifier to the DOM (or queue it up to be applied, for node modifiers)
+    # Any additional arguments are passed on to the modifier's apply() function
+    def apply(self, modifier, dom_root, *args, **kwargs):
+        if fuse_passes and is_node_modifier(modifier) and not modifier.order_sensitive:
+            if dom_root is not self.pending_root:
+                self.flush()
+            self.pending_root = dom_root
+            self.pending_passes.append((modifier, args, kwargs))
+        else:
+            self.flush()
+            modifier.apply(dom_root, *args, **kwargs)
+
+    # Apply any queued modifiers
+    def flush(self):
+        if len(self.pending_passes) == 0:
+            return
+
+        dom_root = self.pending_root
+        passes = self.pending_passes
+        self.pending_root = None
+        self.pending_passes = []
+
+        if len(passes) == 1:
+            # Nothing to fuse
+            modifier, args, kwargs = passes[0]
+            modifier.apply(dom_root, *args, **kwargs)
+        else:
+            modifier_names = [modifier.__name__.rsplit(".", 1)[-1] for modifier, _, _ in passes]
+            with profiler.phase("Fused " + " + ".join(modifier_names), "modifier"):
+                self.apply_fused(dom_root, passes)
+
+    # Apply a group of node modifiers in a single traversal
+    @staticmethod
+    def apply_fused(dom_root, passes):
+        pass_node_types = [tuple(modifier.node_types) for modifier, _, _ in passes]
+        all_node_types = tuple(dict.fromkeys(node_type for node_types in pass_node_types for node_type in node_types))
+
+        # To match what happens when the passes are applied separately, an element that gets removed by one pass (or
+        # is inside something that gets removed) should not be seen by any subsequent passes, so we record which pass
+        # removed each element
+        removed_by_pass = {}
+
+        for element in dom_root.list_all_children_of_type(all_node_types):
+            # If anything containing this element was removed from the DOM, then only the passes up to and including
+            # the one that removed it should see this element
+            num_passes_to_apply = len(passes)
+            if len(removed_by_pass) > 0:
+                current = element.parent
+                while current is not None:
+                    if current in removed_by_pass:
+                        num_passes_to_apply = min(num_passes_to_apply, removed_by_pass[current] + 1)
+                    current = current.parent
+
+            for pass_index in range(0, num_passes_to_apply):
+                if isinstance(element, pass_node_types[pass_index]):
+                    modifier, args, kwargs = passes[pass_index]
+                    modifier.apply_to_node(element, *args, **kwargs)
+                    if element.parent is None:
+                        # This pass removed the element, so no subsequent ones should see it
+                        removed_by_pass[element] = pass_index
+                        break
@@ -0,0 +1,228 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# The profiler currently recording phases (see start()), or None if profiling is not enabled
+current_profiler = None
+
+
+# A single completed phase of the conversion process
+class ProfilePhase:
+    __slots__ = ['name', 'category', 'args', 'start_time', 'wall_time', 'cpu_time', 'allocated_blocks', 'allocated',
+                 'peak', 'depth']
+
+    def __init__(self, name, category, args, start_time, depth):
+        self.name = name
+        self.category = category
+        self.args = args  # Dictionary of (string) details to include in the trace
+        self.start_time = start_time  # Wall time at the start of the phase, relative to the start of profiling
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.allocated_blocks = 0  # Net change in the number of memory blocks allocated by Python during the phase
+        self.allocated = 0  # Net change in memory allocated by Python during the phase, in bytes (if tracing memory)
+        self.peak = 0  # Peak memory allocated by Python during the phase, in bytes (if tracing memory)
+        self.depth = depth  # Nesting depth of the phase
+
+
+# Records the time and memory used by each phase of the conversion process, which can then be exported as a Chrome trace
+# (see write_chrome_trace()) and/or summarised as text (see get_summary_string())
+# Memory usage is always measured as the change in the number of blocks Python has allocated, which is cheap to obtain.
+# If trace_memory is set then tracemalloc is also used to measure the actual number of bytes allocated and the peak
+# usage of each phase, but that slows everything down a lot (and more for some phases than others), so the times
+# recorded in that mode are not very representative.
+class Profiler:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = []  # Completed phases, in the order they finished
+        # Phases currently in progress, as [phase, start CPU time, start allocated blocks, start memory, peak memory]
+        self.phase_stack = []
+        self.start_time = 0.0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+
+    def stop(self):
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    # Begin a new phase (which will be nested inside whatever phase is currently in progress)
+    def begin_phase(self, name, category, args=None):
+        current_memory = 0
+        if self.trace_memory:
+            # Phases use tracemalloc's peak to measure their own peak usage, so the peak so far needs to be recorded for
+            # whatever phase contains this one before it gets reset
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if len(self.phase_stack) > 0:
+                self.phase_stack[-1][4] = max(self.phase_stack[-1][4], peak_memory)
+            tracemalloc.reset_peak()
+
+        phase = ProfilePhase(name, category, args or {}, time.perf_counter() - self.start_time, len(self.phase_stack))
+        self.phase_stack.append([phase, time.process_time(), sys.getallocatedblocks(), current_memory,
+                                 current_memory])
+
+    # End the phase most recently begun
+    def end_phase(self):
+        end_time = time.perf_counter() - self.start_time
+        end_cpu_time = time.process_time()
+        end_allocated_blocks = sys.getallocatedblocks()
+
+        phase, start_cpu_time, start_allocated_blocks, start_memory, phase_peak_memory = self.phase_stack.pop()
+        phase.wall_time = end_time - phase.start_time
+        phase.cpu_time = end_cpu_time - start_cpu_time
+        phase.allocated_blocks = end_allocated_blocks - start_allocated_blocks
+        if self.trace_memory:
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            phase.allocated = current_memory - start_memory
+            phase.peak = max(phase_peak_memory, peak_memory) - start_memory
+            # The containing phase's peak includes anything that happened during this one
+            if len(self.phase_stack) > 0:
+                self.phase_stack[-1][4] = max(self.phase_stack[-1][4], phase_peak_memory, peak_memory)
+            tracemalloc.reset_peak()
+        self.phases.append(phase)
+
+    # Write the recorded phases to a file in the Chrome trace event format, which can be viewed with chrome://tracing or
+    # https://ui.perfetto.dev/
+    def write_chrome_trace(self, filename):
+        process_id = os.getpid()
+        events = []
+        for phase in sorted(self.phases, key=lambda p: (p.start_time, p.depth)):
+            args = dict(phase.args)
+            args["cpu_time_ms"] = round(phase.cpu_time * 1000, 3)
+            args["allocated_blocks"] = phase.allocated_blocks
+            if self.trace_memory:
+                args["allocated_kb"] = round(phase.allocated / 1024, 1)
+                args["peak_kb"] = round(phase.peak / 1024, 1)
+            events.append({
+                "name": phase.name,
+                "cat": phase.category,
+                "ph": "X",  # A "complete" event, with a start time and duration
+                "ts": round(phase.start_time * 1000000, 1),  # Times are in microseconds
+                "dur": round(phase.wall_time * 1000000, 1),
+                "pid": process_id,
+                "tid": 0,
+                "args": args
+            })
+
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, indent=1)
+
+    # Get the totals for the recorded phases, combining phases with the same name (such as a modifier that is applied
+    # several times)
+    # Returns a dictionary mapping (category, name) to a list of [count, wall time, CPU time, allocated blocks,
+    # allocated bytes, peak bytes]
+    def get_totals(self):
+        totals = {}
+        for phase in self.phases:
+            key = (phase.category, phase.name)
+            if key not in totals:
+                totals[key] = [0, 0.0, 0.0, 0, 0, 0]
+            total = totals[key]
+            total[0] += 1
+            total[1] += phase.wall_time
+            total[2] += phase.cpu_time
+            total[3] += phase.allocated_blocks
+            total[4] += phase.allocated
+            total[5] = max(total[5], phase.peak)
+        return totals
+
+    # Get a text summary of the recorded phases (see get_totals()), sorted by wall time
+    # Times include any phases nested inside a phase
+    def get_summary_string(self):
+        totals = self.get_totals()
+
+        header = "  %-60s %-9s %5s %10s %10s %10s" % ("Phase", "Category", "Count", "Wall (ms)", "CPU (ms)", "Blocks")
+        if self.trace_memory:
+            header += " %12s %12s" % ("Alloc (KB)", "Peak (KB)")
+        lines = ["Profile summary (figures include nested phases):", header]
+        for (category, name), (count, wall_time, cpu_time, allocated_blocks, allocated, peak) in \
+                sorted(totals.items(), key=lambda item: item[1][1], reverse=True):
+            if len(name) > 60:
+                name = name[:57] + "..."
+            line = "  %-60s %-9s %5d %10.1f %10.1f %10d" % (name, category, count, wall_time * 1000, cpu_time * 1000,
+                                                             allocated_blocks)
+            if self.trace_memory:
+                line += " %12.1f %12.1f" % (allocated / 1024, peak / 1024)
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Context manager that records a phase with the current profiler (if there is one) while the code it wraps runs
+@contextlib.contextmanager
+def phase(name, category, args=None):
+    if current_profiler is None:
+        yield
+        return
+    current_profiler.begin_phase(name, category, args)
+    try:
+        yield
+    finally:
+        current_profiler.end_phase()
+
+
+# Start profiling, returning the new profiler
+def start(trace_memory=False):
+    global current_profiler
+    current_profiler = Profiler(trace_memory)
+    current_profiler.start()
+    return current_profiler
+
+
+# Stop profiling, returning the profiler that was in use
+def stop():
+    global current_profiler
+    profiler = current_profiler
+    current_profiler = None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+# Get a short description of a modifier argument for the profile
+def summarise_argument(value, max_length=60):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        text = ", ".join(summarise_argument(item, max_length) for item in items[:3])
+        if len(items) > 3:
+            text += ", ... (" + str(len(items)) + " items)"
+        text = "[" + text + "]"
+    elif isinstance(value, dict):
+        text = "{" + str(len(value)) + " entries}"
+    elif hasattr(value, "get_child_lists"):
+        # DOM elements are summarised as just their type, as anything else would be too long
+        text = type(value).__name__
+    else:
+        text = repr(value)
+    if len(text) > max_length:
+        text = text[:max_length - 3] + "..."
+    return text
+
+
+# Wrap the apply() function of every modifier in the package given so that each call to it is recorded as a phase when
+# profiling (with a summary of the arguments it was called with)
+def instrument_modifiers(modifiers_package):
+    for name, module in vars(modifiers_package).items():
+        if name.startswith("mod_") and hasattr(module, "apply") and not hasattr(module.apply, "profiler_wrapped"):
+            module.apply = make_modifier_wrapper(name, module.apply)
+
+
+def make_modifier_wrapper(modifier_name, apply_function):
+    @functools.wraps(apply_function)
+    def wrapper(*args, **kwargs):
+        if current_profiler is None:
+            return apply_function(*args, **kwargs)
+        summary = {}
+        for index, value in enumerate(args):
+            summary["arg" + str(index)] = summarise_argument(value)
+        for key, value in kwargs.items():
+            summary[key] = summarise_argument(value)
+        with phase(modifier_name, "modifier", summary):
+            return apply_function(*args, **kwargs)
+
+    wrapper.profiler_wrapped = True
+    return wrapper
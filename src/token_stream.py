@@ -1,50 +1,136 @@
+import sys
+
+
+# A single token
+# PLY produces LexToken objects, which TokenStream converts to these as it reads them - they use __slots__ to keep the
+# memory used by the (very large number of) tokens in a DOM down, and have explicit fields for the flags that the
+# modifiers attach to tokens
+class Token:
+    __slots__ = ["type",  # The token type (as per the rules in c_lexer)
+                 "value",  # The token text
+                 "lineno",  # The line number the token came from (0 for synthetic tokens)
+                 "lexpos",  # The position in the lexer input the token came from (0 for synthetic tokens)
+                 "was_reference",  # Set on pointers that were originally references (see
+                 #                   mod_convert_references_to_pointers)
+                 "nullable",  # True/False if this pointer is known to be nullable/non-nullable, None if unknown
+                 "is_template_parameter"]  # Is this an (unresolved) template parameter?
+
+    def __init__(self, type, value, lineno=0, lexpos=0, was_reference=False, nullable=None,
+                 is_template_parameter=False):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.was_reference = was_reference
+        self.nullable = nullable
+        self.is_template_parameter = is_template_parameter
+
+    # Tokens only contain immutable values, so a shallow copy is sufficient for deepcopy() too
+    def __copy__(self):
+        return Token(self.type, self.value, self.lineno, self.lexpos, self.was_reference, self.nullable,
+                     self.is_template_parameter)
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    # Pickle tokens as a simple constructor call, which is considerably more compact than the default for __slots__
+    def __reduce__(self):
+        return Token, (self.type, self.value, self.lineno, self.lexpos, self.was_reference, self.nullable,
+                       self.is_template_parameter)
+
+    def __str__(self):
+        return "Token(%s,%r,%d,%d)" % (self.type, self.value, self.lineno, self.lexpos)
+
+    def __repr__(self):
+        return str(self)
+
+
 # This encapsulates a stream of lexed tokens in a manner that allows tokens to be returned to the stream if unparsed
+# The entire input is lexed up-front into a flat list, so a checkpoint is simply an index into that list and rewinding
+# to one is just an assignment (and there is no limit on how far back the stream can be rewound)
 class TokenStream:
     def __init__(self, lexer):
-        self.lexer = lexer
-        self.token_history = []
-        self.buffered_tokens = []
+        self.tokens = []
+        while True:
+            lex_token = lexer.token()
+            if lex_token is None:
+                break
+            # Note that this also discards the lexer PLY attaches to tokens produced by rule functions, which we don't
+            # need once lexing is done (and which would make tokens expensive to copy and impossible to serialise)
+            # Token values are interned, as the same few names/keywords/punctuation make up the bulk of any header
+            self.tokens.append(Token(lex_token.type, sys.intern(lex_token.value), lex_token.lineno, lex_token.lexpos))
         self.current_token_index = 0
-        self.max_history_length = 1024  # Maximum number of tokens that can be rewound
 
-    # Fetch the next token in the stream, returns None if the stream is finished
-    # Optionally skips newline/whitespace tokens
-    def get_token(self, skip_newlines=True, skip_whitespace=True):
-        if len(self.buffered_tokens) > 0:
-            token = self.buffered_tokens.pop()
-        else:
-            token = self.lexer.token()
+        # Almost every parser call skips whitespace (and usually newlines too), so rather than filtering those out
+        # one token at a time we precompute, for every position in the stream, the index of the next token that would
+        # not be skipped (len(self.tokens) meaning "none")
+        num_tokens = len(self.tokens)
+        self.next_significant_index = [num_tokens] * (num_tokens + 1)  # Skipping whitespace and newlines
+        self.next_non_whitespace_index = [num_tokens] * (num_tokens + 1)  # Skipping only whitespace
+        for index in range(num_tokens - 1, -1, -1):
+            token_type = self.tokens[index].type
+            if token_type == 'WHITESPACE':
+                self.next_significant_index[index] = self.next_significant_index[index + 1]
+                self.next_non_whitespace_index[index] = self.next_non_whitespace_index[index + 1]
+            elif token_type == 'NEWLINE':
+                self.next_significant_index[index] = self.next_significant_index[index + 1]
+                self.next_non_whitespace_index[index] = index
+            else:
+                self.next_significant_index[index] = index
+                self.next_non_whitespace_index[index] = index
 
-        if token is not None:
-            self.token_history.append(token)
-            while len(self.token_history) > self.max_history_length:
-                self.token_history.pop(0)
-            self.current_token_index += 1
+    # Returns true if the token given should be skipped under the specified newline/whitespace skipping rules
+    @staticmethod
+    def is_skippable(token, skip_newlines, skip_whitespace):
+        return (skip_newlines and (token.type == 'NEWLINE')) or (skip_whitespace and (token.type == 'WHITESPACE'))
 
-            if (skip_newlines and (token.type == 'NEWLINE')) or (skip_whitespace and (token.type == 'WHITESPACE')):
-                return self.get_token(skip_newlines, skip_whitespace)
+    # Find the index of the next token from index onwards that is not skipped under the rules given
+    # Returns len(self.tokens) if there are no more suitable tokens
+    def find_next_token_index(self, index, skip_newlines, skip_whitespace):
+        if skip_whitespace:
+            if skip_newlines:
+                return self.next_significant_index[index]
+            else:
+                return self.next_non_whitespace_index[index]
+        elif not skip_newlines:
+            return index
 
-        return token
+        # Skipping newlines but not whitespace is rare enough that we don't bother having a table for it
+        num_tokens = len(self.tokens)
+        while (index < num_tokens) and self.is_skippable(self.tokens[index], skip_newlines, skip_whitespace):
+            index += 1
+        return index
+
+    # Fetch the next token in the stream, returns None if the stream is finished
+    # Optionally skips newline/whitespace tokens
+    def get_token(self, skip_newlines=True, skip_whitespace=True):
+        index = self.find_next_token_index(self.current_token_index, skip_newlines, skip_whitespace)
+        if index >= len(self.tokens):
+            self.current_token_index = index
+            return None
+        self.current_token_index = index + 1
+        return self.tokens[index]
 
     # Fetch the next token without removing it from the stream
     # Optionally skips newline/whitespace tokens (in which case it will scan forward to the next suitable token
     # and peek that)
     def peek_token(self, skip_newlines=True, skip_whitespace=True):
-        checkpoint = self.get_checkpoint()
-        token = self.get_token(skip_newlines, skip_whitespace)
-        self.rewind(checkpoint)
-        return token
+        index = self.find_next_token_index(self.current_token_index, skip_newlines, skip_whitespace)
+        if index >= len(self.tokens):
+            return None
+        return self.tokens[index]
 
     # Fetch the next token in the stream, failing (returning None) if it is not of one of the types specified
     # Optionally skips newline/whitespace tokens
     def get_token_of_type(self, acceptable_types, skip_newlines=True, skip_whitespace=True):
-        checkpoint = self.get_checkpoint()
-        token = self.get_token(skip_newlines, skip_whitespace)
-        if token is None:
+        index = self.find_next_token_index(self.current_token_index, skip_newlines, skip_whitespace)
+        if index >= len(self.tokens):
+            self.current_token_index = index  # Skipped tokens at the end of the stream are consumed
             return None
+        token = self.tokens[index]
         if token.type not in acceptable_types:
-            self.rewind(checkpoint)
             return None
+        self.current_token_index = index + 1
         return token
 
     # Fetch the next token in the stream without removing it from the stream, failing (returning None)
@@ -61,14 +147,14 @@ class TokenStream:
     # Rewind the stream by one token
     # If skip_newlines is true, will rewind by one /non-newline/ token (and the same for skip_whitespace)
     def rewind_one_token(self, skip_newlines=True, skip_whitespace=True):
-        if len(self.token_history) < 1:
-            raise Exception("Cannot rewind as no tokens in history! (rewound more than max_history_length?)")
-
-        token = self.token_history.pop()
-        self.buffered_tokens.append(token)
-        self.current_token_index -= 1
-        if (skip_newlines and (token.type == 'NEWLINE')) or (skip_whitespace and (token.type == 'WHITESPACE')):
-            self.rewind_one_token(skip_newlines, skip_whitespace)
+        index = self.current_token_index
+        while True:
+            if index <= 0:
+                raise Exception("Cannot rewind as already at the start of the stream")
+            index -= 1
+            if not self.is_skippable(self.tokens[index], skip_newlines, skip_whitespace):
+                break
+        self.current_token_index = index
 
     # Get a checkpoint in the stream that can later be returned to
     def get_checkpoint(self):
@@ -78,7 +164,4 @@ class TokenStream:
     def rewind(self, checkpoint):
         if self.current_token_index < checkpoint:
             raise Exception("Cannot rewind to a point further in the stream")
-        while self.current_token_index > checkpoint:
-            self.rewind_one_token(skip_newlines=False, skip_whitespace=False)
-        if self.current_token_index != checkpoint:
-            raise Exception("Rewind to checkpoint failed")
+        self.current_token_index = checkpoint
@@ -1,18 +1,14 @@
+import sys
 from src import code_dom
-import ply.lex as lex
 from src import c_lexer
+from src import token_stream
 
 
-# Create a new LexToken with the text given
+# Create a new token with the text given
 def create_token(text):
-    token = lex.LexToken()
     # Technically we don't care about token types any more since we're done parsing, so we set a non-existent token type
     # to make it clear where this came from
-    token.type = 'SYNTHETIC'
-    token.value = text
-    token.lineno = 0
-    token.lexpos = 0
-    return token
+    return token_stream.Token('SYNTHETIC', sys.intern(text))
 
 
 # Create a type from a string
@@ -26,7 +22,7 @@ def create_type(text):
 def create_classstructunion(text):
     stream = c_lexer.tokenize(text)
     context = code_dom.ParseContext()
-    context.current_content_parser = lambda: code_dom.DOMHeaderFile.parse_content(context, stream)
+    context.current_parser_table = code_dom.parsertable.header_parser_table
     return code_dom.DOMClassStructUnion.parse(context, stream)
 
 
@@ -67,7 +63,7 @@ def create_typedef(text):
 def create_preprocessor_if(text):
     stream = c_lexer.tokenize(text)
     context = code_dom.ParseContext()
-    context.current_content_parser = lambda: code_dom.DOMHeaderFile.parse_content(context, stream)
+    context.current_parser_table = code_dom.parsertable.header_parser_table
     element = code_dom.DOMPreprocessorIf.parse(context, stream)
     # There may be a comment following the declaration, so check for it and attach if there is
     attached_comment = code_dom.DOMComment.parse(context, stream)
@@ -126,13 +122,23 @@ def is_in_else_clause(element, conditional_element):
 # exclusive and return False, but it should never return True for elements that can in fact both get compiled
 # simultaneously.
 def are_elements_mutually_exclusive(element_a, element_b):
-    conditionals_a = get_preprocessor_conditionals(element_a)
-    conditionals_b = get_preprocessor_conditionals(element_b)
+    return are_conditional_contexts_mutually_exclusive(get_preprocessor_conditional_context(element_a),
+                                                       get_preprocessor_conditional_context(element_b))
 
-    for conditional_a in conditionals_a:
-        conditional_a_negated = is_in_else_clause(element_a, conditional_a)
-        for conditional_b in conditionals_b:
-            conditional_b_negated = is_in_else_clause(element_b, conditional_b)
+
+# Get the preprocessor conditionals an element is inside (outermost first), as a tuple of (conditional, negated) pairs,
+# where negated is True if the element is in the else block of that conditional
+# This is useful for comparing the same element against many others with are_conditional_contexts_mutually_exclusive(),
+# as it only needs to be calculated once
+def get_preprocessor_conditional_context(element):
+    return tuple((conditional, is_in_else_clause(element, conditional))
+                 for conditional in get_preprocessor_conditionals(element))
+
+
+# Version of are_elements_mutually_exclusive() that works with the results of get_preprocessor_conditional_context()
+def are_conditional_contexts_mutually_exclusive(context_a, context_b):
+    for conditional_a, conditional_a_negated in context_a:
+        for conditional_b, conditional_b_negated in context_b:
             if conditional_a_negated == conditional_b_negated:
                 # If both elements are in the same block (normal/else) then check if the conditions are exclusive
                 if conditional_a.condition_is_mutually_exclusive(conditional_b):